@@ -168,6 +168,9 @@ CACHES = {
     }
 }
 
+# Số tiến trình tối đa của process pool tạo lịch trình hàng loạt trong mỗi worker web
+BATCH_SCHEDULE_WORKERS = int(os.getenv('BATCH_SCHEDULE_WORKERS', 2))
+
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
@@ -194,4 +197,8 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'Recommend.tasks.send_trip_reminder_task',
         'schedule': crontab(),  # Chạy mỗi phút
     },
+    'compact_journals_every_5_minutes': {
+        'task': 'Recommend.tasks.compact_journals_task',
+        'schedule': crontab(minute='*/5'),  # Gộp nhật ký thay đổi của admin mỗi 5 phút
+    },
 }
\ No newline at end of file
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class RecommendConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Recommend'
+
+    def ready(self):
+        # Báo thay đổi catalog giữa các worker Django/Celery qua Redis (luồng nghe chỉ chạy khi catalog được dùng)
+        from django.conf import settings
+        from .catalog import set_change_feed
+        from .invalidation import RedisChangeFeed
+
+        set_change_feed(RedisChangeFeed(settings.CELERY_BROKER_URL))
@@ -0,0 +1,194 @@
+import json
+
+import pandas as pd
+
+from .processed import food_table, place_table, get_catalog
+from .hotel import hotel_store, get_hotel_catalog
+
+# Số dòng đọc/xuất mỗi lần và số dòng tối đa của một lần nhập
+CHUNK_ROWS = 5000
+EXPORT_CHUNK_ROWS = 1000
+MAX_BULK_ROWS = 50000
+# Số lỗi chi tiết tối đa trả về cho một lần nhập
+MAX_REPORTED_ERRORS = 20
+# Phân cách các phần tử của cột danh sách khi nhập từ CSV ("Takeout;Dine-in")
+LIST_SEPARATOR = ";"
+
+
+class BulkImportError(ValueError):
+    """File nhập không đọc được hoặc vượt giới hạn, cả lần nhập bị hủy."""
+
+
+class BulkDataset:
+    """Mô tả một tập dữ liệu nhập/xuất hàng loạt: tên trường API -> cột file nguồn, trường bắt buộc, cột danh sách."""
+
+    def __init__(self, table, catalog, fields, required, rating=None, list_fields=()):
+        self.table = table
+        self.catalog = catalog
+        self.fields = fields
+        self.required = required
+        self.rating = rating
+        self.list_fields = list_fields
+
+
+BULK_DATASETS = {
+    "food": BulkDataset(
+        food_table, get_catalog,
+        {"province": "Province", "title": "Title", "rating": "Rating", "price": "Price", "address": "Address",
+         "phone": "Phone", "link": "Link", "service": "Service", "img": "Image"},
+        required=("province", "title", "rating", "address", "img"), rating="rating", list_fields=("service",)),
+    "place": BulkDataset(
+        place_table, get_catalog,
+        {field: field for field in ("province", "title", "rating", "description", "address", "img", "types", "link")},
+        required=("province", "title", "rating", "address", "img"), rating="rating", list_fields=("types",)),
+    "hotel": BulkDataset(
+        hotel_store, get_hotel_catalog,
+        {field: field for field in ("province", "name", "link", "description", "price", "name_nearby_place",
+                                    "hotel_class", "img_origin", "location_rating", "animates")},
+        required=("province", "name"), rating="location_rating"),
+}
+
+
+def upload_format(requested, filename=None, content_type=None):
+    """Định dạng file nhập ("csv" hoặc "ndjson") theo tham số format, đuôi file hoặc content type."""
+    if requested:
+        return requested.lower()
+    if filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if content_type and "ndjson" in content_type:
+        return "ndjson"
+    return "csv"
+
+
+def _read_ndjson(stream):
+    records = []
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise BulkImportError(f"Dòng {number} không phải JSON hợp lệ.")
+        if not isinstance(record, dict):
+            raise BulkImportError(f"Dòng {number} phải là một object JSON.")
+        records.append(record)
+        if len(records) == CHUNK_ROWS:
+            yield pd.DataFrame.from_records(records)
+            records = []
+    if records:
+        yield pd.DataFrame.from_records(records)
+
+
+def read_chunks(stream, fmt):
+    """Đọc file nhập theo từng khối CHUNK_ROWS dòng (DataFrame theo tên trường API)."""
+    if fmt == "ndjson":
+        yield from _read_ndjson(stream)
+    elif fmt == "csv":
+        # Lỗi cú pháp chỉ xuất hiện khi đọc tới khối chứa nó
+        try:
+            with pd.read_csv(stream, dtype=str, keep_default_na=False, encoding="utf-8-sig",
+                             chunksize=CHUNK_ROWS) as reader:
+                yield from reader
+        except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+            raise BulkImportError(f"File CSV không hợp lệ: {e}")
+    else:
+        raise BulkImportError("format phải là csv hoặc ndjson.")
+
+
+def _list_value(value):
+    if isinstance(value, list):
+        return str(value)
+    return str([item.strip() for item in value.split(LIST_SEPARATOR) if item.strip()]) if value else str([])
+
+
+def _clean_chunk(spec, chunk):
+    """Chuẩn hóa một khối nhập: đủ các trường của spec, giá trị dạng chuỗi đã strip (trừ cột danh sách)."""
+    columns = {}
+    for field in spec.fields:
+        values = chunk[field] if field in chunk.columns else pd.Series("", index=chunk.index)
+        values = values.where(values.notna(), "")
+        if field in spec.list_fields:
+            columns[field] = values.map(_list_value)
+        else:
+            columns[field] = values.map(lambda value: value if isinstance(value, str) else str(value)).str.strip()
+    return pd.DataFrame(columns, index=chunk.index)
+
+
+def import_rows(dataset, stream, fmt):
+    """Nhập hàng loạt: kiểm tra và lọc trùng từng khối bằng phép toán trên cả cột, ghi một lần vào nhật ký.
+
+    Trả về số dòng nhận, đã thêm, trùng (với dữ liệu có sẵn / trong chính file), không hợp lệ và vài lỗi đầu tiên.
+    """
+    spec = BULK_DATASETS[dataset]
+    existing = spec.table.keys()
+    seen = set()
+    accepted_rows, accepted_keys = [], []
+    received = invalid = duplicates = duplicates_in_upload = 0
+    errors = []
+
+    def report(rows, reason):
+        for row in rows[:MAX_REPORTED_ERRORS - len(errors)]:
+            errors.append({"row": int(row), "error": reason})
+
+    for chunk in read_chunks(stream, fmt):
+        chunk.index = pd.RangeIndex(received + 1, received + 1 + len(chunk))
+        received += len(chunk)
+        if received > MAX_BULK_ROWS:
+            raise BulkImportError(f"Mỗi lần chỉ nhập tối đa {MAX_BULK_ROWS} dòng.")
+        df = _clean_chunk(spec, chunk)
+
+        missing = (df[list(spec.required)] == "").any(axis=1)
+        report(df.index[missing], f"Thiếu các trường bắt buộc: {', '.join(spec.required)}")
+        valid = ~missing
+        if spec.rating:
+            present = df[spec.rating] != ""
+            rating = pd.to_numeric(df[spec.rating].where(present), errors="coerce")
+            bad_rating = valid & present & ~rating.between(0, 5)
+            report(df.index[bad_rating], f"{spec.rating} phải là số từ 0 đến 5.")
+            valid &= ~bad_rating
+            df[spec.rating] = rating.astype(object).where(present, "")
+        invalid += int((~valid).sum())
+
+        df = df[valid].rename(columns=spec.fields)
+        keys = spec.table.frame_keys(df)
+        repeated = keys.duplicated() | keys.isin(seen)
+        known = ~repeated & keys.isin(existing)
+        duplicates_in_upload += int(repeated.sum())
+        duplicates += int(known.sum())
+        fresh = ~(repeated | known)
+        seen.update(keys[fresh])
+        accepted_rows.extend(df[fresh].to_dict(orient="records"))
+        accepted_keys.extend(keys[fresh])
+
+    if received == 0:
+        raise BulkImportError("File nhập không có dòng dữ liệu nào.")
+    added = spec.table.add_many(accepted_rows, accepted_keys) if accepted_rows else 0
+    # Dòng vừa được thêm bởi request khác trong lúc nhập cũng tính là trùng
+    duplicates += len(accepted_rows) - added
+    if added:
+        spec.catalog().bump_version()
+    return {
+        "received": received,
+        "added": added,
+        "duplicates": duplicates,
+        "duplicates_in_upload": duplicates_in_upload,
+        "invalid": invalid,
+        "errors": sorted(errors, key=lambda error: error["row"]),
+    }
+
+
+def export_chunks(dataset, fmt):
+    """Sinh nội dung file xuất (CSV có header ở khối đầu, hoặc NDJSON) theo từng khối EXPORT_CHUNK_ROWS dòng."""
+    spec = BULK_DATASETS[dataset]
+    rows = spec.table.rows()
+    columns = {column: field for field, column in spec.fields.items()}
+    if fmt == "csv" and not rows:
+        yield ",".join(spec.fields) + "\n"
+    for start in range(0, len(rows), EXPORT_CHUNK_ROWS):
+        chunk = pd.DataFrame(rows[start:start + EXPORT_CHUNK_ROWS]).reindex(columns=list(columns))
+        chunk = chunk.rename(columns=columns)
+        if fmt == "csv":
+            yield chunk.to_csv(index=False, header=start == 0)
+        else:
+            text = chunk.to_json(orient="records", lines=True, force_ascii=False)
+            yield text if text.endswith("\n") else text + "\n"
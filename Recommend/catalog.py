@@ -0,0 +1,246 @@
+import os
+import time
+import hashlib
+import threading
+import weakref
+
+import numpy as np
+
+DATASETS = ("food", "place", "hotel")
+# Mảng vị trí dòng rỗng dùng chung cho các index (chỉ đọc)
+NO_ROWS = np.empty(0, dtype=np.intp)
+NO_ROWS.flags.writeable = False
+
+# Các cấu trúc dẫn xuất (index, bucket...) được đăng ký theo tên, xây một lần cho mỗi snapshot
+_DERIVED_BUILDERS = {}
+_EAGER_DERIVED = []
+# Tên -> các tập dữ liệu mà cấu trúc đọc; tên các cấu trúc dựng riêng cho từng tập dữ liệu
+_DERIVED_DATASETS = {}
+_PER_DATASET = set()
+
+# Kênh báo thay đổi giữa các tiến trình (vd. Redis pub/sub); None = so mtime file nguồn mỗi request
+_change_feed = None
+# Khi dùng kênh, vẫn stat file nguồn định kỳ để bắt thay đổi không qua API admin (vd. chép đè file)
+FILE_RECHECK_SECONDS = 60
+
+# id(DataFrame) -> snapshot chứa DataFrame đó, để tìm lại index dựng sẵn từ DataFrame truyền vào
+_FRAME_OWNERS = {}
+
+
+def register_derived(name, eager=False, datasets=DATASETS, per_dataset=False):
+    """Đăng ký hàm xây cấu trúc dẫn xuất từ snapshot; eager=True để xây ngay khi catalog tải.
+
+    datasets là các tập dữ liệu mà cấu trúc đọc: khi tải lại mà các tập này không đổi, snapshot mới dùng lại
+    cấu trúc của snapshot trước. per_dataset=True: builder(snapshot, dataset) dựng phần của một tập dữ liệu
+    (trả về None để bỏ qua), cấu trúc là dict dataset -> phần đó và chỉ phần của tập đã đổi được dựng lại.
+    """
+    def decorator(builder):
+        _DERIVED_BUILDERS[name] = builder
+        _DERIVED_DATASETS[name] = frozenset(datasets)
+        if per_dataset:
+            _PER_DATASET.add(name)
+        if eager and name not in _EAGER_DERIVED:
+            _EAGER_DERIVED.append(name)
+        return builder
+    return decorator
+
+
+def set_change_feed(feed):
+    """Dùng kênh báo thay đổi cho mọi catalog: chỉ kiểm tra file nguồn khi phiên bản trên kênh đổi."""
+    global _change_feed
+    _change_feed = feed
+
+
+def change_feed():
+    return _change_feed
+
+
+def _forget_frame(key, ref):
+    # DataFrame không đổi được snapshot mới dùng lại: chỉ xóa nếu vẫn trỏ tới snapshot vừa bị thu hồi
+    if _FRAME_OWNERS.get(key) is ref:
+        del _FRAME_OWNERS[key]
+
+
+def snapshot_of(df):
+    """Tìm snapshot sở hữu DataFrame (None nếu df không phải DataFrame gốc của catalog)."""
+    ref = _FRAME_OWNERS.get(id(df))
+    snapshot = ref() if ref is not None else None
+    if snapshot is None or not any(frame is df for frame in snapshot.frames()):
+        return None
+    return snapshot
+
+
+def file_signature(paths):
+    """Lấy (mtime, size) của các file nguồn để phát hiện thay đổi."""
+    signature = []
+    for path in paths:
+        if path is None:
+            signature.append(None)
+            continue
+        stat = os.stat(path)
+        signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def _stat_or_none(path):
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+
+class CatalogSnapshot:
+    """Dữ liệu food/place/hotel đã chuẩn hóa tại một phiên bản, dùng chung chỉ-đọc giữa các request.
+
+    previous là snapshot trước khi tải lại (chỉ giữ trong lúc dựng các cấu trúc eager): DataFrame nào vẫn là
+    cùng đối tượng thì tập dữ liệu đó không đổi và các cấu trúc chỉ đọc tập đó được dùng lại.
+    """
+
+    def __init__(self, version, food_df, place_df, hotel_df, previous=None):
+        self.version = version
+        self.food_df = food_df
+        self.place_df = place_df
+        self.hotel_df = hotel_df
+        self.previous = previous
+        if previous is None:
+            self.changed = frozenset(DATASETS)
+        else:
+            self.changed = frozenset(dataset for dataset, df, old in zip(DATASETS, self.frames(), previous.frames())
+                                     if df is not old)
+        self._derived = {}
+        self._lock = threading.RLock()
+        ref = weakref.ref(self)
+        for df in self.frames():
+            if df is not None:
+                _FRAME_OWNERS[id(df)] = ref
+                weakref.finalize(self, _forget_frame, id(df), ref)
+
+    def frames(self):
+        return self.food_df, self.place_df, self.hotel_df
+
+    def frame(self, dataset):
+        return self.frames()[DATASETS.index(dataset)]
+
+    def derived(self, name):
+        """Lấy cấu trúc dẫn xuất đã đăng ký, chỉ xây một lần cho snapshot này."""
+        try:
+            return self._derived[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = self._build(name)
+            return self._derived[name]
+
+    def _build(self, name):
+        builder = _DERIVED_BUILDERS[name]
+        previous = self.previous._derived.get(name) if self.previous is not None else None
+        if previous is not None and not self.changed & _DERIVED_DATASETS[name]:
+            return previous
+        if name not in _PER_DATASET:
+            return builder(self)
+        parts = {}
+        for dataset, df in zip(DATASETS, self.frames()):
+            if df is None:
+                continue
+            part = previous.get(dataset) if previous is not None and dataset not in self.changed else None
+            if part is None:
+                part = builder(self, dataset)
+            if part is not None:
+                parts[dataset] = part
+        return parts
+
+
+class Catalog:
+    """Catalog dùng chung trong tiến trình: parse file một lần, tải lại khi file đổi hoặc có ghi từ admin."""
+
+    def __init__(self, loader, *paths, eager=None, watch=None, reload=None):
+        self._loader = loader
+        self._paths = paths
+        # File nguồn -> file không truyền cho loader nhưng thay đổi thì phải tải lại (vd. nhật ký thay đổi của admin)
+        self._watch = dict(watch or {})
+        # reload(frames, changed, *paths): chỉ đọc lại các tập dữ liệu trong changed, giữ nguyên DataFrame còn lại;
+        # None = luôn gọi loader đọc lại toàn bộ
+        self._reload = reload
+        # Tên các cấu trúc dẫn xuất xây ngay khi tải; None = mọi cấu trúc đăng ký eager
+        self._eager = eager
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._signature = None
+        self._feed_version = None
+        self._recheck_at = 0.0
+        self._stale = False
+
+    @property
+    def paths(self):
+        return self._paths
+
+    def _current_signature(self):
+        watched = [_stat_or_none(self._watch[path]) if path in self._watch else None for path in self._paths]
+        return tuple(zip(file_signature(self._paths),
+                         ((stat.st_mtime_ns, stat.st_size) if stat else None for stat in watched)))
+
+    def _load(self, signature):
+        """Đọc lại các file nguồn: chỉ các tập dữ liệu có file (hoặc nhật ký) đổi nếu catalog có hàm reload."""
+        previous = self._snapshot
+        if previous is None or self._reload is None:
+            return self._loader(*self._paths), None
+        changed = {dataset for dataset, old, new in zip(DATASETS, self._signature, signature) if old != new}
+        if not changed:
+            # Bị đánh dấu cũ nhưng file không đổi (vd. ghi trong cùng tick mtime): đọc lại toàn bộ cho chắc
+            return self._loader(*self._paths), None
+        return self._reload(previous.frames(), changed, *self._paths), previous
+
+    def _is_current(self, signature):
+        return self._snapshot is not None and not self._stale and signature == self._signature
+
+    def snapshot(self):
+        """Trả về snapshot hiện tại, tải lại nếu file nguồn đã thay đổi.
+
+        Khi có kênh báo thay đổi, file nguồn chỉ được stat lại sau khi phiên bản trên kênh đổi.
+        """
+        feed = _change_feed
+        # Đọc phiên bản kênh trước khi stat để thay đổi đến giữa chừng vẫn kích hoạt lần kiểm tra sau
+        feed_version = feed.current_version() if feed is not None else None
+        snapshot = self._snapshot
+        if feed_version is not None and feed_version == self._feed_version and snapshot is not None \
+                and not self._stale and time.monotonic() < self._recheck_at:
+            return snapshot
+
+        signature = self._current_signature()
+        if self._is_current(signature):
+            self._feed_version = feed_version
+            self._recheck_at = time.monotonic() + FILE_RECHECK_SECONDS
+            return snapshot
+
+        with self._lock:
+            signature = self._current_signature()
+            if not self._is_current(signature):
+                # Hạ cờ trước khi tải để một lần bump trong lúc tải vẫn kích hoạt lần tải sau
+                self._stale = False
+                started = time.perf_counter()
+                (food_df, place_df, hotel_df), previous = self._load(signature)
+                version = hashlib.sha1(repr(signature).encode("utf-8")).hexdigest()[:12]
+                snapshot = CatalogSnapshot(version, food_df, place_df, hotel_df, previous=previous)
+                for name in (_EAGER_DERIVED if self._eager is None else self._eager):
+                    snapshot.derived(name)
+                # Bỏ tham chiếu tới snapshot cũ để không giữ lại cả chuỗi phiên bản
+                snapshot.previous = None
+                self._snapshot = snapshot
+                self._signature = signature
+                if feed is not None:
+                    feed.record_reload(time.perf_counter() - started)
+            self._feed_version = feed_version
+            self._recheck_at = time.monotonic() + FILE_RECHECK_SECONDS
+            return self._snapshot
+
+    @property
+    def version(self):
+        return self.snapshot().version
+
+    def bump_version(self):
+        """Đánh dấu catalog cũ sau khi admin ghi dữ liệu, request kế tiếp sẽ tải lại (chỉ tập dữ liệu có file
+        hoặc nhật ký đổi); báo cho các worker khác."""
+        self._stale = True
+        if _change_feed is not None:
+            _change_feed.publish()
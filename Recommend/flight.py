@@ -1,22 +1,10 @@
 import os
 import requests
-from django.http import JsonResponse
 from dotenv import load_dotenv
 
-load_dotenv()
+from .gazetteer import airport_code
 
-airport_info = {
-    "quảng nam": "VCL", "chu lai": "VCL", "thanh hóa": "THD", "thọ xuân": "THD",
-    "quảng bình": "VDH", "đồng hới": "VDH", "điện biên": "DIN", "điện biên phủ": "DIN",
-    "phú yên": "TBB", "tuy hòa": "TBB", "gia lai": "PXU", "pleiku": "PXU",
-    "đắk lắk": "BMV", "buôn mê thuột": "BMV", "kiên giang": "VKG", "rạch giá": "VKG",
-    "cà mau": "CAH", "vũng tàu": "VCS", "bà rịa – vũng tàu": "VCS", "côn đảo": "VCS", "hà nội": "HAN",
-    "nội bài": "HAN", "hồ chí minh": "SGN", "tân sơn nhất": "SGN", "sài gòn": "SGN",
-    "phú quốc": "PQC", "đà nẵng": "DAD", "khánh hòa": "CXR", "cam ranh": "CXR",
-    "huế": "HUI", "thừa thiên huế": "HUI", "phú bài": "HUI", "quảng ninh": "VDO",
-    "vân đồn": "VDO", "cần thơ": "VCA", "nghệ an": "VII", "vinh": "VII", "bình định": "UIH",
-    "phù cát": "UIH", "hải phòng": "HPH", "cát bi": "HPH", "lâm đồng": "DLI", "liên khương": "DLI"
-}
+load_dotenv()
 
 def get_access_token():
     data = {
@@ -66,8 +54,8 @@ def search_flight_service(origin_city, destination_city, departure_date):
     if not token:
         return {"error": "Không thể lấy Access Token"}
 
-    origin = airport_info.get(origin_city.lower())
-    destination = airport_info.get(destination_city.lower())
+    origin = airport_code(origin_city)
+    destination = airport_code(destination_city)
 
     if not origin or not destination:
         return {"error": "Thành phố hoặc tên sân bay không đúng"}
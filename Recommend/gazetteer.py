@@ -0,0 +1,257 @@
+import functools
+from collections import deque
+
+import unidecode
+
+# Danh mục tỉnh/thành dùng chung: khóa tỉnh chuẩn (không dấu, không tiền tố "tp.") ->
+# (tên hiển thị, mã sân bay mặc định hoặc None, các tên gọi khác: thành phố, địa danh, tên sân bay)
+PROVINCES = {
+    "an giang": ("An Giang", None, ("long xuyen", "chau doc")),
+    "ba ria vung tau": ("Bà Rịa – Vũng Tàu", "VCS", ("vung tau", "ba ria", "con dao", "brvt")),
+    "bac giang": ("Bắc Giang", None, ()),
+    "bac kan": ("Bắc Kạn", None, ("bac can",)),
+    "bac lieu": ("Bạc Liêu", None, ()),
+    "bac ninh": ("Bắc Ninh", None, ()),
+    "ben tre": ("Bến Tre", None, ()),
+    "binh dinh": ("Bình Định", "UIH", ("quy nhon", "phu cat")),
+    "binh duong": ("Bình Dương", None, ("thu dau mot",)),
+    "binh phuoc": ("Bình Phước", None, ("dong xoai",)),
+    "binh thuan": ("Bình Thuận", None, ("phan thiet", "mui ne")),
+    "ca mau": ("Cà Mau", "CAH", ()),
+    "can tho": ("Cần Thơ", "VCA", ()),
+    "cao bang": ("Cao Bằng", None, ()),
+    "da nang": ("Đà Nẵng", "DAD", ()),
+    "dak lak": ("Đắk Lắk", "BMV", ("daklak", "dac lac", "buon me thuot", "buon ma thuot")),
+    "dak nong": ("Đắk Nông", None, ("gia nghia",)),
+    "dien bien": ("Điện Biên", "DIN", ("dien bien phu",)),
+    "dong nai": ("Đồng Nai", None, ("bien hoa",)),
+    "dong thap": ("Đồng Tháp", None, ("cao lanh", "sa dec")),
+    "gia lai": ("Gia Lai", "PXU", ("pleiku",)),
+    "ha giang": ("Hà Giang", None, ()),
+    "ha nam": ("Hà Nam", None, ("phu ly",)),
+    "ha noi": ("Hà Nội", "HAN", ("hanoi", "noi bai")),
+    "ha tinh": ("Hà Tĩnh", None, ()),
+    "hai duong": ("Hải Dương", None, ()),
+    "hai phong": ("Hải Phòng", "HPH", ("cat bi", "cat ba")),
+    "hau giang": ("Hậu Giang", None, ("vi thanh",)),
+    "ho chi minh": ("TP. Hồ Chí Minh", "SGN", ("hcm", "tphcm", "sai gon", "saigon", "tan son nhat")),
+    "hoa binh": ("Hòa Bình", None, ()),
+    "hung yen": ("Hưng Yên", None, ()),
+    "khanh hoa": ("Khánh Hòa", "CXR", ("nha trang", "cam ranh")),
+    "kien giang": ("Kiên Giang", "VKG", ("rach gia", "phu quoc", "ha tien")),
+    "kon tum": ("Kon Tum", None, ()),
+    "lai chau": ("Lai Châu", None, ()),
+    "lam dong": ("Lâm Đồng", "DLI", ("da lat", "dalat", "lien khuong", "bao loc")),
+    "lang son": ("Lạng Sơn", None, ()),
+    "lao cai": ("Lào Cai", None, ("sa pa", "sapa")),
+    "long an": ("Long An", None, ("tan an",)),
+    "nam dinh": ("Nam Định", None, ()),
+    "nghe an": ("Nghệ An", "VII", ("vinh", "cua lo")),
+    "ninh binh": ("Ninh Bình", None, ("trang an",)),
+    "ninh thuan": ("Ninh Thuận", None, ("phan rang", "phan rang thap cham")),
+    "phu tho": ("Phú Thọ", None, ("viet tri",)),
+    "phu yen": ("Phú Yên", "TBB", ("tuy hoa",)),
+    "quang binh": ("Quảng Bình", "VDH", ("dong hoi", "phong nha")),
+    "quang nam": ("Quảng Nam", "VCL", ("chu lai", "hoi an", "tam ky")),
+    "quang ngai": ("Quảng Ngãi", None, ("ly son",)),
+    "quang ninh": ("Quảng Ninh", "VDO", ("ha long", "van don", "mong cai")),
+    "quang tri": ("Quảng Trị", None, ("dong ha",)),
+    "soc trang": ("Sóc Trăng", None, ()),
+    "son la": ("Sơn La", None, ("moc chau",)),
+    "tay ninh": ("Tây Ninh", None, ()),
+    "thai binh": ("Thái Bình", None, ()),
+    "thai nguyen": ("Thái Nguyên", None, ()),
+    "thanh hoa": ("Thanh Hóa", "THD", ("tho xuan", "sam son")),
+    "thua thien hue": ("Thừa Thiên Huế", "HUI", ("hue", "phu bai")),
+    "tien giang": ("Tiền Giang", None, ("my tho",)),
+    "tra vinh": ("Trà Vinh", None, ()),
+    "tuyen quang": ("Tuyên Quang", None, ()),
+    "vinh long": ("Vĩnh Long", None, ()),
+    "vinh phuc": ("Vĩnh Phúc", None, ("vinh yen", "tam dao")),
+    "yen bai": ("Yên Bái", None, ()),
+}
+
+# Tên gọi có sân bay riêng khác sân bay mặc định của tỉnh
+AIRPORT_OVERRIDES = {
+    "phu quoc": "PQC",
+}
+
+# Danh sách các tỉnh lân cận theo khóa tỉnh chuẩn
+NEIGHBOURS = {
+    "ha giang": ["tuyen quang", "cao bang"],
+    "cao bang": ["ha giang", "lang son"],
+    "lang son": ["cao bang", "bac giang"],
+    "bac giang": ["lang son", "thai nguyen"],
+    "bac kan": ["thai nguyen", "cao bang"],
+    "thai nguyen": ["bac giang", "phu tho"],
+    "phu tho": ["thai nguyen", "vinh phuc"],
+    "vinh phuc": ["phu tho", "ha noi"],
+    "ha noi": ["vinh phuc", "bac ninh"],
+    "bac ninh": ["ha noi", "hung yen"],
+    "hung yen": ["bac ninh", "hai duong"],
+    "hai duong": ["hung yen", "quang ninh"],
+    "quang ninh": ["hai duong", "lang son"],
+    "hai phong": ["quang ninh", "hai duong", "thai binh"],
+    "thai binh": ["nam dinh", "hai phong"],
+    "nam dinh": ["thai binh", "ha nam"],
+    "ha nam": ["nam dinh", "ninh binh"],
+    "ninh binh": ["ha nam", "thanh hoa"],
+    "thanh hoa": ["ninh binh", "nghe an"],
+    "nghe an": ["thanh hoa", "ha tinh"],
+    "ha tinh": ["nghe an", "quang binh"],
+    "quang binh": ["ha tinh", "quang tri"],
+    "quang tri": ["quang binh", "thua thien hue"],
+    "thua thien hue": ["quang tri", "da nang"],
+    "da nang": ["thua thien hue", "quang nam"],
+    "quang nam": ["da nang", "quang ngai"],
+    "quang ngai": ["quang nam", "binh dinh"],
+    "binh dinh": ["quang ngai", "phu yen"],
+    "phu yen": ["binh dinh", "khanh hoa"],
+    "khanh hoa": ["phu yen", "ninh thuan"],
+    "ninh thuan": ["khanh hoa", "binh thuan"],
+    "binh thuan": ["ninh thuan", "dong nai"],
+    "dong nai": ["binh thuan", "binh duong"],
+    "binh duong": ["dong nai", "binh phuoc"],
+    "binh phuoc": ["binh duong", "tay ninh"],
+    "tay ninh": ["binh phuoc", "ho chi minh"],
+    "ho chi minh": ["tay ninh", "binh duong"],
+    "ba ria vung tau": ["dong nai", "binh thuan"],
+    "long an": ["ho chi minh", "tien giang"],
+    "tien giang": ["long an", "ben tre"],
+    "ben tre": ["tien giang", "tra vinh"],
+    "tra vinh": ["ben tre", "vinh long"],
+    "vinh long": ["tra vinh", "an giang"],
+    "an giang": ["vinh long", "dong thap"],
+    "dong thap": ["an giang", "tien giang"],
+    "kien giang": ["dong thap", "can tho"],
+    "can tho": ["kien giang", "hau giang"],
+    "hau giang": ["can tho", "soc trang"],
+    "soc trang": ["hau giang", "bac lieu"],
+    "bac lieu": ["soc trang", "ca mau"],
+    "ca mau": ["bac lieu", "kien giang"],
+    "kon tum": ["gia lai", "dak nong"],
+    "gia lai": ["kon tum", "dak lak"],
+    "dak lak": ["gia lai", "dak nong"],
+    "dak nong": ["dak lak", "lam dong"],
+    "lam dong": ["dak nong", "khanh hoa"],
+    "hoa binh": ["phu tho", "son la"],
+    "son la": ["hoa binh", "yen bai"],
+    "yen bai": ["son la", "lao cai"],
+    "lao cai": ["yen bai", "lai chau"],
+    "lai chau": ["lao cai", "dien bien"],
+    "dien bien": ["lai chau", "son la"],
+    "tuyen quang": ["ha giang", "vinh phuc"]
+}
+
+# Số bước lân cận tối đa khi mở rộng lịch trình ra các tỉnh xung quanh
+MAX_NEIGHBOUR_HOPS = 3
+
+_PREFIXES = ("tp.", "tp ", "thanh pho ", "tinh ")
+
+
+def normalize_text(text):
+    """Chuẩn hóa văn bản: loại bỏ dấu, chuyển thành chữ thường (giá trị không phải chuỗi thành "")."""
+    if isinstance(text, str):
+        return _normalize_str(text)
+    return ""
+
+# Tên tỉnh/địa điểm lặp lại rất nhiều giữa các dòng và giữa các lần tải lại catalog
+@functools.lru_cache(maxsize=1 << 16)
+def _normalize_str(text):
+    return unidecode.unidecode(text.lower().strip())
+
+
+def normalize_name(text):
+    """Chuẩn hóa tên tỉnh/địa danh: bỏ dấu, chữ thường, bỏ tiền tố 'tp.'/'tỉnh', bỏ gạch nối."""
+    key = normalize_text(text)
+    for prefix in _PREFIXES:
+        if key.startswith(prefix):
+            key = key[len(prefix):]
+    return " ".join(key.replace("-", " ").split())
+
+
+def _build_aliases():
+    aliases = {}
+    for province, (name, _, other_names) in PROVINCES.items():
+        for alias in (province, name, *other_names):
+            aliases[normalize_name(alias)] = province
+    return aliases
+
+
+def _build_hop_distances():
+    """BFS từ mỗi tỉnh trên đồ thị lân cận (vô hướng) để có số bước giữa mọi cặp tỉnh."""
+    graph = {province: set() for province in PROVINCES}
+    for province, nearby in NEIGHBOURS.items():
+        for other in nearby:
+            graph[province].add(other)
+            graph[other].add(province)
+
+    distances = {}
+    for source in graph:
+        hops = {source: 0}
+        queue = deque([source])
+        while queue:
+            current = queue.popleft()
+            for other in sorted(graph[current]):
+                if other not in hops:
+                    hops[other] = hops[current] + 1
+                    queue.append(other)
+        distances[source] = hops
+    return distances
+
+
+def _build_rings(distances):
+    """Với mỗi tỉnh: danh sách các vòng lân cận (vòng k gồm các tỉnh cách k bước), tới MAX_NEIGHBOUR_HOPS."""
+    rings = {}
+    for source, hops in distances.items():
+        by_hop = [[] for _ in range(MAX_NEIGHBOUR_HOPS)]
+        for province, hop in hops.items():
+            if 0 < hop <= MAX_NEIGHBOUR_HOPS:
+                by_hop[hop - 1].append(province)
+        rings[source] = [tuple(sorted(ring)) for ring in by_hop if ring]
+    return rings
+
+
+# Mọi tên gọi (có dấu, không dấu, thành phố, sân bay) -> khóa tỉnh chuẩn, dựng một lần khi import
+ALIASES = _build_aliases()
+# Số bước giữa mọi cặp tỉnh liên thông và các vòng lân cận, tính sẵn khi import
+HOP_DISTANCES = _build_hop_distances()
+NEIGHBOUR_RINGS = _build_rings(HOP_DISTANCES)
+AIRPORTS = {alias: AIRPORT_OVERRIDES.get(alias, PROVINCES[province][1]) for alias, province in ALIASES.items()}
+
+
+def province_key(text):
+    """Khóa so khớp của tỉnh: khóa chuẩn nếu là tên gọi đã biết, ngược lại tên đã chuẩn hóa."""
+    key = normalize_name(text)
+    return ALIASES.get(key, key)
+
+
+def resolve_province(text):
+    """Khóa tỉnh chuẩn của một tên gọi bất kỳ (None nếu không nhận ra)."""
+    return ALIASES.get(normalize_name(text))
+
+
+def province_name(text):
+    """Tên hiển thị của tỉnh (None nếu không nhận ra)."""
+    province = resolve_province(text)
+    return PROVINCES[province][0] if province else None
+
+
+def airport_code(text):
+    """Mã IATA sân bay cho tên tỉnh/thành phố/sân bay (None nếu không có sân bay)."""
+    return AIRPORTS.get(normalize_name(text))
+
+
+def neighbours(text):
+    """Danh sách khóa tỉnh lân cận."""
+    return NEIGHBOURS.get(province_key(text), [])
+
+
+def hop_distance(source, target):
+    """Số bước lân cận giữa hai tỉnh (None nếu không liên thông hoặc không nhận ra)."""
+    return HOP_DISTANCES.get(province_key(source), {}).get(province_key(target))
+
+
+def neighbour_rings(text):
+    """Các vòng tỉnh lân cận theo thứ tự gần tới xa (vòng 1 là tỉnh giáp ranh)."""
+    return NEIGHBOUR_RINGS.get(province_key(text), [])
@@ -0,0 +1,180 @@
+import math
+import re
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Open Location Code (Plus Code) ở đầu địa chỉ Google Maps, vd. "CC4C+W7F, Phường 4, ..."
+OLC_ALPHABET = "23456789CFGHJMPQRVWX"
+_OLC_VALUES = {char: value for value, char in enumerate(OLC_ALPHABET)}
+_OLC_PAIR_RESOLUTIONS = (20.0, 1.0, 0.05, 0.0025, 0.000125)
+PLUS_CODE_PATTERN = re.compile(rf"^\s*([{OLC_ALPHABET}]{{2,8}}\+[{OLC_ALPHABET}]{{2,7}})\b")
+
+# Tâm tham chiếu (lat, lng) của từng tỉnh theo khóa province_key, dùng để khôi phục mã Plus Code rút gọn.
+# Mã rút gọn 4 ký tự chỉ đúng khi điểm thật cách tâm dưới 0.5 độ nên tâm được dời về vùng có nhiều địa điểm.
+PROVINCE_CENTERS = {
+    "an giang": (10.45, 105.2), "ba ria vung tau": (10.45, 107.2), "bac giang": (21.3, 106.3),
+    "bac kan": (22.15, 105.8), "bac lieu": (9.3, 105.6), "bac ninh": (21.15, 106.05),
+    "ben tre": (10.2, 106.4), "binh dinh": (14.1, 108.9), "binh duong": (11.1, 106.65),
+    "binh phuoc": (11.7, 106.8), "binh thuan": (11.1, 108.1), "ca mau": (9.1, 105.1),
+    "can tho": (10.05, 105.65), "cao bang": (22.7, 106.1), "da nang": (16.05, 108.15),
+    "dak lak": (12.7, 108.1), "dak nong": (12.2, 107.7), "dien bien": (21.6, 103.0),
+    "dong nai": (11.05, 107.1), "dong thap": (10.5, 105.65), "gia lai": (13.8, 108.2),
+    "ha giang": (22.9, 105.0), "ha nam": (20.55, 105.95), "ha noi": (21.0, 105.8),
+    "ha tinh": (18.3, 105.8), "hai duong": (20.95, 106.35), "hai phong": (20.85, 106.7),
+    "hau giang": (9.8, 105.6), "ho chi minh": (10.75, 106.65), "hoa binh": (20.75, 105.4),
+    "hung yen": (20.8, 106.05), "khanh hoa": (12.3, 109.1), "kien giang": (10.0, 105.1),
+    "kon tum": (14.5, 107.9), "lai chau": (22.3, 103.4), "lam dong": (11.75, 108.2),
+    "lang son": (21.8, 106.6), "lao cai": (22.35, 104.0), "long an": (10.7, 106.2),
+    "nam dinh": (20.3, 106.2), "nghe an": (19.0, 105.4), "ninh binh": (20.2, 105.95),
+    "ninh thuan": (11.6, 108.9), "phu tho": (21.3, 105.2), "phu yen": (13.2, 109.1),
+    "quang binh": (17.5, 106.4), "quang nam": (15.65, 108.1), "quang ngai": (15.1, 108.8),
+    "quang ninh": (21.0, 107.1), "quang tri": (16.8, 107.0), "soc trang": (9.6, 105.9),
+    "son la": (21.1, 104.2), "tay ninh": (11.3, 106.2), "thai binh": (20.5, 106.35),
+    "thai nguyen": (21.6, 105.8), "thanh hoa": (19.9, 105.6), "thua thien hue": (16.4, 107.6),
+    "tien giang": (10.4, 106.3), "tra vinh": (9.85, 106.35), "tuyen quang": (21.9, 105.25),
+    "vinh long": (10.2, 106.0), "vinh phuc": (21.35, 105.6), "yen bai": (21.7, 104.8),
+}
+
+# Huyện đảo/huyện xa tâm tỉnh quá 0.5 độ cần tâm tham chiếu riêng, khóa (province_key, huyện không dấu)
+DISTRICT_CENTERS = {
+    ("kien giang", "phu quoc"): (10.25, 103.95),
+    ("kien giang", "kien hai"): (9.8, 104.4),
+    ("ba ria vung tau", "con dao"): (8.7, 106.6),
+    ("quang ninh", "mong cai"): (21.5, 107.9),
+    ("quang ninh", "co to"): (21.0, 107.75),
+    ("quang ninh", "van don"): (21.1, 107.5),
+    ("binh thuan", "phu quy"): (10.5, 108.95),
+}
+
+
+def _decode_offset(digits, first_pair):
+    """Giải mã các ký tự Plus Code thành độ lệch (lat, lng) của tâm ô so với gốc lưới."""
+    lat = lng = 0.0
+    pair_digits = digits[:10 - 2 * first_pair]
+    for position in range(0, len(pair_digits), 2):
+        resolution = _OLC_PAIR_RESOLUTIONS[first_pair + position // 2]
+        lat += _OLC_VALUES[pair_digits[position]] * resolution
+        lng += _OLC_VALUES[pair_digits[position + 1]] * resolution
+    lat_resolution = lng_resolution = _OLC_PAIR_RESOLUTIONS[first_pair + len(pair_digits) // 2 - 1]
+    for char in digits[len(pair_digits):]:
+        # Sau 10 ký tự, mỗi ký tự chia ô thành lưới 5 hàng x 4 cột
+        lat_resolution /= 5
+        lng_resolution /= 4
+        row, col = divmod(_OLC_VALUES[char], 4)
+        lat += row * lat_resolution
+        lng += col * lng_resolution
+    return lat + lat_resolution / 2, lng + lng_resolution / 2
+
+
+def decode_plus_code(code, reference=None):
+    """Giải mã Plus Code (đầy đủ hoặc rút gọn) thành (lat, lng); mã rút gọn cần điểm tham chiếu gần đó."""
+    code = code.strip().upper()
+    separator = code.find("+")
+    digits = code.replace("+", "")
+    if separator < 2 or separator > 8 or separator % 2 or len(digits) - separator == 1:
+        return None
+    if any(char not in _OLC_VALUES for char in digits):
+        return None
+
+    padding = 8 - separator
+    if not padding:
+        lat, lng = _decode_offset(digits, 0)
+        return lat - 90, lng - 180
+    if reference is None:
+        return None
+
+    # Lấy phần đầu bị lược bỏ từ ô chứa điểm tham chiếu, rồi chọn ô kề gần tham chiếu nhất
+    resolution = _OLC_PAIR_RESOLUTIONS[padding // 2 - 1]
+    ref_lat, ref_lng = reference
+    lat, lng = _decode_offset(digits, padding // 2)
+    lat += math.floor((ref_lat + 90) / resolution) * resolution - 90
+    lng += math.floor((ref_lng + 180) / resolution) * resolution - 180
+    if lat - ref_lat > resolution / 2:
+        lat -= resolution
+    elif ref_lat - lat > resolution / 2:
+        lat += resolution
+    if lng - ref_lng > resolution / 2:
+        lng -= resolution
+    elif ref_lng - lng > resolution / 2:
+        lng += resolution
+    return lat, lng
+
+
+def extract_plus_code(address):
+    """Lấy Plus Code ở đầu địa chỉ (None nếu không có)."""
+    if not isinstance(address, str):
+        return None
+    match = PLUS_CODE_PATTERN.match(address)
+    return match.group(1) if match else None
+
+
+def reference_point(province, district=None):
+    """Điểm tham chiếu để khôi phục mã rút gọn: tâm huyện đặc biệt nếu có, ngược lại tâm tỉnh."""
+    return DISTRICT_CENTERS.get((province, district)) or PROVINCE_CENTERS.get(province)
+
+
+def haversine_matrix(lat, lng):
+    """Ma trận khoảng cách (km) giữa mọi cặp điểm, tính vectorized bằng numpy."""
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lng = np.radians(np.asarray(lng, dtype=float))
+    dlat = lat[:, None] - lat[None, :]
+    dlng = lng[:, None] - lng[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _path_length(distances, order):
+    return sum(distances[a][b] for a, b in zip(order, order[1:]))
+
+
+def plan_route(distances, kinds=None):
+    """Sắp thứ tự các điểm dừng bằng láng giềng gần nhất rồi cải thiện bằng 2-opt (đường đi mở).
+
+    kinds là loại của từng điểm theo thứ tự ban đầu (vd. food/place); thứ tự loại theo vị trí được
+    giữ nguyên nên bữa ăn vẫn rơi đúng khung giờ. Trả về danh sách chỉ số điểm theo thứ tự mới.
+    """
+    n = len(distances)
+    if n < 3:
+        return list(range(n))
+    if not isinstance(distances, list):
+        distances = distances.tolist()
+    kinds = list(kinds) if kinds is not None else [None] * n
+
+    # Láng giềng gần nhất, thử mọi điểm xuất phát cùng loại với vị trí đầu
+    best = None
+    for start in range(n):
+        if kinds[start] != kinds[0]:
+            continue
+        order = [start]
+        remaining = [k for k in range(n) if k != start]
+        for position in range(1, n):
+            row = distances[order[-1]]
+            nearest = min((k for k in remaining if kinds[k] == kinds[position]), key=row.__getitem__)
+            order.append(nearest)
+            remaining.remove(nearest)
+        length = _path_length(distances, order)
+        if best is None or length < best[0]:
+            best = (length, order)
+    order = best[1]
+
+    # 2-opt: đảo đoạn [i, j] nếu giảm tổng quãng đường và không làm đổi thứ tự loại
+    improved = True
+    while improved:
+        improved = False
+        for i in range(n - 1):
+            for j in range(i + 1, n):
+                if any(kinds[order[i + k]] != kinds[order[j - k]] for k in range(j - i + 1)):
+                    continue
+                before = after = 0.0
+                if i > 0:
+                    before += distances[order[i - 1]][order[i]]
+                    after += distances[order[i - 1]][order[j]]
+                if j < n - 1:
+                    before += distances[order[j]][order[j + 1]]
+                    after += distances[order[i]][order[j + 1]]
+                if after < before - 1e-9:
+                    order[i:j + 1] = order[i:j + 1][::-1]
+                    improved = True
+    return order
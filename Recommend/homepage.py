@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from .catalog import register_derived
+from .gazetteer import province_key
+
+# dataset -> (cột tên, cột rating, các cột trả về cho trang chủ)
+HOMEPAGE_COLUMNS = {
+    "food": ("title", "rating", ['title', 'rating', 'description', 'address', 'img', 'province_name']),
+    "place": ("title", "rating", ['title', 'rating', 'description', 'address', 'img', 'link', 'province_name']),
+    "hotel": ("name", "location_rating", ['name', 'link', 'description', 'price', 'name_nearby_place', 'hotel_class',
+                                          'img_origin', 'location_rating', 'province_name', 'animates']),
+}
+MIN_HOMEPAGE_RATING = 3
+MAX_HOMEPAGE_RATING = 5
+
+_rng = np.random.default_rng()
+
+
+class HomepageBuckets:
+    """Các dòng đủ điều kiện lên trang chủ, nhóm theo tỉnh dạng CSR (order/starts/counts).
+
+    Bản ghi trả về được dựng sẵn một lần cho mỗi phiên bản catalog; mỗi lần lấy chỉ là vài phép numpy.
+    """
+
+    def __init__(self, df, name_column, rating_column, columns):
+        eligible = df.dropna(subset=[rating_column, name_column])
+        eligible = eligible[(eligible[rating_column] >= MIN_HOMEPAGE_RATING)
+                            & (eligible[rating_column] <= MAX_HOMEPAGE_RATING)].drop_duplicates(name_column)
+        rows = eligible.reindex(columns=columns).rename(columns={'province_name': 'province'})
+        self.records = rows.fillna('N/A').to_dict('records')
+
+        codes, _ = pd.factorize(eligible['province_name'].map(province_key))
+        self.order = np.argsort(codes, kind='stable')
+        self.counts = np.bincount(codes) if len(codes) else np.empty(0, dtype=np.intp)
+        self.starts = np.concatenate(([0], np.cumsum(self.counts)[:-1])) if len(codes) else self.counts
+
+    def sample(self, num_item, rng=None):
+        """Mỗi tỉnh một dòng ngẫu nhiên, lấy ngẫu nhiên num_item tỉnh (hoặc tất cả nếu không đủ)."""
+        rng = rng or _rng
+        province_count = len(self.counts)
+        if province_count == 0:
+            return []
+        provinces = rng.permutation(province_count)[:num_item] if province_count >= num_item else np.arange(province_count)
+        picks = self.starts[provinces] + (rng.random(len(provinces)) * self.counts[provinces]).astype(np.intp)
+        return [dict(self.records[row]) for row in self.order[picks]]
+
+
+@register_derived("homepage_buckets", eager=True, per_dataset=True)
+def _build_homepage_buckets(snapshot, dataset):
+    return HomepageBuckets(snapshot.frame(dataset), *HOMEPAGE_COLUMNS[dataset])
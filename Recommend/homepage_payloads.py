@@ -0,0 +1,97 @@
+import json
+import random
+import logging
+import threading
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .processed import get_food_homepage, get_place_homepage, get_catalog
+from .hotel import get_hotel_homepage, get_hotel_catalog
+
+logger = logging.getLogger(__name__)
+
+# Số payload ngẫu nhiên dựng sẵn cho mỗi API trang chủ và chu kỳ làm mới (giây)
+RING_SIZE = 16
+ROTATE_SECONDS = 180
+
+
+class PayloadRing:
+    """Vòng K danh sách JSON (bytes) dựng sẵn cho một API trang chủ, mỗi request lấy ngẫu nhiên một ô.
+
+    Vòng được dựng lại khi phiên bản catalog nguồn đổi (admin sửa dữ liệu) hoặc theo chu kỳ của luồng nền.
+    """
+
+    def __init__(self, render, version, size=RING_SIZE):
+        self._render = render
+        self._version = version
+        self._size = size
+        self._lock = threading.Lock()
+        # (phiên bản catalog, tuple payload); tuple rỗng khi không có dữ liệu
+        self._state = None
+
+    def refresh(self):
+        version = self._version()
+        slots = []
+        for _ in range(self._size):
+            items = self._render()
+            if not items:
+                break
+            slots.append(json.dumps(items, cls=DjangoJSONEncoder, ensure_ascii=False).encode("utf-8"))
+        self._state = (version, tuple(slots))
+        return self._state
+
+    def get(self):
+        """Một payload ngẫu nhiên trong vòng (None nếu không có dữ liệu)."""
+        state = self._state
+        if state is None or state[0] != self._version():
+            with self._lock:
+                state = self._state
+                if state is None or state[0] != self._version():
+                    state = self.refresh()
+        slots = state[1]
+        return random.choice(slots) if slots else None
+
+
+# Khóa JSON của danh sách -> vòng payload
+_rings = {
+    "foods": PayloadRing(get_food_homepage, lambda: get_catalog().version),
+    "places": PayloadRing(get_place_homepage, lambda: get_catalog().version),
+    "hotels": PayloadRing(get_hotel_homepage, lambda: get_hotel_catalog().version),
+}
+_rotator = None
+_rotator_lock = threading.Lock()
+
+
+def _rotate_forever(stop):
+    while not stop.wait(ROTATE_SECONDS):
+        for key, ring in _rings.items():
+            try:
+                ring.refresh()
+            except Exception as e:
+                logger.warning(f"Không làm mới được payload trang chủ {key}: {e}")
+
+
+def start_rotation():
+    """Khởi động luồng nền làm mới các vòng payload (một luồng cho mỗi tiến trình worker)."""
+    global _rotator
+    if _rotator is None:
+        with _rotator_lock:
+            if _rotator is None:
+                _rotator = threading.Thread(target=_rotate_forever, args=(threading.Event(),),
+                                            name="homepage-payloads", daemon=True)
+                _rotator.start()
+
+
+def homepage_payload(key, **extra):
+    """Body JSON (bytes) của API trang chủ: danh sách dựng sẵn + các trường theo request (timestamp, csrf_token).
+
+    Trả về None nếu không có dữ liệu.
+    """
+    start_rotation()
+    items = _rings[key].get()
+    if items is None:
+        return None
+    tail = json.dumps(extra, ensure_ascii=False).encode("utf-8")
+    if len(tail) > 2:
+        return b'{"' + key.encode("ascii") + b'": ' + items + b", " + tail[1:]
+    return b'{"' + key.encode("ascii") + b'": ' + items + b"}"
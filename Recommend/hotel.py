@@ -1,77 +1,100 @@
 import pandas as pd
+import numpy as np
 import re
 import os
-import unidecode
 import random
+import threading
+
+from .catalog import Catalog
+from . import homepage  # noqa: F401 (đăng ký bucket trang chủ cho catalog)
+from . import hotel_index  # noqa: F401 (đăng ký index/facet khách sạn cho catalog)
+from .hotel_store import HotelStore
+from .journal import register_table
 
 csv_filename = os.path.join(os.path.dirname(__file__), "data", "hotelss.csv")
 
+hotel_store = register_table(HotelStore(csv_filename))
+_hotel_catalog = None
+_hotel_catalog_lock = threading.Lock()
+
+def load_hotel_csv(path):
+    """Lấy bảng khách sạn của admin (từ store trong bộ nhớ) thành bộ (food, place, hotel) cho catalog."""
+    df = hotel_store.frame()
+    df['location_rating'] = pd.to_numeric(df['location_rating'], errors='coerce')
+    df['province_name'] = df['province']
+    return None, None, df
+
+def get_hotel_catalog():
+    """Catalog dùng chung cho file khách sạn của admin (bucket trang chủ, index tìm kiếm, facet)."""
+    global _hotel_catalog
+    if _hotel_catalog is None:
+        with _hotel_catalog_lock:
+            if _hotel_catalog is None:
+                _hotel_catalog = Catalog(load_hotel_csv, csv_filename, eager=("homepage_buckets", "hotel_index", "hotel_facets"),
+                                         watch={csv_filename: hotel_store.journal_path})
+    return _hotel_catalog
+
 def sanitize_input(input_str):
     """Loại bỏ ký tự đặc biệt"""
     return re.sub(r"[^\w\s]", "", input_str.strip())
 
-def normalize_text(text):
-    """Chuyển đổi chữ có dấu thành không dấu và viết thường"""
-    return unidecode.unidecode(text).lower().strip() if text else ""
-
 def process_hotel_data_from_csv(search_term):
-    """Xử lý dữ liệu khách sạn từ file CSV dựa trên tỉnh hoặc địa danh gần đó"""
+    """Tìm khách sạn theo tỉnh hoặc địa danh gần đó (qua index dựng sẵn của file CSV)"""
     try:
-        df = pd.read_csv(csv_filename)
-        if df.empty:
-            return []
+        index = get_hotel_catalog().snapshot().derived("hotel_index")
     except (FileNotFoundError, pd.errors.EmptyDataError):
         return []
     except Exception:
         return []
 
-    search_term = normalize_text(search_term)
-    hotels_list = df.to_dict(orient="records")
-
-    processed_hotels = [
-        {key: str(hotel.get(key, f"No {key}")) for key in
-         ["name", "link", "description", "price", "name_nearby_place", "hotel_class", "img_origin", "location_rating", "animates"]}
-        for hotel in hotels_list
-        if search_term in normalize_text(str(hotel.get("province", ""))) or search_term in normalize_text(
-            str(hotel.get("name_nearby_place", "")))
-    ]
-
-    return processed_hotels
+    return index.matching_records(search_term)
+
+def filter_hotels_in_csv(province=None, min_price=None, max_price=None, stars=None, min_rating=None, amenities=(),
+                         limit=None):
+    """Lọc khách sạn theo tỉnh, khoảng giá, hạng sao, rating tối thiểu và tiện ích; kèm số đếm facet.
+
+    Nếu có tiện ích không có trong dữ liệu, chỉ trả về {"unknown_amenities": [...]}.
+    """
+    snapshot = get_hotel_catalog().snapshot()
+    facets = snapshot.derived("hotel_facets")
+    required, unknown = facets.amenity_mask(amenities)
+    if unknown:
+        return {"unknown_amenities": unknown}
+
+    mask = facets.filter(province, min_price, max_price, stars, min_rating, required)
+    positions = np.flatnonzero(mask)
+    # Rating cao trước, khách sạn chưa có rating xếp cuối
+    positions = positions[np.argsort(-np.nan_to_num(facets.ratings[positions], nan=-1), kind="stable")]
+    if limit is not None:
+        positions = positions[:limit]
+    records = snapshot.derived("hotel_index").records
+    return {
+        "hotels": [dict(records[position], province=facets.province_name(position),
+                        amenities=facets.amenities[position]) for position in positions.tolist()],
+        "total": int(mask.sum()),
+        "facets": facets.facet_counts(mask),
+    }
 
 def show_hotel_in_csv():
     try:
-        df = pd.read_csv(csv_filename)
-        if df.empty:
-            return []
-        hotels_list = df.to_dict(orient="records")
-        processed_hotels = [
-            {key: str(hotel.get(key, f"No {key}")) for key in
-             ["name", "link", "description", "price", "name_nearby_place", "hotel_class", "img_origin", "location_rating", "province", "animates"]}
-            for hotel in hotels_list
-        ]
-        return processed_hotels
+        return hotel_store.records()
     except (FileNotFoundError, pd.errors.EmptyDataError):
         return []
     except Exception as e:
         return []
 
-def update_hotel_in_csv(hotel_name, update_data):
+def get_hotel_in_csv(hotel_name):
+    """Tra khách sạn theo tên (không phân biệt hoa thường/dấu), None nếu không có."""
     try:
-        df = pd.read_csv(csv_filename)
-        if df.empty:
-            return False
-
-        normalized_hotel_name = normalize_text(hotel_name)
-        mask = df['name'].apply(normalize_text) == normalized_hotel_name
+        return hotel_store.get(hotel_name)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        return None
 
-        if not mask.any():
+def update_hotel_in_csv(hotel_name, update_data):
+    try:
+        if not hotel_store.update(hotel_name, update_data):
             return False
-
-        for key, value in update_data.items():
-            if value and key in df.columns:
-                df.loc[mask, key] = value
-
-        df.to_csv(csv_filename, index=False, encoding='utf-8')
+        get_hotel_catalog().bump_version()
         return True
     except (FileNotFoundError, pd.errors.EmptyDataError):
         return False
@@ -80,18 +103,9 @@ def update_hotel_in_csv(hotel_name, update_data):
 
 def delete_hotel_in_csv(hotel_name):
     try:
-        df = pd.read_csv(csv_filename)
-        if df.empty:
+        if not hotel_store.delete(hotel_name):
             return False
-
-        normalized_hotel_name = normalize_text(hotel_name)
-        mask = df['name'].apply(normalize_text) == normalized_hotel_name
-
-        if not mask.any():
-            return False
-
-        df = df[~mask]
-        df.to_csv(csv_filename, index=False, encoding='utf-8')
+        get_hotel_catalog().bump_version()
         return True
     except (FileNotFoundError, pd.errors.EmptyDataError):
         return False
@@ -99,43 +113,12 @@ def delete_hotel_in_csv(hotel_name):
         raise Exception(f"Không thể xóa khách sạn: {str(e)}")
 
 def get_hotel_homepage(num_item=None):
+    """Lấy danh sách khách sạn ngẫu nhiên cho trang chủ (mỗi tỉnh tối đa một khách sạn, từ bucket dựng sẵn)."""
     if num_item is None:
         num_item = random.randint(10, 15)
 
     try:
-        df = pd.read_csv(csv_filename)
-        if df.empty:
-            return []
-
-        df['location_rating'] = pd.to_numeric(df['location_rating'], errors='coerce')
-        df.dropna(subset=['location_rating', 'name'], inplace=True)
-        filtered_df = df[(df['location_rating'] >= 3) & (df['location_rating'] <= 5)].drop_duplicates('name')
-
-        if filtered_df.empty:
-            return []
-
-        unique_provinces = filtered_df['province'].unique()
-        selected_hotels = []
-
-        for province in unique_provinces:
-            province_df = filtered_df[filtered_df['province'] == province]
-            if not province_df.empty:
-                selected_hotels.append(province_df.sample(1))
-
-        if not selected_hotels:
-            return []
-
-        selected_df = pd.concat(selected_hotels)
-
-        if len(selected_df) >= num_item:
-            random_hotels = selected_df.sample(n=num_item)
-        else:
-            random_hotels = selected_df
-
-        return random_hotels[
-            ['name', 'link', 'description', 'price', 'name_nearby_place', 'hotel_class', 'img_origin',
-             'location_rating', 'province', 'animates']
-        ].fillna('N/A').to_dict('records')
+        return get_hotel_catalog().snapshot().derived("homepage_buckets")["hotel"].sample(num_item)
     except (FileNotFoundError, pd.errors.EmptyDataError):
         return []
     except Exception as e:
@@ -0,0 +1,210 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from .catalog import NO_ROWS, register_derived
+from .gazetteer import normalize_text, province_key
+
+# Các cột trả về cho tìm kiếm khách sạn, đã ép sang chuỗi
+HOTEL_SEARCH_COLUMNS = ["name", "link", "description", "price", "name_nearby_place", "hotel_class", "img_origin",
+                        "location_rating", "animates"]
+# Tìm kiếm khớp chuỗi con trên tỉnh và địa danh gần đó
+HOTEL_MATCH_COLUMNS = ("province", "name_nearby_place")
+# Độ dài tối đa của chuỗi con được đánh index; truy vấn dài hơn lọc ứng viên bằng giao các posting
+GRAM_LENGTH = 3
+
+
+def _grams(text):
+    """Mọi chuỗi con độ dài 1..GRAM_LENGTH của văn bản."""
+    return {text[i:i + length] for length in range(1, GRAM_LENGTH + 1) for i in range(len(text) - length + 1)}
+
+
+class HotelIndex:
+    """Posting chuỗi con (tối đa 3 ký tự) trên tỉnh/địa danh đã chuẩn hóa -> vị trí dòng khách sạn.
+
+    Truy vấn ngắn tra thẳng posting; truy vấn dài giao posting các trigram rồi kiểm tra lại trên ứng viên,
+    nên thời gian tìm phụ thuộc số kết quả chứ không phụ thuộc tổng số khách sạn.
+    """
+
+    def __init__(self, df):
+        self.size = len(df)
+        # Giữ nguyên dạng chuỗi của API cũ: str(giá trị), "No <cột>" nếu thiếu cột
+        columns = [df[key].map(str) if key in df.columns else [f"No {key}"] * self.size
+                   for key in HOTEL_SEARCH_COLUMNS]
+        self.records = [dict(zip(HOTEL_SEARCH_COLUMNS, values)) for values in zip(*columns)]
+
+        fields = [df[column].map(lambda value: normalize_text(str(value))).tolist() if column in df.columns
+                  else [""] * self.size for column in HOTEL_MATCH_COLUMNS]
+        self.texts = list(zip(*fields)) if fields else []
+        postings = {}
+        for position, texts in enumerate(self.texts):
+            grams = set()
+            for text in texts:
+                grams |= _grams(text)
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+        self.postings = {gram: np.asarray(rows, dtype=np.intp) for gram, rows in postings.items()}
+
+    def search(self, term):
+        """Vị trí (tăng dần) các khách sạn có tỉnh hoặc địa danh gần đó chứa term đã chuẩn hóa."""
+        if not term:
+            return np.arange(self.size)
+        if len(term) <= GRAM_LENGTH:
+            return self.postings.get(term, NO_ROWS)
+        lists = []
+        for i in range(len(term) - GRAM_LENGTH + 1):
+            rows = self.postings.get(term[i:i + GRAM_LENGTH])
+            if rows is None:
+                return NO_ROWS
+            lists.append(rows)
+        lists.sort(key=len)
+        candidates = lists[0]
+        for rows in lists[1:]:
+            candidates = np.intersect1d(candidates, rows, assume_unique=True)
+            if not len(candidates):
+                return NO_ROWS
+        return np.asarray([position for position in candidates.tolist()
+                           if any(term in text for text in self.texts[position])], dtype=np.intp)
+
+    def matching_records(self, search_term):
+        """Bản ghi (chuỗi dựng sẵn) của các khách sạn khớp từ khóa tìm kiếm."""
+        return [dict(self.records[position]) for position in self.search(normalize_text(search_term)).tolist()]
+
+
+@register_derived("hotel_index", datasets=("hotel",))
+def _build_hotel_index(snapshot):
+    return HotelIndex(snapshot.hotel_df)
+
+
+# Tiện ích tiếng Việt -> tên tiếng Anh tương đương (dạng đã chuẩn hóa), để lọc một tên khớp cả hai cách ghi
+AMENITY_ALIASES = {
+    "wi-fi mien phi": "free wi-fi",
+    "dieu hoa nhiet do": "air conditioning",
+    "do xe mien phi": "free parking",
+    "khong hut thuoc": "smoke-free property",
+    "trung tam the duc": "fitness centre",
+    "phu hop voi tre em": "child-friendly",
+    "co loi di cho xe lan": "accessible",
+    "chap nhan vat nuoi": "pet-friendly",
+    "be boi ngoai troi": "outdoor pool",
+    "be boi trong nha": "indoor pool",
+    "xe dua don ra san bay": "airport shuttle",
+    "co duong ra bai bien": "beach access",
+    "bon tam nuoc nong": "hot tub",
+    "bua sang mien phi": "free breakfast",
+}
+_STARS_PATTERN = re.compile(r"(\d)\s*sao")
+_WORD_BITS = np.arange(64, dtype=np.uint64)
+
+
+def amenity_key(name):
+    """Khóa chuẩn của một tiện ích (bỏ dấu, chữ thường, gộp tên tiếng Việt về tên tiếng Anh)."""
+    key = " ".join(normalize_text(name).split())
+    return AMENITY_ALIASES.get(key, key)
+
+
+def split_amenities(text):
+    """Tách chuỗi tiện ích "Free Wi-Fi, Spa, ..." thành danh sách tên."""
+    if not isinstance(text, str):
+        return []
+    return [name.strip() for name in text.split(",") if name.strip()]
+
+
+def hotel_stars(hotel_class):
+    """Số sao từ hạng khách sạn ("Khách sạn 3 sao" -> 3), 0 nếu không có hạng sao."""
+    match = _STARS_PATTERN.search(normalize_text(hotel_class) if isinstance(hotel_class, str) else "")
+    return int(match.group(1)) if match else 0
+
+
+class HotelFacets:
+    """Cột số và bitmask tiện ích (uint64, 64 tiện ích mỗi word) của khách sạn để lọc/đếm facet bằng numpy."""
+
+    def __init__(self, df):
+        self.size = len(df)
+        amenity_lists = [split_amenities(text) for text in df["animates"]] if "animates" in df.columns \
+            else [[] for _ in range(self.size)]
+        keys = {}
+        labels = {}
+        for names in amenity_lists:
+            for name in names:
+                key = amenity_key(name)
+                keys.setdefault(key, len(keys))
+                labels.setdefault(key, {}).setdefault(name, 0)
+                labels[key][name] += 1
+        # Mỗi tiện ích hiển thị bằng cách ghi phổ biến nhất (ưu tiên tên tiếng Anh nếu có)
+        self.vocabulary = keys
+        self.labels = [max(labels[key], key=lambda name: (amenity_key(name) == normalize_text(name),
+                                                           labels[key][name])) for key in keys]
+        words = max(1, (len(keys) + 63) // 64)
+        self.amenity_bits = np.zeros((self.size, words), dtype=np.uint64)
+        for position, names in enumerate(amenity_lists):
+            for name in names:
+                bit = keys[amenity_key(name)]
+                self.amenity_bits[position, bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+        self.amenities = [sorted({self.labels[keys[amenity_key(name)]] for name in names}) for names in amenity_lists]
+
+        provinces = df["province"] if "province" in df.columns else pd.Series([""] * self.size)
+        self.province_codes, self.province_keys = pd.factorize(provinces.map(province_key))
+        # Tên hiển thị của tỉnh là cách ghi phổ biến nhất trong file
+        names = provinces.groupby(self.province_codes).agg(lambda names: names.mode().iat[0])
+        self.province_names = [names.get(code, key) for code, key in enumerate(self.province_keys)]
+        self.stars = np.asarray([hotel_stars(value) for value in df.get("hotel_class", [None] * self.size)], dtype=int)
+        self.prices = pd.to_numeric(df.get("price"), errors="coerce").to_numpy(dtype=float) if "price" in df.columns \
+            else np.full(self.size, np.nan)
+        self.ratings = pd.to_numeric(df.get("location_rating"), errors="coerce").to_numpy(dtype=float) \
+            if "location_rating" in df.columns else np.full(self.size, np.nan)
+
+    def province_name(self, position):
+        code = self.province_codes[position]
+        return self.province_names[code] if code >= 0 else None
+
+    def amenity_mask(self, names):
+        """Bitmask (theo word) các tiện ích bắt buộc và danh sách tên không có trong từ điển."""
+        required = np.zeros(self.amenity_bits.shape[1], dtype=np.uint64)
+        unknown = []
+        for name in names:
+            bit = self.vocabulary.get(amenity_key(name))
+            if bit is None:
+                unknown.append(name)
+            else:
+                required[bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+        return required, unknown
+
+    def filter(self, province=None, min_price=None, max_price=None, stars=None, min_rating=None, required=None):
+        """Mask boolean các khách sạn thỏa mọi điều kiện (None = không lọc theo điều kiện đó)."""
+        mask = np.ones(self.size, dtype=bool)
+        if province:
+            code = self.province_keys.get_indexer([province_key(province)])[0]
+            mask &= self.province_codes == code if code >= 0 else False
+        if min_price is not None:
+            mask &= self.prices >= min_price
+        if max_price is not None:
+            mask &= self.prices <= max_price
+        if stars:
+            mask &= np.isin(self.stars, list(stars))
+        if min_rating is not None:
+            mask &= self.ratings >= min_rating
+        if required is not None and required.any():
+            mask &= ((self.amenity_bits & required) == required).all(axis=1)
+        return mask
+
+    def facet_counts(self, mask):
+        """Số khách sạn theo tỉnh, hạng sao và tiện ích trong tập đã lọc."""
+        provinces = np.bincount(self.province_codes[mask & (self.province_codes >= 0)],
+                                minlength=len(self.province_names))
+        stars = np.bincount(self.stars[mask], minlength=6)
+        bits = self.amenity_bits[mask]
+        amenities = np.concatenate([((bits[:, word, None] >> _WORD_BITS) & np.uint64(1)).sum(axis=0)
+                                    for word in range(bits.shape[1])])
+        return {
+            "province": {self.province_names[code]: int(count) for code, count in enumerate(provinces) if count},
+            "hotel_class": {int(star): int(count) for star, count in enumerate(stars) if count},
+            "amenities": {self.labels[bit]: int(amenities[bit])
+                          for bit in np.argsort(-amenities[:len(self.labels)], kind="stable") if amenities[bit]},
+        }
+
+
+@register_derived("hotel_facets", datasets=("hotel",))
+def _build_hotel_facets(snapshot):
+    return HotelFacets(snapshot.hotel_df)
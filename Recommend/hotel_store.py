@@ -0,0 +1,37 @@
+from .gazetteer import normalize_text
+from .journal import JournaledTable
+
+# Các cột trả về cho API quản lý khách sạn, đã ép sang chuỗi
+HOTEL_ADMIN_COLUMNS = ["name", "link", "description", "price", "name_nearby_place", "hotel_class", "img_origin",
+                       "location_rating", "province", "animates"]
+
+
+def hotel_record(row):
+    """Bản ghi trả về cho admin: mọi giá trị ép sang chuỗi, "No <cột>" nếu thiếu cột."""
+    return {key: str(row.get(key, f"No {key}")) for key in HOTEL_ADMIN_COLUMNS}
+
+
+class HotelStore(JournaledTable):
+    """Bảng khách sạn của admin trong bộ nhớ, tra theo tên đã chuẩn hóa -> các dòng trùng tên.
+
+    Đọc/sửa/xóa theo tên là O(1); mỗi thay đổi chỉ ghi thêm vào nhật ký, file CSV được gộp lại định kỳ.
+    """
+
+    def __init__(self, path):
+        super().__init__(path, ("name",), normalize_text)
+
+    def records(self):
+        return [hotel_record(row) for row in self.rows()]
+
+    def get(self, name):
+        """Bản ghi đầu tiên có tên (đã chuẩn hóa) trùng name, None nếu không có."""
+        rows = self.find(self.make_key(name))
+        return hotel_record(rows[0]) if rows else None
+
+    def update(self, name, update_data):
+        """Cập nhật các trường có giá trị của mọi khách sạn trùng tên; False nếu không tìm thấy."""
+        return super().update(self.make_key(name), {key: value for key, value in update_data.items() if value})
+
+    def delete(self, name):
+        """Xóa mọi khách sạn trùng tên; False nếu không tìm thấy."""
+        return super().delete(self.make_key(name))
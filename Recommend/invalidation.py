@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import logging
+import threading
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Bộ đếm phiên bản catalog dùng chung và kênh báo thay đổi giữa các worker Django/Celery
+CATALOG_VERSION_KEY = "fintrip:catalog:version"
+CATALOG_CHANNEL = "fintrip:catalog:invalidate"
+RECONNECT_SECONDS = 5
+HEALTH_CHECK_SECONDS = 30
+
+
+class RedisChangeFeed:
+    """Báo thay đổi catalog giữa các tiến trình qua Redis (INCR bộ đếm + PUBLISH).
+
+    Mỗi tiến trình có một luồng nền nghe kênh và giữ phiên bản mới nhất trong bộ nhớ; catalog so phiên bản
+    này thay vì stat file nguồn mỗi request. Khi mất kết nối Redis, current_version() trả về None để catalog
+    quay lại so mtime file.
+    """
+
+    def __init__(self, url):
+        self._client = redis.Redis.from_url(url, decode_responses=True, socket_connect_timeout=1,
+                                            health_check_interval=HEALTH_CHECK_SECONDS)
+        self._lock = threading.Lock()
+        self._version = None
+        self._thread = None
+        self._pid = None
+        # Thời điểm publish của thay đổi mới nhất chưa được nạp lại, để đo độ trễ lan truyền
+        self._published_at = None
+        self._metrics = {
+            "messages": 0,
+            "last_receive_lag_ms": None,
+            "max_receive_lag_ms": None,
+            "reloads": 0,
+            "last_reload_ms": None,
+            "total_reload_ms": 0.0,
+            "last_propagation_ms": None,
+            "max_propagation_ms": None,
+            "publish_errors": 0,
+        }
+
+    def _ensure_listening(self):
+        # Luồng không sống qua fork nên kiểm tra theo pid (worker gunicorn/Celery fork từ tiến trình cha)
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._version = None
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._listen, name="catalog-invalidation", daemon=True)
+                self._thread.start()
+
+    def _listen(self):
+        connected = True
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CATALOG_CHANNEL)
+                # Đăng ký kênh trước rồi mới đọc bộ đếm để không lỡ thay đổi nào ở giữa
+                self._advance(int(self._client.get(CATALOG_VERSION_KEY) or 0))
+                if not connected:
+                    logger.info("Đã kết nối lại kênh báo thay đổi catalog.")
+                connected = True
+                while True:
+                    message = pubsub.get_message(timeout=HEALTH_CHECK_SECONDS)
+                    if message is not None:
+                        self._receive(message)
+                    else:
+                        # Kênh im lặng: PING để phát hiện kết nối đã chết thay vì chờ mãi
+                        pubsub.check_health()
+            except (redis.RedisError, OSError) as e:
+                self._version = None
+                if connected:
+                    logger.warning(f"Mất kết nối kênh báo thay đổi catalog, quay lại so mtime file: {e}")
+                connected = False
+                time.sleep(RECONNECT_SECONDS)
+
+    def _advance(self, version):
+        with self._lock:
+            if self._version is None or version > self._version:
+                self._version = version
+
+    def _receive(self, message):
+        try:
+            data = json.loads(message["data"])
+            version = int(data["version"])
+        except (TypeError, ValueError, KeyError):
+            return
+        lag_ms = max(0.0, (time.time() - data.get("at", time.time())) * 1000)
+        with self._lock:
+            self._metrics["messages"] += 1
+            self._metrics["last_receive_lag_ms"] = round(lag_ms, 3)
+            self._metrics["max_receive_lag_ms"] = round(max(lag_ms, self._metrics["max_receive_lag_ms"] or 0), 3)
+            if self._published_at is None:
+                self._published_at = data.get("at")
+        self._advance(version)
+
+    def current_version(self):
+        """Phiên bản catalog mới nhất đã biết, None nếu chưa nghe được kênh."""
+        self._ensure_listening()
+        return self._version
+
+    def publish(self):
+        """Tăng bộ đếm phiên bản và báo cho mọi worker (gọi sau khi admin sửa dữ liệu)."""
+        try:
+            version = self._client.incr(CATALOG_VERSION_KEY)
+            self._client.publish(CATALOG_CHANNEL, json.dumps({"version": version, "at": time.time(),
+                                                              "pid": os.getpid()}))
+        except (redis.RedisError, OSError) as e:
+            with self._lock:
+                self._metrics["publish_errors"] += 1
+            logger.warning(f"Không báo được thay đổi catalog qua Redis: {e}")
+
+    def record_reload(self, seconds):
+        """Ghi nhận một lần nạp lại catalog (thời gian nạp và độ trễ từ lúc publish tới khi nạp xong)."""
+        with self._lock:
+            reload_ms = seconds * 1000
+            self._metrics["reloads"] += 1
+            self._metrics["last_reload_ms"] = round(reload_ms, 3)
+            self._metrics["total_reload_ms"] += reload_ms
+            if self._published_at is not None:
+                propagation_ms = max(0.0, (time.time() - self._published_at) * 1000)
+                self._metrics["last_propagation_ms"] = round(propagation_ms, 3)
+                self._metrics["max_propagation_ms"] = round(
+                    max(propagation_ms, self._metrics["max_propagation_ms"] or 0), 3)
+                self._published_at = None
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics["avg_reload_ms"] = round(metrics["total_reload_ms"] / metrics["reloads"], 3) \
+            if metrics["reloads"] else None
+        metrics["total_reload_ms"] = round(metrics["total_reload_ms"], 3)
+        metrics["version"] = self._version
+        metrics["connected"] = self._version is not None
+        metrics["pid"] = os.getpid()
+        return metrics
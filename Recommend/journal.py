@@ -0,0 +1,336 @@
+import os
+import json
+import logging
+import tempfile
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: chỉ khóa được giữa các luồng trong cùng tiến trình
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_DIR_NAME = "journal"
+# Số thay đổi tối đa trong nhật ký trước khi tự gộp vào file nguồn (ngoài lịch gộp định kỳ của Celery)
+COMPACT_AFTER_ENTRIES = 500
+
+# Đường dẫn tuyệt đối của file nguồn -> bảng có nhật ký
+_tables = {}
+
+
+class KeyChangeError(ValueError):
+    """Cập nhật làm đổi khóa của dòng; đổi khóa phải xóa rồi thêm mới để phát lại nhật ký không lẫn dòng."""
+
+
+def journal_path(path):
+    """File nhật ký JSONL của một file nguồn: <thư mục>/journal/<tên file>.jsonl."""
+    return os.path.join(os.path.dirname(path), JOURNAL_DIR_NAME, os.path.basename(path) + ".jsonl")
+
+
+def write_csv(df, f):
+    df.to_csv(f, index=False, encoding="utf-8")
+
+
+def write_excel(df, f):
+    df.to_excel(f, index=False)
+
+
+class JournaledTable:
+    """File nguồn dạng bảng + nhật ký thay đổi append-only, giữ toàn bộ dòng trong bộ nhớ.
+
+    Mỗi thay đổi của admin chỉ ghi thêm một dòng JSON (fsync) vào nhật ký rồi áp dụng vào bộ nhớ; compact()
+    định kỳ gộp nhật ký vào file nguồn. Các thao tác idempotent nên phát lại nhật ký nhiều lần vẫn ra cùng kết quả.
+    Dòng được tra theo khóa là các cột key_columns đã chuẩn hóa.
+    """
+
+    def __init__(self, path, key_columns, normalize, read=pd.read_csv, write=write_csv):
+        self.path = path
+        self.journal_path = journal_path(path)
+        self._key_columns = tuple(key_columns)
+        self._normalize = normalize
+        self._read = read
+        self._write = write
+        self._lock = threading.RLock()
+        self._base_signature = None
+        self._offset = 0
+        self._entries = 0
+        self._columns = []
+        # Dòng đã xóa được giữ chỗ bằng None để vị trí các dòng còn lại không đổi
+        self._rows = []
+        self._by_key = {}
+        self._compacting = False
+
+    def make_key(self, *values):
+        """Khóa tra cứu từ giá trị các cột khóa (theo thứ tự key_columns)."""
+        return tuple(self._normalize(value) if isinstance(value, str) else "" for value in values)
+
+    def key(self, row):
+        return self.make_key(*(row.get(column) for column in self._key_columns))
+
+    def frame_keys(self, df):
+        """Khóa của từng dòng trong DataFrame (theo tên cột của file nguồn), trả về Series các tuple."""
+        columns = [df[column].map(lambda value: self._normalize(value) if isinstance(value, str) else "")
+                   if column in df.columns else pd.Series("", index=df.index) for column in self._key_columns]
+        return pd.Series(list(zip(*columns)), index=df.index, dtype=object)
+
+    def keys(self):
+        """Tập khóa của các dòng hiện có."""
+        with self._lock:
+            self.refresh()
+            return {key for key, positions in self._by_key.items() if positions}
+
+    def exists(self, key):
+        with self._lock:
+            self.refresh()
+            return bool(self._by_key.get(key))
+
+    def _file_lock(self):
+        """Khóa giữa các tiến trình (flock trên file .lock cạnh nhật ký)."""
+        os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+        return _FileLock(self.journal_path + ".lock")
+
+    # Đọc file nguồn và nhật ký
+
+    def _load_base(self):
+        df = self._read(self.path)
+        self._columns = df.columns.tolist()
+        self._rows = df.to_dict(orient="records")
+        self._by_key = {}
+        for position, row in enumerate(self._rows):
+            self._by_key.setdefault(self.key(row), []).append(position)
+        self._offset = 0
+        self._entries = 0
+
+    def refresh(self):
+        """Đồng bộ với đĩa: đọc lại file nguồn nếu đổi (vd. sau khi gộp), đọc thêm phần nhật ký mới."""
+        with self._lock:
+            stat = os.stat(self.path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            try:
+                journal_size = os.path.getsize(self.journal_path)
+            except FileNotFoundError:
+                journal_size = 0
+            if signature != self._base_signature or journal_size < self._offset:
+                self._load_base()
+                self._base_signature = signature
+            if journal_size > self._offset:
+                self._read_journal()
+
+    def _read_journal(self):
+        with open(self.journal_path, "rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                # Dòng cuối chưa có newline là lần ghi dở dang, bỏ qua (lần ghi sau sẽ cắt bỏ)
+                if not line.endswith(b"\n"):
+                    break
+                self._offset += len(line)
+                if line.strip():
+                    self._apply(json.loads(line))
+                    self._entries += 1
+
+    # Áp dụng thay đổi vào bộ nhớ
+
+    def _apply(self, entry):
+        op = entry["op"]
+        if op == "put_many":
+            for values in entry["rows"]:
+                self._put(self.key(values), values)
+            return
+        key = tuple(entry["key"])
+        positions = self._by_key.get(key, [])
+        if op == "put":
+            self._put(key, entry["values"])
+        elif op == "update":
+            # update() không đổi khóa nên vị trí tra theo khóa vẫn đúng sau khi áp dụng
+            for position in positions:
+                self._rows[position].update(
+                    (column, value) for column, value in entry["values"].items() if column in self._columns)
+        elif op == "delete":
+            for position in self._by_key.pop(key, []):
+                self._rows[position] = None
+
+    def _put(self, key, values):
+        # Thêm mới hoặc thay thế (upsert) để phát lại nhiều lần vẫn không nhân đôi dòng
+        for column in values:
+            if column not in self._columns:
+                self._columns.append(column)
+        for position in self._by_key.get(key, []):
+            self._rows[position] = None
+        self._rows.append({column: values.get(column) for column in self._columns})
+        self._by_key[key] = [len(self._rows) - 1]
+
+    def _append(self, op, key=(), values=None, rows=None):
+        """Ghi một thay đổi vào nhật ký (bền vững sau fsync) rồi áp dụng vào bộ nhớ."""
+        if rows is not None:
+            entry = {"op": op, "rows": rows, "at": datetime.now().isoformat()}
+        else:
+            entry = {"op": op, "key": list(key), "values": values or {}, "at": datetime.now().isoformat()}
+        line = (json.dumps(entry, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        with open(self.journal_path, "ab") as f:
+            # Cắt phần ghi dở dang (nếu có) để dòng mới bắt đầu đúng chỗ
+            if f.tell() > self._offset:
+                f.truncate(self._offset)
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._offset += len(line)
+        self._entries += 1
+        self._apply(entry)
+        if self._entries >= COMPACT_AFTER_ENTRIES:
+            self.compact_in_background()
+
+    def _mutate(self, op, key, values=None, require_exists=True):
+        with self._lock, self._file_lock():
+            self.refresh()
+            exists = bool(self._by_key.get(key))
+            if exists != require_exists:
+                return False
+            self._append(op, key, values)
+            return True
+
+    def add(self, values):
+        """Thêm dòng mới; False nếu khóa đã tồn tại."""
+        return self._mutate("put", self.key(values), values, require_exists=False)
+
+    def add_many(self, rows, keys):
+        """Thêm nhiều dòng trong một lần ghi nhật ký, bỏ các dòng có khóa đã tồn tại; trả về số dòng đã thêm.
+
+        keys là khóa của từng dòng (vd. từ frame_keys), các khóa trong rows phải khác nhau.
+        """
+        with self._lock, self._file_lock():
+            self.refresh()
+            rows = [row for row, key in zip(rows, keys) if not self._by_key.get(key)]
+            if rows:
+                self._append("put_many", rows=rows)
+            return len(rows)
+
+    def update(self, key, values):
+        """Cập nhật các cột đã có của mọi dòng trùng khóa; False nếu không tìm thấy.
+
+        Giá trị mới của cột khóa phải giữ nguyên khóa (vd. chỉ sửa hoa thường/dấu), ngược lại KeyChangeError.
+        """
+        new_key = tuple(self.make_key(values[column])[0] if column in values else part
+                        for column, part in zip(self._key_columns, key))
+        if new_key != tuple(key):
+            changed = [column for column, old, new in zip(self._key_columns, key, new_key) if old != new]
+            raise KeyChangeError(f"Không được đổi {', '.join(changed)} khi cập nhật, hãy xóa rồi thêm mới.")
+        return self._mutate("update", key, values)
+
+    def delete(self, key):
+        """Xóa mọi dòng trùng khóa; False nếu không tìm thấy."""
+        return self._mutate("delete", key)
+
+    # Đọc dữ liệu hiện tại
+
+    def find(self, key):
+        """Các dòng (bản sao) trùng khóa."""
+        with self._lock:
+            self.refresh()
+            return [dict(self._rows[position]) for position in self._by_key.get(key, [])]
+
+    def rows(self):
+        with self._lock:
+            self.refresh()
+            return [row for row in self._rows if row is not None]
+
+    def frame(self):
+        """DataFrame mới của dữ liệu hiện tại (file nguồn + nhật ký), caller được phép sửa."""
+        with self._lock:
+            self.refresh()
+            return pd.DataFrame([row for row in self._rows if row is not None], columns=self._columns)
+
+    def pending_entries(self):
+        with self._lock:
+            self.refresh()
+            return self._entries
+
+    # Gộp nhật ký
+
+    def compact(self):
+        """Gộp nhật ký vào file nguồn (ghi file tạm rồi thay thế nguyên tử), sau đó làm rỗng nhật ký.
+
+        Trả về số thay đổi đã gộp.
+        """
+        with self._lock, self._file_lock():
+            self.refresh()
+            entries = self._entries
+            if not entries:
+                return 0
+            directory, name = os.path.split(self.path)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=os.path.splitext(name)[1])
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    self._write(pd.DataFrame([row for row in self._rows if row is not None], columns=self._columns), f)
+                # mkstemp tạo file quyền 0600, giữ lại quyền của file cũ
+                os.chmod(tmp_path, os.stat(self.path).st_mode & 0o777)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            # Nếu dừng giữa hai bước, nhật ký cũ được phát lại trên file mới: các thao tác idempotent nên vẫn đúng
+            with open(self.journal_path, "wb") as f:
+                os.fsync(f.fileno())
+            self._base_signature = None
+            self.refresh()
+            logger.info(f"Đã gộp {entries} thay đổi vào {name}")
+            return entries
+
+    def compact_in_background(self):
+        """Gộp nhật ký trong luồng nền (bỏ qua nếu đang gộp)."""
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+
+        def run():
+            try:
+                self.compact()
+            except Exception as e:
+                logger.warning(f"Không gộp được nhật ký {self.journal_path}: {e}")
+            finally:
+                self._compacting = False
+
+        threading.Thread(target=run, name="journal-compact", daemon=True).start()
+
+
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._file = open(self.path, "a")
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+def register_table(table):
+    """Đăng ký bảng có nhật ký cho file nguồn của nó."""
+    _tables[os.path.abspath(table.path)] = table
+    return table
+
+
+def table_for(path):
+    return _tables.get(os.path.abspath(path)) if path else None
+
+
+def read_table(path, read):
+    """Đọc file nguồn: qua bảng có nhật ký nếu đã đăng ký (gồm cả thay đổi chưa gộp), ngược lại đọc trực tiếp."""
+    table = table_for(path)
+    return table.frame() if table is not None else read(path)
+
+
+def compact_all():
+    """Gộp nhật ký của mọi bảng đã đăng ký; trả về {file: số thay đổi đã gộp}."""
+    return {os.path.basename(path): table.compact() for path, table in _tables.items()}
@@ -0,0 +1,131 @@
+import time
+import random
+import multiprocessing
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Recommend.processed import FOOD_FILE, PLACE_FILE, HOTEL_FILE, load_data, load_sources, normalize_text, \
+    filter_province, recommend_schedule
+from Recommend.schedule_reference import recommend_schedule as reference_schedule
+from Recommend.snapshot import STRING_DTYPE
+
+SMAPS_ROLLUP = "/proc/self/smaps_rollup"
+
+
+def _per_call_us(func, args_list, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for args in args_list:
+            func(*args)
+    return (time.perf_counter() - started) * 1e6 / (repeat * len(args_list))
+
+
+def _scan_province(df, province):
+    return df[df['province'].str.contains(normalize_text(province), case=False, na=False)]
+
+
+def _memory_kb():
+    """Rss/Pss/Shared/Private (kB) của tiến trình hiện tại theo smaps_rollup."""
+    fields = {}
+    with open(SMAPS_ROLLUP) as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[name] = int(value.split()[0])
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "shared": fields["Shared_Clean"] + fields["Shared_Dirty"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def _catalog_worker(mode, loaded, done, results):
+    before = _memory_kb()
+    frames = load_sources(FOOD_FILE, PLACE_FILE, HOTEL_FILE)
+    if mode == "object":
+        # Như trước khi giữ cột Arrow: mỗi worker một bản chuỗi Python riêng
+        frames = tuple(df.astype({name: object for name in df.columns if df[name].dtype == STRING_DTYPE})
+                       for df in frames)
+    # Chạm vào mọi chuỗi như khi phục vụ request để các trang của catalog đều nằm trong bộ nhớ
+    for df in frames:
+        for name in df.columns[(df.dtypes == object) | (df.dtypes == STRING_DTYPE)]:
+            df[name].map(len, na_action="ignore")
+    loaded.wait()
+    # Đo khi mọi worker đã tải xong để Pss chia đều phần bộ nhớ dùng chung
+    after = _memory_kb()
+    results.put({key: after[key] - before[key] for key in after})
+    done.wait()
+
+
+class Command(BaseCommand):
+    help = "Đo hiệu năng các đường xử lý dữ liệu của Recommend."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("target", choices=["province_lookup", "schedule", "catalog_memory"], help="Phần cần đo.")
+        parser.add_argument("--repeat", type=int, default=20, help="Số lần lặp cho mỗi phép đo.")
+        parser.add_argument("--workers", type=int, default=4, help="Số worker khi đo bộ nhớ catalog.")
+
+    def handle(self, *args, **options):
+        if options["target"] == "catalog_memory":
+            self.bench_catalog_memory(options["workers"])
+        else:
+            getattr(self, f"bench_{options['target']}")(options["repeat"])
+
+    def bench_province_lookup(self, repeat):
+        frames = load_data(FOOD_FILE, PLACE_FILE, HOTEL_FILE)
+        for name, df in zip(("food", "place", "hotel"), frames):
+            calls = [(df, province) for province in df['province_name'].unique()]
+            filter_province(df, calls[0][1])  # index đã dựng khi tải catalog, gọi thử để khởi động
+            scan_us = _per_call_us(_scan_province, calls, repeat)
+            index_us = _per_call_us(filter_province, calls, repeat)
+            self.stdout.write(
+                f"{name:5s} ({len(df)} dòng, {len(calls)} tỉnh): str.contains {scan_us:8.1f} µs/lần, "
+                f"index {index_us:8.1f} µs/lần, nhanh hơn {scan_us / index_us:5.1f}x"
+            )
+
+    def bench_schedule(self, repeat):
+        food_df, place_df, _ = load_data(FOOD_FILE, PLACE_FILE)
+        provinces = place_df['province_name'].unique()
+        start = date.today() + timedelta(days=1)
+        # Engine cũ chậm hơn nhiều với lịch trình dài nên chạy ít lượt hơn
+        reference_repeat = max(1, repeat // 10)
+        for total_days in (1, 7, 30):
+            end = start + timedelta(days=total_days - 1)
+            calls = [(start.isoformat(), end.isoformat(), province, food_df, place_df) for province in provinces]
+            random.seed(0)
+            old_ms = _per_call_us(reference_schedule, calls, reference_repeat) / 1000
+            random.seed(0)
+            new_ms = _per_call_us(recommend_schedule, calls, repeat) / 1000
+            self.stdout.write(
+                f"{total_days:2d} ngày, {len(provinces)} tỉnh: engine cũ {old_ms:8.3f} ms/lịch trình, "
+                f"engine mới {new_ms:7.3f} ms/lịch trình, nhanh hơn {old_ms / new_ms:6.1f}x"
+            )
+
+    def bench_catalog_memory(self, workers):
+        try:
+            context = multiprocessing.get_context("fork")
+            open(SMAPS_ROLLUP).close()
+        except (ValueError, OSError):
+            raise CommandError("Cần Linux (fork và /proc/<pid>/smaps_rollup) để đo bộ nhớ theo worker.")
+        # Công bố snapshot trước trong một tiến trình riêng để tiến trình cha không giữ bản catalog nào
+        builder = context.Process(target=load_sources, args=(FOOD_FILE, PLACE_FILE, HOTEL_FILE))
+        builder.start()
+        builder.join()
+        for mode, label in (("object", "cột object"), ("arrow", "string[pyarrow] memory-map")):
+            loaded, done = context.Barrier(workers), context.Barrier(workers)
+            results = context.Queue()
+            processes = [context.Process(target=_catalog_worker, args=(mode, loaded, done, results))
+                         for _ in range(workers)]
+            for process in processes:
+                process.start()
+            usage = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+            average = {key: sum(item[key] for item in usage) / len(usage) / 1024 for key in usage[0]}
+            self.stdout.write(
+                f"{label:27s} ({workers} worker): Rss {average['rss']:6.1f} MB, Pss {average['pss']:6.1f} MB, "
+                f"dùng chung {average['shared']:6.1f} MB, riêng {average['private']:6.1f} MB mỗi worker"
+            )
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Recommend.processed import FOOD_FILE, PLACE_FILE, HOTEL_FILE, read_sources
+from Recommend.snapshot import SNAPSHOT_DIR, write_snapshot, read_snapshot
+
+
+class Command(BaseCommand):
+    help = "Biên dịch food/place/hotel thành snapshot Feather đã chuẩn hóa cho catalog."
+    # Chỉ làm việc với file dữ liệu, không cần kiểm tra URL/DB
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=SNAPSHOT_DIR, help="Thư mục ghi snapshot.")
+
+    def handle(self, *args, **options):
+        paths = (FOOD_FILE, PLACE_FILE, HOTEL_FILE)
+
+        started = time.perf_counter()
+        frames = read_sources(*paths)
+        parse_ms = (time.perf_counter() - started) * 1000
+
+        manifest = write_snapshot(frames, paths, options["output"])
+
+        started = time.perf_counter()
+        read_snapshot(paths, options["output"])
+        load_ms = (time.perf_counter() - started) * 1000
+
+        for dataset, df in zip(("food", "place", "hotel"), frames):
+            self.stdout.write(f"{dataset}: {len(df)} dòng -> {manifest['files'][dataset]}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã công bố snapshot {manifest['version']} tại {options['output']} (parse nguồn {parse_ms:.0f} ms, đọc snapshot {load_ms:.0f} ms)."
+        ))
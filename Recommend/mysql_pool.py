@@ -0,0 +1,236 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+import MySQLdb
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Số kết nối tối đa mỗi tiến trình, thời gian chờ lấy kết nối, tuổi thọ tối đa và thời gian rảnh trước khi cần ping
+POOL_SIZE = int(getattr(settings, "MYSQL_POOL_SIZE", 10))
+CHECKOUT_TIMEOUT_SECONDS = float(getattr(settings, "MYSQL_POOL_TIMEOUT", 5))
+MAX_LIFETIME_SECONDS = float(getattr(settings, "MYSQL_POOL_MAX_LIFETIME", 1800))
+PING_AFTER_IDLE_SECONDS = 30
+
+
+def connect_mysql():
+    """Mở một kết nối MySQL mới theo cấu hình DATABASES['default']."""
+    database = settings.DATABASES['default']
+    return MySQLdb.connect(
+        host=database['HOST'],
+        user=database['USER'],
+        passwd=database['PASSWORD'],
+        db=database['NAME'],
+        port=int(database.get('PORT') or 3306),
+        charset='utf8'
+    )
+
+
+class PoolTimeout(MySQLdb.OperationalError):
+    """Hết thời gian chờ kết nối rảnh trong pool (các view bắt chung với MySQLdb.Error)."""
+
+
+class PooledConnection:
+    """Kết nối mượn từ pool: dùng như kết nối MySQLdb, close() (hoặc thoát khối with) trả kết nối về pool."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._cursors = []
+
+    @property
+    def open(self):
+        return self._raw is not None and bool(self._raw.open)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._raw.cursor(*args, **kwargs)
+        self._cursors.append(cursor)
+        return cursor
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise MySQLdb.InterfaceError("Kết nối đã được trả về pool.")
+        return getattr(self._raw, name)
+
+    def close(self, broken=False):
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool._release(raw, self._cursors, broken)
+            self._cursors = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Lỗi kết nối (mất kết nối, timeout) thì bỏ kết nối thay vì trả về pool
+        self.close(broken=isinstance(exc, MySQLdb.OperationalError))
+
+    def __del__(self):
+        # View quên close(): đóng hẳn kết nối và trả chỗ cho pool, không tái sử dụng vì không rõ trạng thái
+        raw, self._raw = getattr(self, "_raw", None), None
+        if raw is not None:
+            self._pool._discard(raw)
+
+
+class ConnectionPool:
+    """Pool kết nối MySQL giới hạn số kết nối, dùng chung giữa các luồng của một tiến trình.
+
+    Kết nối rảnh lâu được ping trước khi cho mượn, kết nối quá MAX_LIFETIME_SECONDS được mở lại; khi trả về,
+    giao dịch dở dang bị rollback để request sau không thấy snapshot cũ.
+    """
+
+    def __init__(self, connect=connect_mysql, size=POOL_SIZE, timeout=CHECKOUT_TIMEOUT_SECONDS,
+                 max_lifetime=MAX_LIFETIME_SECONDS):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        # RLock: __del__ của kết nối bị bỏ quên có thể chạy (GC) khi chính luồng này đang giữ khóa
+        self._cond = threading.Condition(threading.RLock())
+        # (kết nối, thời điểm mở, thời điểm trả về) của các kết nối rảnh, dùng lại kết nối trả về gần nhất
+        self._idle = deque()
+        # Thời điểm mở của các kết nối đang được mượn
+        self._opened_at = {}
+        self._opening = 0
+        self._pid = os.getpid()
+        # Kết nối của tiến trình cha sau fork: giữ tham chiếu để không đóng socket dùng chung với tiến trình cha
+        self._inherited = []
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "connections_opened": 0,
+            "connections_closed": 0,
+            "failed_pings": 0,
+            "peak_in_use": 0,
+        }
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._inherited.extend(raw for raw, _, _ in self._idle)
+            self._inherited.extend(self._opened_at)
+            self._idle.clear()
+            self._opened_at = {}
+            self._opening = 0
+            self._pid = os.getpid()
+
+    def _total(self):
+        return len(self._idle) + len(self._opened_at) + self._opening
+
+    def connection(self):
+        """Mượn một kết nối: `with pool.connection() as db:` hoặc `db = pool.connection()` rồi `db.close()`.
+
+        Chờ tối đa timeout giây khi pool đã đủ kết nối, quá thời gian thì raise PoolTimeout.
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        with self._cond:
+            self._check_fork()
+            while not self._idle and self._total() >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(f"Hết thời gian chờ kết nối MySQL ({self.size} kết nối đang được dùng).")
+                waited = True
+                self._cond.wait(remaining)
+            raw, opened_at, returned_at = self._idle.pop() if self._idle else (None, None, None)
+            self._opening += 1
+        # Ping/mở kết nối ngoài khóa để các luồng khác không phải chờ
+        try:
+            now = time.monotonic()
+            if raw is not None and now - opened_at >= self.max_lifetime:
+                self._close(raw)
+                raw = None
+            elif raw is not None and now - returned_at >= PING_AFTER_IDLE_SECONDS:
+                try:
+                    raw.ping()
+                except MySQLdb.Error as e:
+                    logger.info(f"Kết nối MySQL rảnh không còn dùng được, mở kết nối mới: {e}")
+                    self._close(raw, failed_ping=True)
+                    raw = None
+            if raw is None:
+                raw, opened_at = self._connect(), time.monotonic()
+        except BaseException:
+            with self._cond:
+                self._opening -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._opening -= 1
+            self._opened_at[raw] = opened_at
+            wait_ms = (time.monotonic() - started) * 1000
+            self._stats["checkouts"] += 1
+            self._stats["waits"] += waited
+            self._stats["connections_opened"] += opened_at >= started
+            self._stats["total_wait_ms"] += wait_ms
+            self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], wait_ms)
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], len(self._opened_at))
+        return PooledConnection(self, raw)
+
+    def _release(self, raw, cursors, broken):
+        for cursor in cursors:
+            try:
+                cursor.close()
+            except MySQLdb.Error:
+                broken = True
+        if not broken:
+            try:
+                raw.rollback()
+            except MySQLdb.Error:
+                broken = True
+        with self._cond:
+            opened_at = self._opened_at.pop(raw, None)
+            if opened_at is None:
+                # Kết nối của tiến trình cha hoặc đã bị bỏ: không đưa vào pool này
+                return
+            expired = time.monotonic() - opened_at >= self.max_lifetime
+            if not broken and not expired:
+                self._idle.append((raw, opened_at, time.monotonic()))
+                self._cond.notify()
+                return
+            self._cond.notify()
+        self._close(raw)
+
+    def _discard(self, raw):
+        with self._cond:
+            if self._opened_at.pop(raw, None) is None:
+                return
+            self._cond.notify()
+        self._close(raw)
+
+    def _close(self, raw, failed_ping=False):
+        with self._cond:
+            self._stats["connections_closed"] += 1
+            self._stats["failed_pings"] += failed_ping
+        try:
+            raw.close()
+        except MySQLdb.Error:
+            pass
+
+    def stats(self):
+        """Số liệu của pool: thời gian chờ lấy kết nối, số kết nối đang dùng/rảnh và tỉ lệ sử dụng."""
+        with self._cond:
+            self._check_fork()
+            stats = dict(self._stats)
+            in_use = len(self._opened_at)
+            stats.update({
+                "size": self.size,
+                "in_use": in_use,
+                "idle": len(self._idle),
+                "utilization": round(in_use / self.size, 3),
+                "avg_wait_ms": round(stats["total_wait_ms"] / stats["checkouts"], 3) if stats["checkouts"] else None,
+                "pid": os.getpid(),
+            })
+        stats["total_wait_ms"] = round(stats["total_wait_ms"], 3)
+        stats["max_wait_ms"] = round(stats["max_wait_ms"], 3)
+        return stats
+
+
+# Pool dùng chung cho các view và task Celery
+mysql_pool = ConnectionPool()
@@ -1,91 +1,47 @@
 import os
+import re
 import ast
 import pandas as pd
-import unidecode
 import numpy as np
 import random
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
 from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import silhouette_score
 from sklearn.linear_model import LinearRegression
 
+from .catalog import Catalog, DATASETS, NO_ROWS, register_derived, snapshot_of
+from .snapshot import read_snapshot, write_snapshot, snapshot_available, use_arrow_strings
+from .journal import JournaledTable, register_table, read_table, table_for, journal_path, write_excel
+from .text_index import build_search_index
+from . import homepage  # noqa: F401 (đăng ký bucket trang chủ cho catalog)
+from .gazetteer import normalize_text, province_key, neighbour_rings
+from .geo import decode_plus_code, extract_plus_code, reference_point, haversine_matrix, plan_route
+
+logger = logging.getLogger(__name__)
+
 # Đường dẫn tới các file dữ liệu
 FOOD_FILE = os.path.join(os.path.dirname(__file__), "data", "food.csv")
 PLACE_FILE = os.path.join(os.path.dirname(__file__), "data", "place2.xlsx")
 HOTEL_FILE = os.path.join(os.path.dirname(__file__), "data", "hotels.csv")
 
-# Danh sách các tỉnh lân cận (chuẩn hóa không dấu và viết thường)
-NEARBY_PROVINCES = {
-    "ha giang": ["tuyen quang", "cao bang"],
-    "cao bang": ["ha giang", "lang son"],
-    "lang son": ["cao bang", "bac giang"],
-    "bac giang": ["lang son", "thai nguyen"],
-    "bac kan": ["thai nguyen", "cao bang"],
-    "thai nguyen": ["bac giang", "phu tho"],
-    "phu tho": ["thai nguyen", "vinh phuc"],
-    "vinh phuc": ["phu tho", "ha noi"],
-    "ha noi": ["vinh phuc", "bac ninh"],
-    "bac ninh": ["ha noi", "hung yen"],
-    "hung yen": ["bac ninh", "hai duong"],
-    "hai duong": ["hung yen", "quang ninh"],
-    "quang ninh": ["hai duong", "lang son"],
-    "thai binh": ["nam dinh", "hai phong"],
-    "nam dinh": ["thai binh", "ha nam"],
-    "ha nam": ["nam dinh", "ninh binh"],
-    "ninh binh": ["ha nam", "thanh hoa"],
-    "thanh hoa": ["ninh binh", "nghe an"],
-    "nghe an": ["thanh hoa", "ha tinh"],
-    "ha tinh": ["nghe an", "quang binh"],
-    "quang binh": ["ha tinh", "quang tri"],
-    "quang tri": ["quang binh", "thua thien-hue"],
-    "thua thien-hue": ["quang tri", "da nang"],
-    "da nang": ["thua thien-hue", "quang nam"],
-    "quang nam": ["da nang", "quang ngai"],
-    "quang ngai": ["quang nam", "binh dinh"],
-    "binh dinh": ["quang ngai", "phu yen"],
-    "phu yen": ["binh dinh", "khanh hoa"],
-    "khanh hoa": ["phu yen", "ninh thuan"],
-    "ninh thuan": ["khanh hoa", "binh thuan"],
-    "binh thuan": ["ninh thuan", "dong nai"],
-    "dong nai": ["binh thuan", "binh duong"],
-    "binh duong": ["dong nai", "binh phuoc"],
-    "binh phuoc": ["binh duong", "tay ninh"],
-    "tay ninh": ["binh phuoc", "ho chi minh"],
-    "ho chi minh": ["tay ninh", "binh duong"],
-    "ba ria-vung tau": ["dong nai", "binh thuan"],
-    "long an": ["ho chi minh", "tien giang"],
-    "tien giang": ["long an", "ben tre"],
-    "ben tre": ["tien giang", "tra vinh"],
-    "tra vinh": ["ben tre", "vinh long"],
-    "vinh long": ["tra vinh", "an giang"],
-    "an giang": ["vinh long", "dong thap"],
-    "dong thap": ["an giang", "tien giang"],
-    "kien giang": ["dong thap", "can tho"],
-    "can tho": ["kien giang", "hau giang"],
-    "hau giang": ["can tho", "soc trang"],
-    "soc trang": ["hau giang", "bac lieu"],
-    "bac lieu": ["soc trang", "ca mau"],
-    "ca mau": ["bac lieu", "kien giang"],
-    "kon tum": ["gia lai", "dak nong"],
-    "gia lai": ["kon tum", "dak lak"],
-    "dak lak": ["gia lai", "dak nong"],
-    "dak nong": ["dak lak", "lam dong"],
-    "lam dong": ["dak nong", "khanh hoa"],
-    "hoa binh": ["phu tho", "son la"],
-    "son la": ["hoa binh", "yen bai"],
-    "yen bai": ["son la", "lao cai"],
-    "lao cai": ["yen bai", "lai chau"],
-    "lai chau": ["lao cai", "dien bien"],
-    "dien bien": ["lai chau", "son la"],
-    "tuyen quang": ["ha giang", "vinh phuc"]
-}
-
-def normalize_text(text):
-    """Chuẩn hóa văn bản: loại bỏ dấu, chuyển thành chữ thường."""
-    if isinstance(text, str):
-        return unidecode.unidecode(text.lower().strip())
-    return ""
+# Địa điểm dành cho trẻ em được xếp sau các địa điểm ưu tiên
+NON_PRIORITY_TYPES = ["Trung tâm vui chơi dành cho trẻ em", "Sân chơi", "Khu trẻ em"]
+NON_PRIORITY_KEYWORDS = ["thiếu nhi", "trẻ"]
+
+FOOD_POOL_COLUMNS = ['title', 'rating', 'description', 'address', 'img', 'lat', 'lng']
+PLACE_POOL_COLUMNS = ['title', 'rating', 'description', 'address', 'img', 'link', 'types', 'lat', 'lng']
+
+# Món ăn/địa điểm do admin sửa qua nhật ký thay đổi, mỗi dòng tra theo (tỉnh, tên) đã chuẩn hóa
+food_table = register_table(JournaledTable(FOOD_FILE, ("Province", "Title"), normalize_text))
+place_table = register_table(JournaledTable(PLACE_FILE, ("province", "title"), normalize_text,
+                                            read=pd.read_excel, write=write_excel))
 
 def safe_literal_eval(x):
     """Chuyển đổi chuỗi thành danh sách an toàn."""
@@ -99,45 +55,262 @@ def verify_file_path(path):
     if not os.path.exists(path):
         raise FileNotFoundError(f"File not found: {path}")
 
-def load_data(food_path, place_path, hotel_path=None):
-    """Tải dữ liệu từ các file CSV và Excel."""
+def read_sources(food_path, place_path, hotel_path=None):
+    """Đọc và chuẩn hóa dữ liệu từ các file CSV và Excel."""
     verify_file_path(food_path)
     verify_file_path(place_path)
     if hotel_path:
         verify_file_path(hotel_path)
 
-    food_df = pd.read_csv(food_path)
-    place_df = pd.read_excel(place_path)
-    hotel_df = pd.read_csv(hotel_path) if hotel_path else None
-
-    # Chuẩn hóa tên cột
-    food_df.rename(columns={'Province': 'province', 'Title': 'title', 'Rating': 'rating', 'Address': 'address', 'Image': 'img'}, inplace=True)
-    if 'description' not in food_df.columns:
-        food_df['description'] = ''
-    food_df['types'] = food_df.get('Service', pd.Series([[]] * len(food_df))).apply(safe_literal_eval)
+    food_df = read_source("food", food_path)
+    place_df = read_source("place", place_path)
+    hotel_df = read_source("hotel", hotel_path) if hotel_path else None
 
+    add_coordinates(food_df, place_df)
     if hotel_df is not None:
-        hotel_df.rename(columns={'province': 'province', 'name': 'name', 'link': 'link', 'description': 'description', 'price': 'price', 'name_nearby_place': 'name_nearby_place', 'hotel_class': 'hotel_class', 'img_origin': 'img_origin', 'location_rating': 'location_rating', 'animates': 'animates'}, inplace=True)
+        add_hotel_coordinates(hotel_df, food_df, place_df)
+    return food_df, place_df, hotel_df
+
+def read_source(dataset, path):
+    """Đọc và chuẩn hóa một file nguồn (chưa có tọa độ)."""
+    if dataset == "food":
+        df = read_table(path, pd.read_csv)
+    elif dataset == "place":
+        df = read_table(path, pd.read_excel)
+    else:
+        df = pd.read_csv(path)
+
+    # Chuẩn hóa tên cột
+    if dataset == "food":
+        df.rename(columns={'Province': 'province', 'Title': 'title', 'Rating': 'rating', 'Address': 'address', 'Image': 'img'}, inplace=True)
+        if 'description' not in df.columns:
+            df['description'] = ''
+        df['types'] = df.get('Service', pd.Series([[]] * len(df))).apply(safe_literal_eval)
+    elif dataset == "hotel":
+        df.rename(columns={'province': 'province', 'name': 'name', 'link': 'link', 'description': 'description', 'price': 'price', 'name_nearby_place': 'name_nearby_place', 'hotel_class': 'hotel_class', 'img_origin': 'img_origin', 'location_rating': 'location_rating', 'animates': 'animates'}, inplace=True)
 
     # Chuẩn hóa dữ liệu
-    for df in [df for df in [food_df, place_df, hotel_df] if df is not None]:
-        if 'rating' in df.columns:
-            df['rating'] = pd.to_numeric(df['rating'].astype(str).str.replace(',', '.'), errors='coerce')
-            df.dropna(subset=['rating'], inplace=True)
-        elif 'location_rating' in df.columns:
-            df['location_rating'] = pd.to_numeric(df['location_rating'].astype(str).str.replace(',', '.'), errors='coerce')
-            df.dropna(subset=['location_rating'], inplace=True)
-        if 'types' not in df.columns:
-            df['types'] = [[] for _ in range(len(df))]
+    if 'rating' in df.columns:
+        df['rating'] = pd.to_numeric(df['rating'].astype(str).str.replace(',', '.'), errors='coerce')
+        df.dropna(subset=['rating'], inplace=True)
+    elif 'location_rating' in df.columns:
+        df['location_rating'] = pd.to_numeric(df['location_rating'].astype(str).str.replace(',', '.'), errors='coerce')
+        df.dropna(subset=['location_rating'], inplace=True)
+    if 'types' not in df.columns:
+        df['types'] = [[] for _ in range(len(df))]
+    else:
+        df['types'] = df['types'].apply(safe_literal_eval)
+
+    # Giữ tên tỉnh gốc (có dấu) để hiển thị, cột province dùng để so khớp
+    df['province_name'] = df['province']
+    df['province'] = df['province'].apply(normalize_text)
+    df.reset_index(drop=True, inplace=True)
+
+    if dataset == "place":
+        add_place_features(df)
+    # Cột chuỗi dạng string[pyarrow] như khi đọc từ snapshot, để mọi catalog có cùng kiểu cột
+    return use_arrow_strings(df)
+
+def reload_sources(frames, changed, food_path, place_path, hotel_path=None):
+    """Chỉ đọc lại các tập dữ liệu trong changed (vd. sau khi admin sửa), giữ nguyên DataFrame của tập còn lại.
+
+    Tọa độ dự phòng phụ thuộc chéo giữa các bảng nên được tính lại; DataFrame không đọc lại chỉ được thay bằng
+    bản sao khi tọa độ của nó thực sự đổi, để catalog dùng lại được các cấu trúc dẫn xuất của tập đó.
+    """
+    paths = dict(zip(DATASETS, (food_path, place_path, hotel_path)))
+    fresh = {dataset: read_source(dataset, paths[dataset]) for dataset in changed if paths[dataset]}
+    food_df, place_df, hotel_df = (fresh.get(dataset, df) for dataset, df in zip(DATASETS, frames))
+
+    if "food" in fresh or "place" in fresh:
+        (food_lat, food_lng), (place_lat, place_lng) = frame_coordinates(food_df, place_df)
+        food_df = with_coordinates(food_df, food_lat, food_lng, "food" in fresh)
+        place_df = with_coordinates(place_df, place_lat, place_lng, "place" in fresh)
+    if hotel_df is not None and (hotel_df is not frames[2] or food_df is not frames[0] or place_df is not frames[1]):
+        hotel_lat, hotel_lng = hotel_coordinates(hotel_df, food_df, place_df)
+        hotel_df = with_coordinates(hotel_df, pd.Series(hotel_lat, index=hotel_df.index),
+                                    pd.Series(hotel_lng, index=hotel_df.index), "hotel" in fresh)
+    return food_df, place_df, hotel_df
+
+def with_coordinates(df, lat, lng, fresh):
+    """Gán lat/lng: DataFrame vừa đọc thì gán tại chỗ, DataFrame của catalog (chỉ đọc) thì sao chép khi đổi."""
+    if fresh:
+        df['lat'] = lat
+        df['lng'] = lng
+        return df
+    if df['lat'].equals(lat) and df['lng'].equals(lng):
+        return df
+    return df.assign(lat=lat, lng=lng)
+
+def add_place_features(place_df):
+    """Tính sẵn quận/huyện và mức ưu tiên của từng địa điểm (vectorized) khi tải dữ liệu."""
+    place_df['district'] = address_districts(place_df['address'])
+
+    non_priority_type = place_df['types'].explode().isin(NON_PRIORITY_TYPES).groupby(level=0).any()
+    titles = place_df['title'].map(normalize_text)
+    non_priority_title = titles.str.contains('|'.join(map(re.escape, NON_PRIORITY_KEYWORDS)), regex=True)
+    place_df['is_priority'] = ~(non_priority_type.reindex(place_df.index, fill_value=False) | non_priority_title)
+
+def address_districts(addresses):
+    """Lấy quận/huyện từ địa chỉ dạng '..., quận/huyện, tỉnh, quốc gia' (vectorized)."""
+    parts = addresses.fillna('').astype(str).str.split(', ')
+    return parts.str[-3].where(parts.str.len() >= 3, 'unknown')
+
+def add_coordinates(*dfs):
+    """Tính sẵn cột lat/lng cho các DataFrame có địa chỉ.
+
+    Ưu tiên Plus Code ở đầu địa chỉ; địa chỉ không có mã lấy tâm các điểm đã định vị cùng
+    tỉnh và quận/huyện (gộp mọi DataFrame), còn lại để trống.
+    """
+    for df, (lat, lng) in zip(dfs, frame_coordinates(*dfs)):
+        df['lat'] = lat
+        df['lng'] = lng
+
+def frame_coordinates(*dfs):
+    """(lat, lng) dạng Series của từng DataFrame như add_coordinates, không sửa DataFrame."""
+    keyed = []
+    for df in dfs:
+        keys = pd.DataFrame({
+            'province': df['province'].map(province_key),
+            'district': address_districts(df['address']).map(normalize_text)
+        }, index=df.index)
+        coordinates = [
+            decode_plus_code(code, reference_point(province, district)) if code else None
+            for code, province, district in zip(df['address'].map(extract_plus_code), keys['province'], keys['district'])
+        ]
+        keys['lat'] = [point[0] if point else np.nan for point in coordinates]
+        keys['lng'] = [point[1] if point else np.nan for point in coordinates]
+        keyed.append(keys)
+
+    located = pd.concat(keyed).dropna(subset=['lat'])
+    centroids = located[located['district'] != 'unknown'].groupby(['province', 'district'])[['lat', 'lng']].mean()
+    coordinates = []
+    for keys in keyed:
+        fallback = keys[['province', 'district']].join(centroids, on=['province', 'district'])
+        coordinates.append((keys['lat'].fillna(fallback['lat']), keys['lng'].fillna(fallback['lng'])))
+    return coordinates
+
+def add_hotel_coordinates(hotel_df, *located_dfs):
+    """Định vị khách sạn theo tâm các địa danh trong name_nearby_place đã có tọa độ (cùng tỉnh)."""
+    hotel_df['lat'], hotel_df['lng'] = hotel_coordinates(hotel_df, *located_dfs)
+
+def hotel_coordinates(hotel_df, *located_dfs):
+    """Danh sách (lat, lng) của khách sạn như add_hotel_coordinates, không sửa DataFrame."""
+    landmarks = {}
+    for df in located_dfs:
+        located = df.dropna(subset=['lat', 'lng'])
+        names = located['title'].map(lambda title: " ".join(normalize_text(title).split()))
+        for province, name, lat, lng in zip(located['province'].map(province_key), names, located['lat'], located['lng']):
+            landmarks.setdefault((province, name), (lat, lng))
+
+    lats, lngs = [], []
+    for province, nearby in zip(hotel_df['province'].map(province_key), hotel_df['name_nearby_place']):
+        names = str(nearby).split(',') if isinstance(nearby, str) else []
+        points = [landmarks[key] for key in ((province, " ".join(normalize_text(name).split())) for name in names)
+                  if key in landmarks]
+        lats.append(np.mean([point[0] for point in points]) if points else np.nan)
+        lngs.append(np.mean([point[1] for point in points]) if points else np.nan)
+    return lats, lngs
+
+def load_sources(food_path, place_path, hotel_path=None):
+    """Tải dữ liệu từ snapshot Feather nếu còn mới, ngược lại đọc file nguồn.
+
+    Với bộ file mặc định, worker đọc lại nguồn (vd. sau khi admin sửa dữ liệu) sẽ công bố phiên bản
+    snapshot mới để các worker khác chỉ cần đọc file Feather thay vì parse lại.
+    """
+    paths = (food_path, place_path, hotel_path)
+    frames = read_snapshot(paths)
+    if frames is not None:
+        return frames
+    frames = read_sources(food_path, place_path, hotel_path)
+    if paths == (FOOD_FILE, PLACE_FILE, HOTEL_FILE) and snapshot_available():
+        try:
+            write_snapshot(frames, paths)
+        except OSError as e:
+            logger.warning(f"Không ghi được snapshot catalog: {e}")
         else:
-            df['types'] = df['types'].apply(safe_literal_eval)
+            # Dùng bản memory-map vừa công bố (như các worker khác) thay cho bản vừa parse
+            frames = read_snapshot(paths) or frames
+    return frames
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+def get_catalog(food_path=FOOD_FILE, place_path=PLACE_FILE, hotel_path=HOTEL_FILE):
+    """Lấy catalog dùng chung của tiến trình cho bộ file dữ liệu."""
+    key = (food_path, place_path, hotel_path)
+    catalog = _catalogs.get(key)
+    if catalog is None:
+        with _catalogs_lock:
+            catalog = _catalogs.get(key)
+            if catalog is None:
+                catalog = Catalog(load_sources, food_path, place_path, hotel_path, reload=reload_sources,
+                                  watch={path: journal_path(path) for path in key if table_for(path)})
+                _catalogs[key] = catalog
+    return catalog
 
-    food_df['province'] = food_df['province'].apply(normalize_text)
-    place_df['province'] = place_df['province'].apply(normalize_text)
-    if hotel_df is not None:
-        hotel_df['province'] = hotel_df['province'].apply(normalize_text)
+def load_data(food_path, place_path, hotel_path=None):
+    """Tải dữ liệu từ catalog dùng chung (DataFrame chỉ đọc, không sửa trực tiếp)."""
+    verify_file_path(food_path)
+    verify_file_path(place_path)
+    if hotel_path:
+        verify_file_path(hotel_path)
 
-    return food_df, place_df, hotel_df
+    snapshot = get_catalog(food_path, place_path, hotel_path or HOTEL_FILE).snapshot()
+    return snapshot.food_df, snapshot.place_df, snapshot.hotel_df if hotel_path else None
+
+
+def build_province_index(provinces):
+    """Xây index khóa tỉnh -> mảng vị trí dòng (numpy) cho một cột province."""
+    keys = provinces.map(province_key)
+    return {key: np.asarray(positions, dtype=np.intp) for key, positions in keys.groupby(keys, sort=False).indices.items()}
+
+@register_derived("province_index", eager=True, per_dataset=True)
+def _build_catalog_province_index(snapshot, dataset):
+    return build_province_index(snapshot.frame(dataset)['province'])
+
+def province_index(df):
+    """Lấy index tỉnh của df: dùng index dựng sẵn nếu df thuộc catalog, ngược lại xây tại chỗ."""
+    snapshot = snapshot_of(df)
+    if snapshot is not None:
+        for dataset, frame in zip(DATASETS, snapshot.frames()):
+            if frame is df:
+                return snapshot.derived("province_index")[dataset]
+    return build_province_index(df['province'])
+
+def province_positions(index, province, substring=False):
+    """Tra vị trí dòng theo tỉnh; substring=True để khớp chuỗi con trên các khóa tỉnh."""
+    key = province_key(province)
+    if not substring:
+        return index.get(key, NO_ROWS)
+    matched = [positions for name, positions in index.items() if key in name]
+    return np.sort(np.concatenate(matched)) if matched else NO_ROWS
+
+def filter_province(df, province, substring=False):
+    """Lọc DataFrame theo tỉnh qua index thay vì quét str.contains trên từng dòng."""
+    return df.take(province_positions(province_index(df), province, substring))
+
+def search_index(df):
+    """Lấy trigram index tên của df: dùng index dựng sẵn nếu df thuộc catalog, ngược lại xây tại chỗ."""
+    snapshot = snapshot_of(df)
+    if snapshot is not None:
+        for dataset, frame in zip(DATASETS, snapshot.frames()):
+            if frame is df:
+                return snapshot.derived("search_index")[dataset]
+    return build_search_index(df)
+
+def filter_search(df, province=None, query=None, substring=False, limit=None, required=()):
+    """Lọc theo tỉnh rồi tìm theo tên không dấu (trigram, chịu lỗi gõ), kết quả xếp theo độ khớp và rating.
+
+    Dòng thiếu giá trị ở các cột required bị bỏ trước khi xếp hạng. limit chỉ giới hạn kết quả xếp hạng
+    theo query (None = không giới hạn); không có query thì trả mọi dòng của tỉnh.
+    """
+    positions = province_positions(province_index(df), province, substring) if province else None
+    if required:
+        present = df[list(required)].notna().all(axis=1).to_numpy()
+        positions = np.flatnonzero(present) if positions is None else positions[present[positions]]
+    if query:
+        positions = search_index(df).search(query, positions, limit)
+    return df if positions is None else df.take(positions)
 
 def recommend_clustering(df, n_clusters=5):
     """Phân cụm dữ liệu dựa trên rating."""
@@ -164,38 +337,44 @@ def recommend_clustering(df, n_clusters=5):
 
 def is_non_priority_place(place):
     """Xác định địa điểm không ưu tiên (dành cho trẻ em)."""
-    non_priority_types = ["Trung tâm vui chơi dành cho trẻ em", "Sân chơi", "Khu trẻ em"]
-    non_priority_keywords = ["thiếu nhi", "trẻ"]
-
     place_types = place.get('types', [])
-    if any(t in place_types for t in non_priority_types):
+    if any(t in place_types for t in NON_PRIORITY_TYPES):
         return True
 
     title = normalize_text(place.get('title', ''))
-    if any(keyword in title for keyword in non_priority_keywords):
+    if any(keyword in title for keyword in NON_PRIORITY_KEYWORDS):
         return True
 
     return False
 
-def recommend_pool(province, food_df, place_df):
+def pool_records(df, columns):
+    """Chuyển các cột của pool thành list dict; tọa độ chưa xác định trả về None thay vì NaN."""
+    records = df.reindex(columns=columns)
+    for column in ('lat', 'lng'):
+        if column in records.columns:
+            records[column] = records[column].astype(object).where(records[column].notna(), None)
+    return records.to_dict('records')
+
+def recommend_pool(province, food_df, place_df, substring=False):
     """Tạo danh sách đề xuất món ăn và địa điểm từ tỉnh được chọn."""
-    normalized_province = normalize_text(province)
-    filtered_food = food_df[food_df['province'].str.contains(normalized_province, case=False, na=False)]
-    filtered_place = place_df[place_df['province'].str.contains(normalized_province, case=False, na=False)]
+    filtered_food = filter_province(food_df, province, substring)
+    filtered_place = filter_province(place_df, province, substring)
 
     if filtered_food.empty or filtered_place.empty:
         return {"food": [], "places": {"priority": [], "non_priority": []}}
 
-    food_pool = filtered_food.drop_duplicates('title').sort_values(by='rating', ascending=False)[
-        ['title', 'rating', 'description', 'address', 'img']
-    ].to_dict('records')
+    food_pool = pool_records(filtered_food.drop_duplicates('title').sort_values(by='rating', ascending=False),
+                             FOOD_POOL_COLUMNS)
 
-    place_pool = filtered_place.drop_duplicates('title').sort_values(by='rating', ascending=False)[
-        ['title', 'rating', 'description', 'address', 'img', 'link', 'types']
-    ].to_dict('records')
+    sorted_place = filtered_place.drop_duplicates('title').sort_values(by='rating', ascending=False)
+    if 'is_priority' in sorted_place.columns:
+        is_priority = sorted_place['is_priority'].to_numpy(dtype=bool)
+    else:
+        is_priority = ~sorted_place.apply(is_non_priority_place, axis=1).to_numpy(dtype=bool)
+    place_pool = pool_records(sorted_place, PLACE_POOL_COLUMNS)
 
-    priority_pool = [place for place in place_pool if not is_non_priority_place(place)]
-    non_priority_pool = [place for place in place_pool if is_non_priority_place(place)]
+    priority_pool = [place for place, priority in zip(place_pool, is_priority) if priority]
+    non_priority_pool = [place for place, priority in zip(place_pool, is_priority) if not priority]
 
     return {
         "food": food_pool,
@@ -205,13 +384,161 @@ def recommend_pool(province, food_df, place_df):
         }
     }
 
-def random_duration(activity_type):
+EMPTY_SCHEDULE_POOL = {"food": [], "priority": {}, "non_priority": {}, "places": {"priority": [], "non_priority": []}}
+
+def build_schedule_pool(filtered_food, filtered_place, partial=False):
+    """Dựng pool cho lịch trình: món ăn theo rating và địa điểm nhóm theo quận/huyện, ưu tiên trước.
+
+    "places" giữ danh sách (quận/huyện, địa điểm) theo rating để random_mode xáo trộn như engine cũ.
+    partial=True giữ lại phần còn dữ liệu khi món ăn hoặc địa điểm rỗng (dùng cho vòng tỉnh lân cận).
+    """
+    if not partial and (filtered_food.empty or filtered_place.empty):
+        return EMPTY_SCHEDULE_POOL
+
+    food_pool = pool_records(filtered_food.drop_duplicates('title').sort_values(by='rating', ascending=False),
+                             FOOD_POOL_COLUMNS)
+
+    sorted_place = filtered_place.drop_duplicates('title').sort_values(by='rating', ascending=False)
+    records = pool_records(sorted_place, PLACE_POOL_COLUMNS)
+    pool = {"food": food_pool, "priority": {}, "non_priority": {}, "places": {"priority": [], "non_priority": []}}
+    for place, district, is_priority in zip(records, sorted_place['district'], sorted_place['is_priority']):
+        kind = "priority" if is_priority else "non_priority"
+        pool[kind].setdefault(district, []).append(place)
+        pool["places"][kind].append((district, place))
+    return pool
+
+@register_derived("schedule_pools", eager=True, datasets=("food", "place"))
+def _build_catalog_schedule_pools(snapshot):
+    index = snapshot.derived("province_index")
+    # Sau khi admin sửa dữ liệu chỉ dựng lại pool của các tỉnh có dòng thay đổi
+    previous = snapshot.previous.derived("schedule_pools") if snapshot.previous is not None else {}
+    changed = changed_provinces(snapshot, ("food", "place")) if previous else set()
+    return {
+        key: previous[key] if key in previous and key not in changed else
+        build_schedule_pool(snapshot.food_df.take(index["food"].get(key, NO_ROWS)), snapshot.place_df.take(positions))
+        for key, positions in index["place"].items()
+    }
+
+def changed_provinces(snapshot, datasets):
+    """Khóa tỉnh có dòng khác nhau giữa snapshot và snapshot trước trong các tập datasets (so hash từng dòng)."""
+    previous = snapshot.previous
+    old_index, new_index = previous.derived("province_index"), snapshot.derived("province_index")
+    changed = set()
+    for dataset in datasets:
+        old_df, new_df = previous.frame(dataset), snapshot.frame(dataset)
+        if old_df is new_df:
+            continue
+        old_hashes, new_hashes = row_hashes(old_df), row_hashes(new_df)
+        old_positions, new_positions = old_index[dataset], new_index[dataset]
+        for key in old_positions.keys() | new_positions.keys():
+            if not np.array_equal(old_hashes[old_positions.get(key, NO_ROWS)],
+                                  new_hashes[new_positions.get(key, NO_ROWS)]):
+                changed.add(key)
+    return changed
+
+def row_hashes(df):
+    """Hash nội dung từng dòng (cột danh sách được hash theo chuỗi biểu diễn)."""
+    return pd.util.hash_pandas_object(df.astype({column: str for column in df.columns if df[column].dtype == object}),
+                                      index=False).to_numpy()
+
+def schedule_pool(province, food_df, place_df):
+    """Lấy pool lịch trình của tỉnh (bucket dựng sẵn của catalog nếu có, chỉ đọc)."""
+    snapshot = snapshot_of(place_df)
+    if snapshot is not None and snapshot.food_df is food_df:
+        return snapshot.derived("schedule_pools").get(province_key(province), EMPTY_SCHEDULE_POOL)
+    return build_schedule_pool(filter_province(food_df, province), filter_province(place_df, province))
+
+def build_ring_pool(provinces, food_df, place_df):
+    """Pool gộp của một vòng tỉnh lân cận; địa điểm nhóm theo (tỉnh, quận/huyện) để không trộn quận trùng tên."""
+    foods = [filter_province(food_df, province) for province in provinces]
+    places = [
+        filter_province(place_df, province).assign(district=lambda df, province=province: province + " / " + df['district'])
+        for province in provinces
+    ]
+    return build_schedule_pool(pd.concat(foods), pd.concat(places), partial=True)
+
+@register_derived("ring_pools", datasets=("food", "place"))
+def _build_catalog_ring_pools(snapshot):
+    # Điền dần khi cần: (khóa tỉnh, vòng) -> pool đã gộp của vòng đó
+    return {}
+
+def ring_pool(province, ring, food_df, place_df):
+    """Pool gộp của vòng lân cận thứ ring (từ 1) quanh tỉnh; dùng bản dựng sẵn của catalog nếu có."""
+    rings = neighbour_rings(province)
+    if ring > len(rings):
+        return None
+    snapshot = snapshot_of(place_df)
+    if snapshot is None or snapshot.food_df is not food_df:
+        return build_ring_pool(rings[ring - 1], food_df, place_df)
+    cache = snapshot.derived("ring_pools")
+    key = (province_key(province), ring)
+    pool = cache.get(key)
+    if pool is None:
+        pool = cache[key] = build_ring_pool(rings[ring - 1], snapshot.food_df, snapshot.place_df)
+    return pool
+
+class DistrictPool:
+    """Địa điểm nhóm theo quận/huyện; mỗi lượt chọn ngẫu nhiên một quận còn địa điểm rồi lấy địa điểm đầu của quận.
+
+    Rút số như engine cũ (random.choice trên danh sách quận còn địa điểm theo thứ tự ban đầu, rồi pop(0)) nên
+    cùng seed cho cùng lịch trình. Mỗi quận là một deque; tập quận còn địa điểm được cập nhật dần trên cây Fenwick
+    nên tìm quận thứ k và bỏ quận đã hết đều O(log số quận), không phải dựng lại hay remove khỏi list.
+    """
+
+    def __init__(self, districts, rng=random):
+        names = [district for district in districts if districts[district]]
+        self._places = [deque(districts[district]) for district in names]
+        self._rng = rng
+        self._active = len(names)
+        # _tree[i] đếm số quận còn địa điểm trong khoảng (i - lowbit(i), i] (đánh số từ 1)
+        self._tree = [0] * (len(names) + 1)
+        for slot in range(1, len(self._tree)):
+            self._tree[slot] += 1
+            parent = slot + (slot & -slot)
+            if parent < len(self._tree):
+                self._tree[parent] += self._tree[slot]
+        self._top = 1 << (len(names).bit_length() - 1) if names else 0
+
+    def __bool__(self):
+        return self._active > 0
+
+    def pop(self):
+        # choice trên range rút số y hệt choice trên danh sách quận còn địa điểm có cùng độ dài
+        slot = self._find(self._rng.choice(range(self._active)))
+        places = self._places[slot]
+        place = places.popleft()
+        if not places:
+            self._discard(slot)
+        return place
+
+    def _find(self, rank):
+        """Vị trí (từ 0) của quận còn địa điểm thứ rank (từ 0) theo thứ tự ban đầu."""
+        slot, step = 0, self._top
+        while step:
+            if slot + step < len(self._tree) and self._tree[slot + step] <= rank:
+                slot += step
+                rank -= self._tree[slot]
+            step >>= 1
+        return slot
+
+    def _discard(self, slot):
+        self._active -= 1
+        slot += 1
+        while slot < len(self._tree):
+            self._tree[slot] -= 1
+            slot += slot & -slot
+
+# Khung giờ hoạt động trong ngày, parse một lần thay vì mỗi ngày của lịch trình
+DAY_START_TIME = datetime.strptime("07:00", "%H:%M")
+DAY_END_TIME = datetime.strptime("22:30", "%H:%M")
+
+def random_duration(activity_type, rng=random):
     """Chọn ngẫu nhiên thời gian cho hoạt động."""
     if activity_type == "food":
         durations = [60, 90, 120]  # Phút
     else:  # place
         durations = [120, 150, 180]  # Phút
-    return timedelta(minutes=random.choice(durations))
+    return timedelta(minutes=rng.choice(durations))
 
 def add_time(start_time, duration):
     """Cộng thêm thời gian duration vào start_time."""
@@ -221,8 +548,28 @@ def format_time(time):
     """Định dạng thời gian thành chuỗi HH:MM."""
     return time.strftime("%H:%M")
 
-def recommend_schedule(start_day, end_day, province, food_df, place_df, random_mode=False):
-    """Tạo lịch trình dựa trên tỉnh được chọn, mở rộng sang tỉnh lân cận nếu cần."""
+def route_stops(stops):
+    """Sắp các điểm dừng trong ngày theo khoảng cách (haversine + láng giềng gần nhất + 2-opt).
+
+    Thứ tự ăn uống/tham quan theo khung giờ được giữ nguyên; ngày có điểm chưa có tọa độ giữ thứ tự cũ.
+    """
+    if len(stops) < 3:
+        return stops
+    lats = [stop[1].get('lat') for stop in stops]
+    lngs = [stop[1].get('lng') for stop in stops]
+    if any(value is None for value in lats + lngs):
+        return stops
+    order = plan_route(haversine_matrix(lats, lngs), [stop[0] for stop in stops])
+    return [stops[k] for k in order]
+
+def recommend_schedule(start_day, end_day, province, food_df, place_df, random_mode=False, seed=None):
+    """Tạo lịch trình dựa trên tỉnh được chọn, mở rộng sang tỉnh lân cận nếu cần.
+
+    Truyền seed để cùng tham số luôn cho cùng lịch trình (có thể cache); không có seed thì dùng random toàn cục.
+    Số ngẫu nhiên được rút theo đúng thứ tự của engine cũ (xáo pool, chọn quận, thời lượng ngay sau mỗi lượt
+    chọn), nên khi tỉnh ban đầu còn đủ dữ liệu, mỗi ngày có cùng các điểm dừng và thời lượng như engine cũ;
+    chỉ thứ tự trong ngày được sắp lại theo quãng đường.
+    """
     fmt = "%Y-%m-%d"
     try:
         start = datetime.strptime(start_day, fmt)
@@ -235,154 +582,117 @@ def recommend_schedule(start_day, end_day, province, food_df, place_df, random_m
         return {"error": "Ngày kết thúc phải sau hoặc bằng ngày bắt đầu."}
 
     normalized_province = normalize_text(province)
-    nearby_provinces = NEARBY_PROVINCES.get(normalized_province, [])
+    rng = random.Random(seed) if seed is not None else random
+
+    def open_pool(pool):
+        """Mở pool dựng sẵn để tiêu thụ trong request này (chỉ sao chép khi cần xáo trộn)."""
+        food = pool["food"]
+        priority, non_priority = pool["priority"], pool["non_priority"]
+        if random_mode:
+            food = list(food)
+            rng.shuffle(food)
+            priority, non_priority = shuffle_places(pool["places"])
+        return {
+            "food": iter(food),
+            "priority": DistrictPool(priority, rng),
+            "non_priority": DistrictPool(non_priority, rng)
+        }
+
+    def shuffle_places(places):
+        """Xáo như engine cũ: cả danh sách địa điểm ưu tiên/không ưu tiên, rồi nhóm theo quận và xáo từng quận."""
+        shuffled = []
+        for kind in ("priority", "non_priority"):
+            shuffled.append(list(places[kind]))
+            rng.shuffle(shuffled[-1])
+        grouped = []
+        for pairs in shuffled:
+            districts = {}
+            for district, place in pairs:
+                districts.setdefault(district, []).append(place)
+            for district_places in districts.values():
+                rng.shuffle(district_places)
+            grouped.append(districts)
+        return grouped
 
     # Tạo pool cho tỉnh ban đầu
-    original_pool = recommend_pool(normalized_province, food_df, place_df)
-    if not original_pool["food"] or not original_pool["places"]["priority"]:
+    original_pool = schedule_pool(normalized_province, food_df, place_df)
+    if not original_pool["food"] or not original_pool["priority"]:
         return {"error": f"Không có dữ liệu cho tỉnh {province}."}
 
-    # Sao chép pool để sử dụng
-    pool_food = original_pool["food"].copy()
-    priority_places = original_pool["places"]["priority"].copy()
-    non_priority_places = original_pool["places"]["non_priority"].copy()
-
-    if random_mode:
-        random.shuffle(pool_food)
-        random.shuffle(priority_places)
-        random.shuffle(non_priority_places)
-
-    def group_by_district(places):
-        """Nhóm địa điểm theo quận/huyện."""
-        district_to_places = {}
-        for place in places:
-            parts = place.get("address", "").split(", ")
-            district = parts[-3] if len(parts) >= 3 else "unknown"
-            district_to_places.setdefault(district, []).append(place)
-        for district in district_to_places:
-            if random_mode:
-                random.shuffle(district_to_places[district])
-        return district_to_places
-
-    priority_districts = group_by_district(priority_places)
-    non_priority_districts = group_by_district(non_priority_places)
-
-    def select_place(day_index, used_districts):
-        """Chọn một địa điểm, ưu tiên tỉnh ban đầu, sau đó là tỉnh lân cận nếu cần."""
-        if day_index < 7:
-            available = [d for d in priority_districts if priority_districts[d] and d not in used_districts]
-            if available:
-                district = random.choice(available)
-                return priority_districts[district].pop(0)
-
-            available = [d for d in non_priority_districts if non_priority_districts[d] and d not in used_districts]
-            if available:
-                district = random.choice(available)
-                return non_priority_districts[district].pop(0)
-        else:
-            available = [d for d in priority_districts if priority_districts[d] and d not in used_districts]
-            if available:
-                district = random.choice(available)
-                return priority_districts[district].pop(0)
-
-            available = [d for d in non_priority_districts if non_priority_districts[d] and d not in used_districts]
-            if available:
-                district = random.choice(available)
-                return non_priority_districts[district].pop(0)
-
-            # Nếu hết địa điểm ở tỉnh ban đầu, chuyển sang tỉnh lân cận
-            if nearby_provinces:
-                for nearby_province in nearby_provinces:
-                    nearby_pool = recommend_pool(nearby_province, food_df, place_df)
-                    if not nearby_pool["places"]["priority"]:
-                        continue
-                    nearby_priority_places = nearby_pool["places"]["priority"]
-                    nearby_non_priority_places = nearby_pool["places"]["non_priority"]
-                    nearby_priority_districts = group_by_district(nearby_priority_places)
-                    nearby_non_priority_districts = group_by_district(nearby_non_priority_places)
-
-                    available = [d for d in nearby_priority_districts if nearby_priority_districts[d]]
-                    if available:
-                        district = random.choice(available)
-                        return nearby_priority_districts[district].pop(0)
-
-                    available = [d for d in nearby_non_priority_districts if nearby_non_priority_districts[d]]
-                    if available:
-                        district = random.choice(available)
-                        return nearby_non_priority_districts[district].pop(0)
-
-        return {}
-
-    def select_food(day_index):
-        """Chọn một món ăn, ưu tiên tỉnh ban đầu, sau đó là tỉnh lân cận nếu cần."""
-        if day_index < 7:
-            if pool_food:
-                return pool_food.pop(0)
-        else:
-            if pool_food:
-                return pool_food.pop(0)
-            if nearby_provinces:
-                for nearby_province in nearby_provinces:
-                    nearby_pool = recommend_pool(nearby_province, food_df, place_df)
-                    if nearby_pool["food"]:
-                        return nearby_pool["food"].pop(0)
-        return {}
+    # pools[0] là tỉnh ban đầu, pools[k] là vòng lân cận thứ k; mỗi vòng chỉ mở khi các vòng trong đã hết
+    pools = [open_pool(original_pool)]
+    # Vòng đầu tiên còn dữ liệu cho từng loại, chỉ tăng dần nên không quét lại các vòng đã hết
+    cursors = {"food": 0, "place": 0}
+
+    def get_pool(ring):
+        if ring == len(pools):
+            pool = ring_pool(normalized_province, ring, food_df, place_df)
+            if pool is None:
+                return None
+            pools.append(open_pool(pool))
+        return pools[ring]
+
+    def select_place():
+        """Chọn một địa điểm, ưu tiên tỉnh ban đầu rồi mở rộng dần ra các vòng tỉnh lân cận."""
+        while True:
+            pool = get_pool(cursors["place"])
+            if pool is None:
+                return {}
+            for districts in (pool["priority"], pool["non_priority"]):
+                if districts:
+                    return districts.pop()
+            cursors["place"] += 1
+
+    def select_food():
+        """Chọn một món ăn, ưu tiên tỉnh ban đầu rồi mở rộng dần ra các vòng tỉnh lân cận."""
+        while True:
+            pool = get_pool(cursors["food"])
+            if pool is None:
+                return {}
+            food = next(pool["food"], None)
+            if food is not None:
+                return food
+            cursors["food"] += 1
 
     schedule = []
     for i in range(total_days):
         day = start + pd.Timedelta(days=i)
-        used_districts = set()
         itinerary = []
 
-        current_time = datetime.strptime("07:00", "%H:%M")
-        end_time = datetime.strptime("22:30", "%H:%M")
+        current_time = DAY_START_TIME
+        end_time = DAY_END_TIME
 
         if total_days <= 4:
-            num_food_per_day = 3
-            num_place_per_day = 3
             activities = ["food", "place"] * 3
-        elif total_days > 4:
-            num_food_per_day = 3
-            num_place_per_day = 2
-            activities = ["food", "place"] * 2 + ["food"]
         else:
-            num_food_per_day = 2
-            num_place_per_day = 2
-            activities = ["food", "place"] * 2
+            activities = ["food", "place"] * 2 + ["food"]
 
+        # Chọn điểm dừng và thời lượng theo thứ tự khung giờ như engine cũ, sau đó mới sắp theo quãng đường
+        stops = []
         for activity_type in activities:
             if current_time >= end_time:
                 break
-
-            if activity_type == "food" and num_food_per_day > 0:
-                food = select_food(i)
-                if food:
-                    duration = random_duration("food")
-                    start_time = current_time
-                    end_time_activity = add_time(start_time, duration)
-                    itinerary.append({
-                        "type": "food",
-                        "details": food,
-                        "time": f"{format_time(start_time)} - {format_time(end_time_activity)}"
-                    })
-                    current_time = add_time(end_time_activity, timedelta(minutes=30))
-                    num_food_per_day -= 1
-
-            elif activity_type == "place" and num_place_per_day > 0:
-                place = select_place(i, used_districts)
-                if place:
-                    duration = random_duration("place")
-                    start_time = current_time
-                    end_time_activity = add_time(start_time, duration)
-                    if end_time_activity > end_time:
-                        continue
-                    itinerary.append({
-                        "type": "place",
-                        "details": place,
-                        "time": f"{format_time(start_time)} - {format_time(end_time_activity)}"
-                    })
-                    current_time = add_time(end_time_activity, timedelta(minutes=30))
-                    num_place_per_day -= 1
+            details = select_food() if activity_type == "food" else select_place()
+            if not details:
+                continue
+            duration = random_duration(activity_type, rng)
+            end_time_activity = add_time(current_time, duration)
+            if activity_type == "place" and end_time_activity > end_time:
+                continue
+            # Bản ghi trong pool dựng sẵn dùng chung giữa các request, lịch trình nhận bản sao riêng
+            stops.append((activity_type, dict(details), duration))
+            current_time = add_time(end_time_activity, timedelta(minutes=30))
+
+        current_time = DAY_START_TIME
+        for activity_type, details, duration in route_stops(stops):
+            start_time = current_time
+            end_time_activity = add_time(start_time, duration)
+            itinerary.append({
+                "type": activity_type,
+                "details": details,
+                "time": f"{format_time(start_time)} - {format_time(end_time_activity)}"
+            })
+            current_time = add_time(end_time_activity, timedelta(minutes=30))
 
         schedule.append({"day": f"Day {i + 1} ({day.strftime(fmt)})", "itinerary": itinerary})
 
@@ -394,31 +704,86 @@ def recommend_schedule(start_day, end_day, province, food_df, place_df, random_m
         "schedule": schedule
     }
 
-def search_province(province=None, query=None, random_mode=False):
+SCHEDULE_SPEC_FIELDS = ("province", "start_day", "end_day")
+# Batch nhỏ chạy ngay trong tiến trình hiện tại, tránh chi phí gửi dữ liệu sang process pool
+BATCH_INLINE_THRESHOLD = 4
+# Số tiến trình mặc định của process pool (view truyền giá trị từ settings.BATCH_SCHEDULE_WORKERS)
+DEFAULT_BATCH_WORKERS = 2
+
+_batch_executor = None
+_batch_executor_lock = threading.Lock()
+
+def schedule_from_spec(spec):
+    """Tạo lịch trình cho một phần tử của batch; lỗi chỉ được trả về trong phần tử đó."""
+    try:
+        missing = [field for field in SCHEDULE_SPEC_FIELDS if not spec.get(field)]
+        if missing:
+            return {"error": f"Thiếu trường bắt buộc: {', '.join(missing)}"}
+        snapshot = get_catalog().snapshot()
+        return recommend_schedule(spec["start_day"], spec["end_day"], spec["province"],
+                                  snapshot.food_df, snapshot.place_df, seed=spec.get("seed"))
+    except Exception as e:
+        return {"error": f"Lỗi hệ thống: {str(e)}"}
+
+def _warm_batch_worker():
+    # Mỗi tiến trình con nạp catalog một lần (từ snapshot đã xuất bản) trước khi nhận việc
+    get_catalog().snapshot()
+
+def _batch_mp_context():
+    """forkserver (spawn trên Windows): không fork trực tiếp từ worker web đang chạy các luồng nền
+    (nghe Redis, làm mới payload trang chủ, gộp nhật ký), tránh kế thừa khóa đang bị giữ."""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # Tiến trình forkserver import sẵn module (chỉ một luồng) để các tiến trình con không phải import lại
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+def _get_batch_executor(max_workers):
+    global _batch_executor
+    with _batch_executor_lock:
+        if _batch_executor is None:
+            _batch_executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=_batch_mp_context(),
+                                                  initializer=_warm_batch_worker)
+        return _batch_executor
+
+def _reset_batch_executor():
+    global _batch_executor
+    with _batch_executor_lock:
+        if _batch_executor is not None:
+            _batch_executor.shutdown(wait=False, cancel_futures=True)
+        _batch_executor = None
+
+def recommend_schedules_batch(specs, use_processes=True, max_workers=DEFAULT_BATCH_WORKERS):
+    """Tạo nhiều lịch trình trong một lần gọi, trả về đúng thứ tự của specs.
+
+    Mỗi spec gồm province, start_day, end_day và seed (tùy chọn); phần tử lỗi trả về {"error": ...}.
+    max_workers là số tiến trình của process pool dùng chung trong tiến trình này (lấy theo lần gọi đầu tiên).
+    """
+    specs = list(specs)
+    if not use_processes or len(specs) < BATCH_INLINE_THRESHOLD or max_workers < 2 or (os.cpu_count() or 1) < 2:
+        return [schedule_from_spec(spec) for spec in specs]
+
+    executor = _get_batch_executor(max_workers)
+    chunksize = max(1, len(specs) // (4 * max_workers))
+    try:
+        return list(executor.map(schedule_from_spec, specs, chunksize=chunksize))
+    except BrokenProcessPool:
+        _reset_batch_executor()
+        return [schedule_from_spec(spec) for spec in specs]
+
+def search_province(province=None, query=None, random_mode=False, substring=False):
     """Tìm kiếm thông tin theo tỉnh và truy vấn."""
     food_df, place_df, hotel_df = load_data(FOOD_FILE, PLACE_FILE, HOTEL_FILE)
 
-    normalized_province = normalize_text(province) if province else None
-    normalized_query = normalize_text(query) if query else None
-
-    def filter_data(df, province_col='province', name_col='title'):
+    def filter_data(df):
         if df is None:
             return pd.DataFrame()
-        if normalized_province and normalized_query:
-            return df[
-                df[province_col].str.contains(normalized_province, case=False, na=False) &
-                df[name_col].str.contains(normalized_query, case=False, na=False)
-            ]
-        elif normalized_province:
-            return df[df[province_col].str.contains(normalized_province, case=False, na=False)]
-        elif normalized_query:
-            return df[df[name_col].str.contains(normalized_query, case=False, na=False)]
-        else:
-            return df
+        return filter_search(df, province, query, substring)
 
-    filtered_food = filter_data(food_df, province_col='province', name_col='title')
-    filtered_place = filter_data(place_df, province_col='province', name_col='title')
-    filtered_hotel = filter_data(hotel_df, province_col='province', name_col='name')
+    filtered_food = filter_data(food_df)
+    filtered_place = filter_data(place_df)
+    filtered_hotel = filter_data(hotel_df)
 
     if random_mode:
         filtered_food = filtered_food.sample(frac=1) if not filtered_food.empty else filtered_food
@@ -438,126 +803,78 @@ def search_province(province=None, query=None, random_mode=False):
     }
 
 def get_food_homepage(num_item=None):
-    """Lấy danh sách món ăn ngẫu nhiên cho trang chủ."""
+    """Lấy danh sách món ăn ngẫu nhiên cho trang chủ (mỗi tỉnh tối đa một món, từ bucket dựng sẵn)."""
     if num_item is None:
         num_item = random.randint(10, 15)
 
     try:
-        df = pd.read_csv(FOOD_FILE)
-        df.rename(columns={
-            'Province': 'province',
-            'Title': 'title',
-            'Rating': 'rating',
-            'Address': 'address',
-            'Image': 'img'
-        }, inplace=True)
-
-        if 'description' not in df.columns:
-            df['description'] = ''
-
-        df['rating'] = pd.to_numeric(df['rating'].astype(str).str.replace(',', '.'), errors='coerce')
-        df.dropna(subset=['rating', 'title'], inplace=True)
-        filtered_df = df[(df['rating'] >= 3) & (df['rating'] <= 5)].drop_duplicates('title')
-
-        if filtered_df.empty:
-            return []
-
-        unique_provinces = filtered_df['province'].unique()
-        selected_foods = []
-
-        for province in unique_provinces:
-            province_df = filtered_df[filtered_df['province'] == province]
-            if not province_df.empty:
-                selected_foods.append(province_df.sample(1))
-
-        if not selected_foods:
-            return []
-
-        selected_df = pd.concat(selected_foods)
-
-        if len(selected_df) >= num_item:
-            random_foods = selected_df.sample(n=num_item)
-        else:
-            random_foods = selected_df
-
-        return random_foods[['title', 'rating', 'description', 'address', 'img', 'province']].fillna('N/A').to_dict(
-            'records')
-
-    except (FileNotFoundError, pd.errors.EmptyDataError):
+        return get_catalog().snapshot().derived("homepage_buckets")["food"].sample(num_item)
+    except FileNotFoundError:
         return []
     except Exception as e:
         print(f"Error loading food data: {e}")
         return []
 
 def get_place_homepage(num_item=None):
-    """Lấy danh sách địa điểm ngẫu nhiên cho trang chủ."""
+    """Lấy danh sách địa điểm ngẫu nhiên cho trang chủ (mỗi tỉnh tối đa một địa điểm, từ bucket dựng sẵn)."""
     if num_item is None:
         num_item = random.randint(10, 15)
-    df = pd.read_excel(PLACE_FILE)
-    df['rating'] = pd.to_numeric(df['rating'].astype(str).str.replace(',', '.'), errors='coerce')
-    df = df[(df['rating'] >= 3) & (df['rating'] <= 5)].drop_duplicates('title')
-
-    unique_provinces = df['province'].unique()
-    selected_places = []
+    return get_catalog().snapshot().derived("homepage_buckets")["place"].sample(num_item)
 
-    for province in unique_provinces:
-        province_df = df[df['province'] == province]
-        if not province_df.empty:
-            selected_places.append(province_df.sample(1))
+# Tiêu chí thành phố đáng chú ý: rating trung bình và số địa điểm tối thiểu
+MIN_CITY_RATING = 4.0
+MIN_CITY_PLACES = 5
+CITY_PLACE_COLUMNS = ['title', 'rating', 'description', 'address', 'img', 'types', 'link']
 
-    selected_df = pd.concat(selected_places)
+class CityStats:
+    """Bảng tổng hợp địa điểm theo tỉnh (rating trung bình, số địa điểm) của các tỉnh đạt tiêu chí.
 
-    if len(selected_df) >= num_item:
-        random_places = selected_df.sample(n=num_item)
-    else:
-        random_places = selected_df
+    Mỗi tỉnh giữ vị trí dòng và bản ghi dựng sẵn của các địa điểm để request chỉ còn bước chọn ngẫu nhiên.
+    """
 
-    return random_places[['title', 'rating', 'description', 'address', 'img', 'link', 'province']].fillna(
-        'N/A').to_dict('records')
+    def __init__(self, place_df):
+        self.place_total = len(place_df)
+        stats = place_df.groupby('province').agg({
+            'rating': 'mean',
+            'title': 'count'
+        }).rename(columns={'title': 'place_count'})
+        eligible = stats[(stats['rating'] >= MIN_CITY_RATING) & (stats['place_count'] >= MIN_CITY_PLACES)]
+        self.provinces = eligible.index.tolist()
+        self.average_ratings = eligible['rating'].astype(float).tolist()
+        self.place_counts = eligible['place_count'].astype(int).tolist()
+
+        groups = place_df.groupby('province').indices
+        self.positions = [groups[province] for province in self.provinces]
+        rows = place_df.reindex(columns=CITY_PLACE_COLUMNS)
+        rows = rows.astype(object).where(rows.notna(), None)
+        self.places = [rows.iloc[positions].to_dict('records') for positions in self.positions]
+
+    def sample(self, num_cities):
+        """Chọn ngẫu nhiên tối đa num_cities tỉnh, mỗi tỉnh kèm một địa điểm ngẫu nhiên."""
+        picks = random.sample(range(len(self.provinces)), min(num_cities, len(self.provinces)))
+        return [{
+            "province": self.provinces[city],
+            "place": dict(random.choice(self.places[city])),
+            "average_rating": self.average_ratings[city],
+            "place_count": self.place_counts[city]
+        } for city in picks]
+
+@register_derived("city_stats", eager=True, datasets=("place",))
+def _build_city_stats(snapshot):
+    return CityStats(snapshot.place_df)
 
 def get_city_to_be_miss(num_cities=10):
-    """Lấy danh sách các thành phố đáng chú ý."""
+    """Lấy danh sách các thành phố đáng chú ý (từ bảng tổng hợp theo tỉnh dựng sẵn của catalog)."""
     try:
-        _, place_df, _ = load_data(FOOD_FILE, PLACE_FILE, HOTEL_FILE)
+        city_stats = get_catalog().snapshot().derived("city_stats")
 
-        if place_df.empty:
+        if not city_stats.place_total:
             return {"error": "Không có dữ liệu địa điểm."}
 
-        city_stats = place_df.groupby('province').agg({
-            'rating': 'mean',
-            'title': 'count'
-        }).rename(columns={'title': 'place_count'})
-
-        eligible_cities = city_stats[
-            (city_stats['rating'] >= 4.0) & (city_stats['place_count'] >= 5)
-        ]
-
-        if eligible_cities.empty:
+        if not city_stats.provinces:
             return {"error": "Không có thành phố nào đạt tiêu chí (rating trung bình >= 3.5 và số địa điểm >= 5)."}
 
-        selected_cities = eligible_cities.sample(n=min(num_cities, len(eligible_cities)), random_state=None)
-
-        result = []
-        for city in selected_cities.index:
-            city_places = place_df[place_df['province'] == city]
-            random_place = city_places.sample(1, random_state=None).iloc[0]
-
-            result.append({
-                "province": city,
-                "place": {
-                    "title": random_place['title'],
-                    "rating": float(random_place['rating']) if pd.notna(random_place['rating']) else None,
-                    "description": random_place.get('description', ''),
-                    "address": random_place['address'],
-                    "img": random_place['img'],
-                    "types": random_place.get('types', []),
-                    "link": random_place.get('link', '')
-                },
-                "average_rating": float(selected_cities.loc[city, 'rating']),
-                "place_count": int(selected_cities.loc[city, 'place_count'])
-            })
-
-        return {"cities": result, "timestamp": datetime.now().isoformat()}
+        return {"cities": city_stats.sample(num_cities), "timestamp": datetime.now().isoformat()}
 
     except Exception as e:
         return {"error": f"Lỗi hệ thống: {str(e)}"}
@@ -567,11 +884,7 @@ def get_city_to_be_miss(num_cities=10):
 def food_exists(province, title):
     """Kiểm tra xem món ăn đã tồn tại chưa dựa trên province và title."""
     try:
-        df = pd.read_csv(FOOD_FILE)
-        normalized_province = normalize_text(province)
-        normalized_title = normalize_text(title)
-        return not df[(df['province'].apply(normalize_text) == normalized_province) &
-                      (df['title'].apply(normalize_text) == normalized_title)].empty
+        return food_table.exists(food_table.make_key(province, title))
     except Exception as e:
         print(f"Error checking food existence: {e}")
         return False
@@ -579,11 +892,7 @@ def food_exists(province, title):
 def place_exists(province, title):
     """Kiểm tra xem địa điểm đã tồn tại chưa dựa trên province và title."""
     try:
-        df = pd.read_excel(PLACE_FILE)
-        normalized_province = normalize_text(province)
-        normalized_title = normalize_text(title)
-        return not df[(df['province'].apply(normalize_text) == normalized_province) &
-                      (df['title'].apply(normalize_text) == normalized_title)].empty
+        return place_table.exists(place_table.make_key(province, title))
     except Exception as e:
         print(f"Error checking place existence: {e}")
-        return False
\ No newline at end of file
+        return False
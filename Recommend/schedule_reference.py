@@ -0,0 +1,307 @@
+import random
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from .processed import normalize_text
+
+# Engine lịch trình cũ (trước pool dựng sẵn và DistrictPool), giữ nguyên để benchmark và test so sánh:
+# với cùng random.seed, engine mới phải chọn cùng các điểm dừng và thời lượng cho từng ngày.
+
+# Danh sách các tỉnh lân cận (chuẩn hóa không dấu và viết thường)
+NEARBY_PROVINCES = {
+    "ha giang": ["tuyen quang", "cao bang"],
+    "cao bang": ["ha giang", "lang son"],
+    "lang son": ["cao bang", "bac giang"],
+    "bac giang": ["lang son", "thai nguyen"],
+    "bac kan": ["thai nguyen", "cao bang"],
+    "thai nguyen": ["bac giang", "phu tho"],
+    "phu tho": ["thai nguyen", "vinh phuc"],
+    "vinh phuc": ["phu tho", "ha noi"],
+    "ha noi": ["vinh phuc", "bac ninh"],
+    "bac ninh": ["ha noi", "hung yen"],
+    "hung yen": ["bac ninh", "hai duong"],
+    "hai duong": ["hung yen", "quang ninh"],
+    "quang ninh": ["hai duong", "lang son"],
+    "thai binh": ["nam dinh", "hai phong"],
+    "nam dinh": ["thai binh", "ha nam"],
+    "ha nam": ["nam dinh", "ninh binh"],
+    "ninh binh": ["ha nam", "thanh hoa"],
+    "thanh hoa": ["ninh binh", "nghe an"],
+    "nghe an": ["thanh hoa", "ha tinh"],
+    "ha tinh": ["nghe an", "quang binh"],
+    "quang binh": ["ha tinh", "quang tri"],
+    "quang tri": ["quang binh", "thua thien-hue"],
+    "thua thien-hue": ["quang tri", "da nang"],
+    "da nang": ["thua thien-hue", "quang nam"],
+    "quang nam": ["da nang", "quang ngai"],
+    "quang ngai": ["quang nam", "binh dinh"],
+    "binh dinh": ["quang ngai", "phu yen"],
+    "phu yen": ["binh dinh", "khanh hoa"],
+    "khanh hoa": ["phu yen", "ninh thuan"],
+    "ninh thuan": ["khanh hoa", "binh thuan"],
+    "binh thuan": ["ninh thuan", "dong nai"],
+    "dong nai": ["binh thuan", "binh duong"],
+    "binh duong": ["dong nai", "binh phuoc"],
+    "binh phuoc": ["binh duong", "tay ninh"],
+    "tay ninh": ["binh phuoc", "ho chi minh"],
+    "ho chi minh": ["tay ninh", "binh duong"],
+    "ba ria-vung tau": ["dong nai", "binh thuan"],
+    "long an": ["ho chi minh", "tien giang"],
+    "tien giang": ["long an", "ben tre"],
+    "ben tre": ["tien giang", "tra vinh"],
+    "tra vinh": ["ben tre", "vinh long"],
+    "vinh long": ["tra vinh", "an giang"],
+    "an giang": ["vinh long", "dong thap"],
+    "dong thap": ["an giang", "tien giang"],
+    "kien giang": ["dong thap", "can tho"],
+    "can tho": ["kien giang", "hau giang"],
+    "hau giang": ["can tho", "soc trang"],
+    "soc trang": ["hau giang", "bac lieu"],
+    "bac lieu": ["soc trang", "ca mau"],
+    "ca mau": ["bac lieu", "kien giang"],
+    "kon tum": ["gia lai", "dak nong"],
+    "gia lai": ["kon tum", "dak lak"],
+    "dak lak": ["gia lai", "dak nong"],
+    "dak nong": ["dak lak", "lam dong"],
+    "lam dong": ["dak nong", "khanh hoa"],
+    "hoa binh": ["phu tho", "son la"],
+    "son la": ["hoa binh", "yen bai"],
+    "yen bai": ["son la", "lao cai"],
+    "lao cai": ["yen bai", "lai chau"],
+    "lai chau": ["lao cai", "dien bien"],
+    "dien bien": ["lai chau", "son la"],
+    "tuyen quang": ["ha giang", "vinh phuc"]
+}
+
+def is_non_priority_place(place):
+    """Xác định địa điểm không ưu tiên (dành cho trẻ em)."""
+    non_priority_types = ["Trung tâm vui chơi dành cho trẻ em", "Sân chơi", "Khu trẻ em"]
+    non_priority_keywords = ["thiếu nhi", "trẻ"]
+
+    place_types = place.get('types', [])
+    if any(t in place_types for t in non_priority_types):
+        return True
+
+    title = normalize_text(place.get('title', ''))
+    if any(keyword in title for keyword in non_priority_keywords):
+        return True
+
+    return False
+
+def recommend_pool(province, food_df, place_df):
+    """Tạo danh sách đề xuất món ăn và địa điểm từ tỉnh được chọn."""
+    normalized_province = normalize_text(province)
+    filtered_food = food_df[food_df['province'].str.contains(normalized_province, case=False, na=False)]
+    filtered_place = place_df[place_df['province'].str.contains(normalized_province, case=False, na=False)]
+
+    if filtered_food.empty or filtered_place.empty:
+        return {"food": [], "places": {"priority": [], "non_priority": []}}
+
+    food_pool = filtered_food.drop_duplicates('title').sort_values(by='rating', ascending=False)[
+        ['title', 'rating', 'description', 'address', 'img']
+    ].to_dict('records')
+
+    place_pool = filtered_place.drop_duplicates('title').sort_values(by='rating', ascending=False)[
+        ['title', 'rating', 'description', 'address', 'img', 'link', 'types']
+    ].to_dict('records')
+
+    priority_pool = [place for place in place_pool if not is_non_priority_place(place)]
+    non_priority_pool = [place for place in place_pool if is_non_priority_place(place)]
+
+    return {
+        "food": food_pool,
+        "places": {
+            "priority": priority_pool,
+            "non_priority": non_priority_pool
+        }
+    }
+
+def random_duration(activity_type):
+    """Chọn ngẫu nhiên thời gian cho hoạt động."""
+    if activity_type == "food":
+        durations = [60, 90, 120]  # Phút
+    else:  # place
+        durations = [120, 150, 180]  # Phút
+    return timedelta(minutes=random.choice(durations))
+
+def add_time(start_time, duration):
+    """Cộng thêm thời gian duration vào start_time."""
+    return start_time + duration
+
+def format_time(time):
+    """Định dạng thời gian thành chuỗi HH:MM."""
+    return time.strftime("%H:%M")
+
+def recommend_schedule(start_day, end_day, province, food_df, place_df, random_mode=False):
+    """Tạo lịch trình dựa trên tỉnh được chọn, mở rộng sang tỉnh lân cận nếu cần."""
+    fmt = "%Y-%m-%d"
+    try:
+        start = datetime.strptime(start_day, fmt)
+        end = datetime.strptime(end_day, fmt)
+    except ValueError:
+        return {"error": "Invalid date format. Please use YYYY-MM-DD."}
+
+    total_days = (end - start).days + 1
+    if total_days < 1:
+        return {"error": "Ngày kết thúc phải sau hoặc bằng ngày bắt đầu."}
+
+    normalized_province = normalize_text(province)
+    nearby_provinces = NEARBY_PROVINCES.get(normalized_province, [])
+
+    # Tạo pool cho tỉnh ban đầu
+    original_pool = recommend_pool(normalized_province, food_df, place_df)
+    if not original_pool["food"] or not original_pool["places"]["priority"]:
+        return {"error": f"Không có dữ liệu cho tỉnh {province}."}
+
+    # Sao chép pool để sử dụng
+    pool_food = original_pool["food"].copy()
+    priority_places = original_pool["places"]["priority"].copy()
+    non_priority_places = original_pool["places"]["non_priority"].copy()
+
+    if random_mode:
+        random.shuffle(pool_food)
+        random.shuffle(priority_places)
+        random.shuffle(non_priority_places)
+
+    def group_by_district(places):
+        """Nhóm địa điểm theo quận/huyện."""
+        district_to_places = {}
+        for place in places:
+            parts = place.get("address", "").split(", ")
+            district = parts[-3] if len(parts) >= 3 else "unknown"
+            district_to_places.setdefault(district, []).append(place)
+        for district in district_to_places:
+            if random_mode:
+                random.shuffle(district_to_places[district])
+        return district_to_places
+
+    priority_districts = group_by_district(priority_places)
+    non_priority_districts = group_by_district(non_priority_places)
+
+    def select_place(day_index, used_districts):
+        """Chọn một địa điểm, ưu tiên tỉnh ban đầu, sau đó là tỉnh lân cận nếu cần."""
+        if day_index < 7:
+            available = [d for d in priority_districts if priority_districts[d] and d not in used_districts]
+            if available:
+                district = random.choice(available)
+                return priority_districts[district].pop(0)
+
+            available = [d for d in non_priority_districts if non_priority_districts[d] and d not in used_districts]
+            if available:
+                district = random.choice(available)
+                return non_priority_districts[district].pop(0)
+        else:
+            available = [d for d in priority_districts if priority_districts[d] and d not in used_districts]
+            if available:
+                district = random.choice(available)
+                return priority_districts[district].pop(0)
+
+            available = [d for d in non_priority_districts if non_priority_districts[d] and d not in used_districts]
+            if available:
+                district = random.choice(available)
+                return non_priority_districts[district].pop(0)
+
+            # Nếu hết địa điểm ở tỉnh ban đầu, chuyển sang tỉnh lân cận
+            if nearby_provinces:
+                for nearby_province in nearby_provinces:
+                    nearby_pool = recommend_pool(nearby_province, food_df, place_df)
+                    if not nearby_pool["places"]["priority"]:
+                        continue
+                    nearby_priority_places = nearby_pool["places"]["priority"]
+                    nearby_non_priority_places = nearby_pool["places"]["non_priority"]
+                    nearby_priority_districts = group_by_district(nearby_priority_places)
+                    nearby_non_priority_districts = group_by_district(nearby_non_priority_places)
+
+                    available = [d for d in nearby_priority_districts if nearby_priority_districts[d]]
+                    if available:
+                        district = random.choice(available)
+                        return nearby_priority_districts[district].pop(0)
+
+                    available = [d for d in nearby_non_priority_districts if nearby_non_priority_districts[d]]
+                    if available:
+                        district = random.choice(available)
+                        return nearby_non_priority_districts[district].pop(0)
+
+        return {}
+
+    def select_food(day_index):
+        """Chọn một món ăn, ưu tiên tỉnh ban đầu, sau đó là tỉnh lân cận nếu cần."""
+        if day_index < 7:
+            if pool_food:
+                return pool_food.pop(0)
+        else:
+            if pool_food:
+                return pool_food.pop(0)
+            if nearby_provinces:
+                for nearby_province in nearby_provinces:
+                    nearby_pool = recommend_pool(nearby_province, food_df, place_df)
+                    if nearby_pool["food"]:
+                        return nearby_pool["food"].pop(0)
+        return {}
+
+    schedule = []
+    for i in range(total_days):
+        day = start + pd.Timedelta(days=i)
+        used_districts = set()
+        itinerary = []
+
+        current_time = datetime.strptime("07:00", "%H:%M")
+        end_time = datetime.strptime("22:30", "%H:%M")
+
+        if total_days <= 4:
+            num_food_per_day = 3
+            num_place_per_day = 3
+            activities = ["food", "place"] * 3
+        elif total_days > 4:
+            num_food_per_day = 3
+            num_place_per_day = 2
+            activities = ["food", "place"] * 2 + ["food"]
+        else:
+            num_food_per_day = 2
+            num_place_per_day = 2
+            activities = ["food", "place"] * 2
+
+        for activity_type in activities:
+            if current_time >= end_time:
+                break
+
+            if activity_type == "food" and num_food_per_day > 0:
+                food = select_food(i)
+                if food:
+                    duration = random_duration("food")
+                    start_time = current_time
+                    end_time_activity = add_time(start_time, duration)
+                    itinerary.append({
+                        "type": "food",
+                        "details": food,
+                        "time": f"{format_time(start_time)} - {format_time(end_time_activity)}"
+                    })
+                    current_time = add_time(end_time_activity, timedelta(minutes=30))
+                    num_food_per_day -= 1
+
+            elif activity_type == "place" and num_place_per_day > 0:
+                place = select_place(i, used_districts)
+                if place:
+                    duration = random_duration("place")
+                    start_time = current_time
+                    end_time_activity = add_time(start_time, duration)
+                    if end_time_activity > end_time:
+                        continue
+                    itinerary.append({
+                        "type": "place",
+                        "details": place,
+                        "time": f"{format_time(start_time)} - {format_time(end_time_activity)}"
+                    })
+                    current_time = add_time(end_time_activity, timedelta(minutes=30))
+                    num_place_per_day -= 1
+
+        schedule.append({"day": f"Day {i + 1} ({day.strftime(fmt)})", "itinerary": itinerary})
+
+    return {
+        "total_days": total_days,
+        "start_day": start_day,
+        "end_day": end_day,
+        "province": normalized_province,
+        "schedule": schedule
+    }
@@ -0,0 +1,199 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # Không có pyarrow thì luôn đọc trực tiếp từ file nguồn
+    pa = None
+    feather = None
+
+from .catalog import DATASETS
+from .journal import journal_path
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), "data", "snapshot")
+MANIFEST_FILE = "manifest.json"
+# File trỏ tới thư mục phiên bản snapshot đang được công bố
+CURRENT_FILE = "CURRENT"
+# Giữ lại phiên bản trước để worker chưa kịp chuyển vẫn đọc được
+KEEP_VERSIONS = 2
+SNAPSHOT_FORMAT = 5
+# Các cột chứa list Python, cần khôi phục bằng to_pylist khi đọc lại
+LIST_COLUMNS = ("types",)
+# Kiểu pandas của cột chuỗi: string[pyarrow] dùng thẳng bộ đệm large_string của Arrow, không sao chép
+STRING_DTYPE = pd.StringDtype("pyarrow") if pa is not None else None
+
+
+def snapshot_available():
+    """Có pyarrow để ghi/đọc snapshot hay không."""
+    return feather is not None
+
+
+def use_arrow_strings(df):
+    """Chuyển các cột chuỗi của df (vừa đọc từ file nguồn) sang string[pyarrow] như khi đọc từ snapshot.
+
+    Ô trống thành pd.NA thay vì NaN; không có pyarrow thì giữ nguyên cột object.
+    """
+    if STRING_DTYPE is None:
+        return df
+    for name in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[name], skipna=True) == "string":
+            df[name] = df[name].astype(STRING_DTYPE)
+    return df
+
+
+def source_digest(path):
+    """Tính sha1 nội dung file nguồn để kiểm tra snapshot còn mới hay không."""
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def _source_entry(path):
+    entry = {"file": os.path.basename(path), "sha1": source_digest(path)}
+    # Thay đổi của admin chưa gộp vào file nguồn cũng là một phần của dữ liệu
+    journal = journal_path(path)
+    if os.path.exists(journal) and os.path.getsize(journal):
+        entry["journal_sha1"] = source_digest(journal)
+    return entry
+
+
+def _sources_manifest(paths):
+    return {dataset: _source_entry(path) for dataset, path in zip(DATASETS, paths) if path}
+
+
+def snapshot_version(sources):
+    """Phiên bản snapshot suy từ nội dung file nguồn, giống nhau trên mọi worker."""
+    digest = hashlib.sha1(json.dumps(sources, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"v{SNAPSHOT_FORMAT}-{digest[:12]}"
+
+
+def current_version(directory=SNAPSHOT_DIR):
+    """Đọc phiên bản snapshot đang được công bố (None nếu chưa có)."""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _publish_current(directory, version):
+    tmp_path = os.path.join(directory, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(directory, CURRENT_FILE))
+
+
+def _prune_versions(directory, keep):
+    """Xóa các phiên bản cũ; worker đang đọc file cũ vẫn đọc xong được trên POSIX, Windows thì bỏ qua."""
+    versions = sorted(
+        (entry for entry in os.scandir(directory) if entry.is_dir() and entry.name.startswith("v")),
+        key=lambda entry: entry.stat().st_mtime, reverse=True
+    )
+    for entry in versions:
+        if entry.name in keep:
+            continue
+        if len(keep) < KEEP_VERSIONS:
+            keep.add(entry.name)
+            continue
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def write_snapshot(frames, paths, directory=SNAPSHOT_DIR):
+    """Ghi các DataFrame đã chuẩn hóa thành một phiên bản snapshot Feather rồi công bố nguyên tử.
+
+    Mỗi phiên bản nằm trong thư mục riêng; file CURRENT trỏ tới phiên bản đang dùng và chỉ được
+    thay bằng os.replace sau khi thư mục đã ghi xong, nên worker không bao giờ đọc snapshot dở dang.
+    """
+    if feather is None:
+        raise RuntimeError("Cần cài pyarrow để build snapshot catalog.")
+
+    sources = _sources_manifest(paths)
+    version = snapshot_version(sources)
+    version_dir = os.path.join(directory, version)
+    manifest = {"format": SNAPSHOT_FORMAT, "version": version, "sources": sources, "files": {}}
+    for dataset, df in zip(DATASETS, frames):
+        if df is not None:
+            manifest["files"][dataset] = f"{dataset}.feather"
+
+    if not os.path.isdir(version_dir):
+        os.makedirs(directory, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=f".{version}-", dir=directory)
+        os.chmod(tmp_dir, 0o755)
+        try:
+            for dataset, df in zip(DATASETS, frames):
+                if df is None:
+                    continue
+                table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+                # Ghi chuỗi dạng large_string (kiểu gốc của string[pyarrow]) để khi đọc không phải chuyển kiểu
+                table = table.cast(pa.schema([
+                    field.with_type(pa.large_string()) if pa.types.is_string(field.type) else field
+                    for field in table.schema
+                ], metadata=table.schema.metadata))
+                feather.write_feather(table, os.path.join(tmp_dir, manifest["files"][dataset]),
+                                      compression="uncompressed")
+            with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.rename(tmp_dir, version_dir)
+        except OSError:
+            # Worker khác vừa công bố cùng phiên bản (cùng nội dung nguồn) thì dùng lại bản đó
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.isdir(version_dir):
+                raise
+
+    _publish_current(directory, version)
+    _prune_versions(directory, {version})
+    return manifest
+
+
+def _read_frame(path):
+    # Cột chuỗi (phần lớn dung lượng catalog) là string[pyarrow] trỏ thẳng vào file đã memory-map: các worker
+    # dùng chung trang của page cache thay vì mỗi worker giữ một bản object Python. Cột số/bool và list nhỏ
+    # vẫn chuyển sang numpy/list như thường.
+    table = feather.read_table(path, memory_map=True)
+    list_columns = [name for name in LIST_COLUMNS if name in table.column_names]
+    df = table.drop_columns(list_columns).to_pandas(types_mapper={pa.large_string(): STRING_DTYPE}.get)
+    for name in list_columns:
+        df[name] = table.column(name).to_pylist()
+    return df[table.column_names]
+
+
+def read_snapshot(paths, directory=SNAPSHOT_DIR):
+    """Đọc snapshot đang công bố nếu còn khớp với file nguồn, ngược lại trả về None."""
+    if feather is None:
+        return None
+
+    version = current_version(directory)
+    if version is None:
+        return None
+    version_dir = os.path.join(directory, version)
+    try:
+        with open(os.path.join(version_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    if manifest.get("format") != SNAPSHOT_FORMAT or manifest.get("sources") != _sources_manifest(paths):
+        logger.info("Snapshot catalog đã cũ, đọc lại từ file nguồn.")
+        return None
+
+    frames = []
+    for dataset, path in zip(DATASETS, paths):
+        if path is None:
+            frames.append(None)
+            continue
+        filename = manifest["files"].get(dataset)
+        if filename is None:
+            return None
+        frames.append(_read_frame(os.path.join(version_dir, filename)))
+    return tuple(frames)
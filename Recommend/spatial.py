@@ -0,0 +1,108 @@
+import numpy as np
+from sklearn.neighbors import BallTree
+
+from .catalog import DATASETS, register_derived
+from .gazetteer import normalize_text
+from .geo import EARTH_RADIUS_KM
+
+# Cột tên hiển thị của từng tập dữ liệu
+NAME_COLUMNS = {"food": "title", "place": "title", "hotel": "name"}
+# Các cột trả về cho API nearby
+NEARBY_COLUMNS = {
+    "food": ["title", "rating", "address", "img", "province_name"],
+    "place": ["title", "rating", "description", "address", "img", "link", "province_name"],
+    "hotel": ["name", "location_rating", "hotel_class", "price", "img_origin", "link", "province_name"],
+}
+MAX_NEARBY_RESULTS = 50
+
+
+def normalize_name(text):
+    """Chuẩn hóa tên để tra cứu: bỏ dấu, chữ thường, gộp khoảng trắng."""
+    return " ".join(normalize_text(text).split())
+
+
+def located_records(df, columns):
+    """Dựng sẵn bản ghi trả về (NaN -> None) cho các dòng có tọa độ, theo đúng thứ tự điểm của cây."""
+    rows = df.reindex(columns=columns + ["lat", "lng"]).dropna(subset=["lat", "lng"])
+    return rows.astype(object).where(rows.notna(), None).to_dict("records")
+
+
+class SpatialIndex:
+    """BallTree (haversine) trên các dòng đã có tọa độ của một DataFrame."""
+
+    def __init__(self, lat, lng, records=None):
+        lat = np.asarray(lat, dtype=float)
+        lng = np.asarray(lng, dtype=float)
+        located = ~(np.isnan(lat) | np.isnan(lng))
+        # Vị trí dòng trong DataFrame ứng với từng điểm của cây
+        self.positions = np.flatnonzero(located)
+        self.points = np.radians(np.column_stack((lat[located], lng[located])))
+        self.records = records
+        self._tree = BallTree(self.points, metric="haversine") if len(self.positions) else None
+
+    def __len__(self):
+        return len(self.positions)
+
+    def nearest(self, lat, lng, k=10, radius_km=None):
+        """Trả về (chỉ số điểm trong cây, khoảng cách km) của k điểm gần nhất, lọc theo bán kính nếu có."""
+        if self._tree is None or k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        query = np.radians([[lat, lng]])
+        if radius_km is None:
+            distances, indices = self._tree.query(query, k=min(k, len(self.positions)))
+            distances, indices = distances[0], indices[0]
+        else:
+            indices, distances = self._tree.query_radius(query, r=radius_km / EARTH_RADIUS_KM,
+                                                         return_distance=True, sort_results=True)
+            distances, indices = distances[0][:k], indices[0][:k]
+        return indices, distances * EARTH_RADIUS_KM
+
+
+@register_derived("spatial_index", eager=True, per_dataset=True)
+def _build_catalog_spatial_index(snapshot, dataset):
+    df = snapshot.frame(dataset)
+    if "lat" not in df.columns:
+        return None
+    return SpatialIndex(df["lat"], df["lng"], located_records(df, NEARBY_COLUMNS[dataset]))
+
+
+@register_derived("located_names", per_dataset=True)
+def _build_located_names(snapshot, dataset):
+    """Tên đã chuẩn hóa -> vị trí dòng, chỉ gồm các dòng có tọa độ (dùng làm điểm mốc tìm gần)."""
+    df = snapshot.frame(dataset)
+    if "lat" not in df.columns:
+        return None
+    lookup = {}
+    column = df[NAME_COLUMNS[dataset]].map(normalize_name)
+    for position in snapshot.derived("spatial_index")[dataset].positions:
+        lookup.setdefault(column.iat[position], position)
+    return lookup
+
+
+def locate(snapshot, dataset, name):
+    """Tìm tọa độ của một địa điểm/món ăn/khách sạn theo tên; None nếu không có hoặc chưa định vị."""
+    position = snapshot.derived("located_names").get(dataset, {}).get(normalize_name(name))
+    if position is None:
+        return None
+    row = snapshot.frame(dataset)
+    return position, float(row["lat"].iat[position]), float(row["lng"].iat[position])
+
+
+def nearby(snapshot, lat, lng, datasets=DATASETS, k=10, radius_km=None, exclude=None):
+    """Các mục gần (lat, lng) nhất cho từng tập dữ liệu; exclude=(dataset, vị trí) để bỏ chính điểm mốc."""
+    k = min(k, MAX_NEARBY_RESULTS)
+    results = {}
+    for dataset in datasets:
+        index = snapshot.derived("spatial_index").get(dataset)
+        if index is None:
+            results[dataset] = []
+            continue
+        excluded = exclude[1] if exclude is not None and exclude[0] == dataset else None
+        indices, distances = index.nearest(lat, lng, k + (excluded is not None), radius_km)
+        records = [
+            dict(index.records[point], distance_km=round(float(distance), 3))
+            for point, distance in zip(indices.tolist(), distances.tolist())
+            if index.positions[point] != excluded
+        ]
+        results[dataset] = records[:k]
+    return results
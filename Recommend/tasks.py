@@ -1,19 +1,15 @@
 from datetime import date, datetime, timedelta
 from django.core.mail import send_mail
 from django.conf import settings
-import MySQLdb
 from celery import shared_task
 import logging
 import redis
 
-logger = logging.getLogger(__name__)
+from .journal import compact_all
+from .mysql_pool import mysql_pool
+from . import processed, hotel  # noqa: F401 (đăng ký các bảng có nhật ký thay đổi)
 
-MYSQL_HOST = settings.DATABASES['default']['HOST']
-MYSQL_USER = settings.DATABASES['default']['USER']
-MYSQL_PASSWORD = settings.DATABASES['default']['PASSWORD']
-MYSQL_DB = settings.DATABASES['default']['NAME']
-MYSQL_PORT = int(settings.DATABASES['default'].get('PORT', 3306))
-MYSQL_CHARSET = 'utf8'
+logger = logging.getLogger(__name__)
 
 # Kết nối tới Redis
 redis_client = redis.Redis.from_url(settings.CELERY_BROKER_URL, decode_responses=True)
@@ -32,21 +28,18 @@ def send_activity_reminder_task(self):
             logger.info(f"Đã gửi email nhắc nhở hoạt động cho ngày {today}, bỏ qua.")
             return
 
-        db = MySQLdb.connect(host=MYSQL_HOST, user=MYSQL_USER, passwd=MYSQL_PASSWORD,
-                             db=MYSQL_DB, port=MYSQL_PORT, charset=MYSQL_CHARSET)
-        cursor = db.cursor()
-
         # Lấy các hoạt động có date_activities là hôm nay và chưa hoàn thành
-        cursor.execute(
-            """
-            SELECT a.activity_id, a.note_activities, a.date_activities, u.email, u.full_name
-            FROM todolist a
-            JOIN users u ON a.user_id = u.id
-            WHERE a.status = 0 AND a.date_activities = %s
-            """,
-            [today]
-        )
-        activities = cursor.fetchall()
+        with mysql_pool.connection() as db, db.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT a.activity_id, a.note_activities, a.date_activities, u.email, u.full_name
+                FROM todolist a
+                JOIN users u ON a.user_id = u.id
+                WHERE a.status = 0 AND a.date_activities = %s
+                """,
+                [today]
+            )
+            activities = cursor.fetchall()
         logger.info(f"Tìm thấy {len(activities)} hoạt động để nhắc nhở")
 
         for activity in activities:
@@ -79,9 +72,6 @@ def send_activity_reminder_task(self):
         # Lưu thời gian gửi email cuối cùng cho ngày hôm nay
         redis_client.set(last_sent_key, "sent")
 
-        cursor.close()
-        db.close()
-
     except Exception as e:
         logger.error(f"Lỗi trong send_activity_reminder_task: {str(e)}")
         raise
@@ -100,20 +90,17 @@ def send_trip_reminder_task(self):
             logger.info(f"Đã gửi email nhắc nhở chuyến đi cho ngày {today}, bỏ qua.")
             return
 
-        db = MySQLdb.connect(host=MYSQL_HOST, user=MYSQL_USER, passwd=MYSQL_PASSWORD,
-                             db=MYSQL_DB, port=MYSQL_PORT, charset=MYSQL_CHARSET)
-        cursor = db.cursor()
-
         # Lấy tất cả hoạt động để kiểm tra date_plan
-        cursor.execute(
-            """
-            SELECT a.activity_id, a.date_plan, u.email, u.full_name
-            FROM todolist a
-            JOIN users u ON a.user_id = u.id
-            WHERE a.status = 0
-            """
-        )
-        activities = cursor.fetchall()
+        with mysql_pool.connection() as db, db.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT a.activity_id, a.date_plan, u.email, u.full_name
+                FROM todolist a
+                JOIN users u ON a.user_id = u.id
+                WHERE a.status = 0
+                """
+            )
+            activities = cursor.fetchall()
         logger.info(f"Tìm thấy {len(activities)} hoạt động để kiểm tra nhắc nhở chuyến đi")
 
         for activity in activities:
@@ -173,9 +160,17 @@ def send_trip_reminder_task(self):
         # Lưu thời gian gửi email cuối cùng cho ngày hôm nay
         redis_client.set(last_sent_key, "sent")
 
-        cursor.close()
-        db.close()
-
     except Exception as e:
         logger.error(f"Lỗi trong send_trip_reminder_task: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+@shared_task(bind=True, name="Recommend.tasks.compact_journals_task")
+def compact_journals_task(self):
+    """Gộp nhật ký thay đổi của admin (món ăn, địa điểm, khách sạn) vào file nguồn."""
+    try:
+        for filename, entries in compact_all().items():
+            if entries:
+                logger.info(f"Đã gộp {entries} thay đổi vào {filename}")
+    except Exception as e:
+        logger.error(f"Lỗi trong compact_journals_task: {str(e)}")
+        raise
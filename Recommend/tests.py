@@ -1,3 +1,711 @@
-from django.test import TestCase
+import io
+import os
+import random
+import shutil
+import tempfile
+import threading
+from datetime import date
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import MySQLdb
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from . import views
+from .bulk import BULK_DATASETS, BulkDataset, BulkImportError, import_rows
+from .catalog import Catalog, register_derived, set_change_feed
+from .gazetteer import airport_code, hop_distance, neighbour_rings, province_name, resolve_province
+from .hotel_index import HotelFacets, HotelIndex, hotel_stars
+from .journal import JournaledTable, KeyChangeError
+from .mysql_pool import ConnectionPool, PoolTimeout
+from .processed import DistrictPool, add_place_features, filter_search, normalize_text, recommend_schedule, \
+    schedule_pool
+from .schedule_reference import recommend_schedule as reference_schedule
+from .snapshot import STRING_DTYPE, read_snapshot, write_snapshot
+from .text_index import MAX_COMPLETIONS, MAX_SCAN_ROWS, PrefixIndex, TrigramIndex, normalize_search_text
+
+
+class TempDirMixin:
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write_csv(self, name, df):
+        path = os.path.join(self.directory, name)
+        df.to_csv(path, index=False)
+        return path
+
+
+# Số lần dựng cấu trúc dẫn xuất của test, theo tập dữ liệu
+_derived_builds = []
+
+
+@register_derived("test_food_titles", datasets=("food",))
+def _build_test_food_titles(snapshot):
+    _derived_builds.append("food")
+    return tuple(snapshot.food_df["title"])
+
+
+@register_derived("test_titles", per_dataset=True)
+def _build_test_titles(snapshot, dataset):
+    _derived_builds.append(dataset)
+    return tuple(snapshot.frame(dataset)["title"])
+
+
+class FakeChangeFeed:
+    """Kênh báo thay đổi trong bộ nhớ thay cho Redis."""
+
+    def __init__(self):
+        self.version = 1
+        self.published = 0
+        self.reloads = 0
+
+    def current_version(self):
+        return self.version
+
+    def publish(self):
+        self.published += 1
+        self.version += 1
+
+    def record_reload(self, seconds):
+        self.reloads += 1
+
+
+class CatalogTests(TempDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.food_path = self.write_csv("food.csv", pd.DataFrame({"title": ["Phở", "Bún chả"]}))
+        self.place_path = self.write_csv("place.csv", pd.DataFrame({"title": ["Hồ Gươm"]}))
+        self.loads = []
+        self.reloads = []
+        _derived_builds.clear()
+
+    def load(self, food_path, place_path, hotel_path=None):
+        self.loads.append((food_path, place_path))
+        return pd.read_csv(food_path), pd.read_csv(place_path), None
+
+    def reload(self, frames, changed, food_path, place_path, hotel_path=None):
+        self.reloads.append(set(changed))
+        food_df, place_df, hotel_df = frames
+        return (pd.read_csv(food_path) if "food" in changed else food_df,
+                pd.read_csv(place_path) if "place" in changed else place_df, hotel_df)
+
+    def touch(self, path, df):
+        df.to_csv(path, index=False)
+        stat = os.stat(path)
+        # Bảo đảm mtime đổi kể cả khi hai lần ghi rơi vào cùng một tick
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    def test_snapshot_is_shared_until_source_changes(self):
+        catalog = Catalog(self.load, self.food_path, self.place_path, eager=[])
+        first = catalog.snapshot()
+        self.assertIs(catalog.snapshot(), first)
+        self.assertEqual(len(self.loads), 1)
+
+        self.touch(self.food_path, pd.DataFrame({"title": ["Phở", "Bún chả", "Bánh mì"]}))
+        second = catalog.snapshot()
+        self.assertIsNot(second, first)
+        self.assertNotEqual(second.version, first.version)
+        self.assertEqual(list(second.food_df["title"]), ["Phở", "Bún chả", "Bánh mì"])
+        self.assertEqual(len(self.loads), 2)
+
+    def test_bump_version_forces_reload(self):
+        catalog = Catalog(self.load, self.food_path, self.place_path, eager=[])
+        first = catalog.snapshot()
+        catalog.bump_version()
+        self.assertIsNot(catalog.snapshot(), first)
+        self.assertEqual(len(self.loads), 2)
+
+    def test_derived_is_built_once_per_snapshot(self):
+        catalog = Catalog(self.load, self.food_path, self.place_path, eager=[])
+        first = catalog.snapshot()
+        self.assertIs(first.derived("test_food_titles"), first.derived("test_food_titles"))
+        self.assertEqual(first.derived("test_food_titles"), ("Phở", "Bún chả"))
+        self.assertEqual(_derived_builds, ["food"])
+
+        self.touch(self.food_path, pd.DataFrame({"title": ["Bánh mì"]}))
+        self.assertEqual(catalog.snapshot().derived("test_food_titles"), ("Bánh mì",))
+        self.assertEqual(_derived_builds, ["food", "food"])
+
+    def test_watched_journal_change_triggers_reload(self):
+        journal = os.path.join(self.directory, "food.jsonl")
+        catalog = Catalog(self.load, self.food_path, self.place_path, eager=[], watch={self.food_path: journal})
+        first = catalog.snapshot()
+        with open(journal, "w") as f:
+            f.write("{}\n")
+        self.assertIsNot(catalog.snapshot(), first)
+
+    def test_reload_reads_only_changed_dataset_and_reuses_derived(self):
+        catalog = Catalog(self.load, self.food_path, self.place_path, eager=[], reload=self.reload)
+        first = catalog.snapshot()
+        first.derived("test_food_titles")
+        first.derived("test_titles")
+        self.assertEqual(sorted(_derived_builds), ["food", "food", "place"])
+
+        _derived_builds.clear()
+        self.touch(self.place_path, pd.DataFrame({"title": ["Hồ Gươm", "Văn Miếu"]}))
+        second = catalog.snapshot()
+        self.assertEqual(self.reloads, [{"place"}])
+        self.assertEqual(len(self.loads), 1)
+        self.assertIs(second.food_df, first.food_df)
+        self.assertEqual(second.changed, frozenset({"place"}))
+        # Snapshot mới chỉ giữ snapshot trước trong lúc dựng các cấu trúc eager
+        self.assertIsNone(second.previous)
+
+    def test_derived_reused_across_partial_reload(self):
+        catalog = Catalog(self.load, self.food_path, self.place_path, reload=self.reload,
+                          eager=["test_food_titles", "test_titles"])
+        first = catalog.snapshot()
+        _derived_builds.clear()
+        self.touch(self.place_path, pd.DataFrame({"title": ["Hồ Gươm", "Văn Miếu"]}))
+        second = catalog.snapshot()
+        self.assertEqual(_derived_builds, ["place"])
+        self.assertIs(second.derived("test_food_titles"), first.derived("test_food_titles"))
+        self.assertIs(second.derived("test_titles")["food"], first.derived("test_titles")["food"])
+        self.assertEqual(second.derived("test_titles")["place"], ("Hồ Gươm", "Văn Miếu"))
+
+    def test_change_feed_defers_file_checks_until_version_changes(self):
+        feed = FakeChangeFeed()
+        set_change_feed(feed)
+        self.addCleanup(set_change_feed, None)
+        catalog = Catalog(self.load, self.food_path, self.place_path, eager=[])
+        first = catalog.snapshot()
+        self.touch(self.food_path, pd.DataFrame({"title": ["Bánh mì"]}))
+        # Phiên bản trên kênh chưa đổi: không stat lại file nguồn
+        self.assertIs(catalog.snapshot(), first)
+        feed.version += 1
+        second = catalog.snapshot()
+        self.assertIsNot(second, first)
+        self.assertEqual(feed.reloads, 2)
+
+        catalog.bump_version()
+        self.assertEqual(feed.published, 1)
+        self.assertIsNot(catalog.snapshot(), second)
+
+
+def make_food_df(rows):
+    df = pd.DataFrame(rows, columns=["province", "title", "rating", "address", "img"])
+    df["description"] = ""
+    df["types"] = [[] for _ in range(len(df))]
+    df["province_name"] = df["province"]
+    df["province"] = df["province"].map(normalize_text)
+    return df
+
+
+def make_place_df(rows):
+    df = pd.DataFrame(rows, columns=["province", "title", "rating", "address", "img", "types"])
+    df["description"] = ""
+    df["link"] = ""
+    df["province_name"] = df["province"]
+    df["province"] = df["province"].map(normalize_text)
+    add_place_features(df)
+    return df
+
+
+def make_schedule_frames():
+    """Hà Nội ít địa điểm (có một địa điểm cho trẻ em), Vĩnh Phúc lân cận còn nhiều."""
+    districts = ["Hoàn Kiếm", "Ba Đình", "Đống Đa"]
+    food_df = make_food_df(
+        [("Hà Nội", f"Quán {i}", 3 + (i % 20) / 10, f"{i} Phố Huế, {districts[i % 3]}, Hà Nội, Việt Nam", "")
+         for i in range(30)]
+        + [("Vĩnh Phúc", f"Quán Vĩnh Yên {i}", 4.0, f"{i} Tam Đảo, Tam Đảo, Vĩnh Phúc, Việt Nam", "")
+           for i in range(20)])
+    place_df = make_place_df(
+        [("Hà Nội", f"Điểm {i}", 3 + (i % 20) / 10, f"{i} Tràng Tiền, {districts[i % 3]}, Hà Nội, Việt Nam", "",
+          []) for i in range(6)]
+        + [("Hà Nội", "Khu vui chơi", 4.9, "1 Lê Duẩn, Đống Đa, Hà Nội, Việt Nam", "", ["Sân chơi"])]
+        + [("Vĩnh Phúc", f"Thác {i}", 4.0, f"{i} Tam Đảo, Tam Đảo, Vĩnh Phúc, Việt Nam", "", [])
+           for i in range(20)])
+    return food_df, place_df
+
+
+class ScheduleTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.food_df, cls.place_df = make_schedule_frames()
+
+    def schedule(self, **kwargs):
+        return recommend_schedule("2030-01-01", "2030-01-03", "Hà Nội", self.food_df, self.place_df, **kwargs)
+
+    def titles(self, schedule):
+        return [activity["details"].get("title") for day in schedule["schedule"] for activity in day["itinerary"]]
+
+    def test_same_seed_gives_same_schedule(self):
+        self.assertEqual(self.schedule(seed=42), self.schedule(seed=42))
+        self.assertEqual(self.schedule(seed=7, random_mode=True), self.schedule(seed=7, random_mode=True))
+
+    def test_different_seeds_vary_schedule(self):
+        schedules = {tuple(self.titles(self.schedule(seed=seed, random_mode=True))) for seed in range(5)}
+        self.assertGreater(len(schedules), 1)
+
+    def test_places_expand_to_neighbour_ring_when_province_runs_out(self):
+        titles = self.titles(self.schedule(seed=1))
+        self.assertEqual(len(titles), len(set(titles)))
+        self.assertTrue(any(title.startswith("Thác") for title in titles))
+        # Địa điểm không ưu tiên (cho trẻ em) chỉ được chọn sau các địa điểm ưu tiên của cùng tỉnh
+        hanoi_places = [title for title in titles if title.startswith("Điểm") or title == "Khu vui chơi"]
+        self.assertEqual(hanoi_places[-1], "Khu vui chơi")
+        self.assertEqual(len(hanoi_places), 7)
+
+    def test_draws_match_reference_engine(self):
+        def timeline(schedule):
+            return [(day["day"], activity["type"], activity["details"]["title"], activity["time"])
+                    for day in schedule["schedule"] for activity in day["itinerary"]]
+
+        for random_mode in (False, True):
+            for seed in range(5):
+                random.seed(seed)
+                expected = reference_schedule("2030-01-01", "2030-01-02", "Hà Nội", self.food_df, self.place_df,
+                                              random_mode=random_mode)
+                actual = recommend_schedule("2030-01-01", "2030-01-02", "Hà Nội", self.food_df, self.place_df,
+                                            random_mode=random_mode, seed=seed)
+                self.assertEqual(timeline(actual), timeline(expected))
+
+    def test_district_pool_draws_like_list_scan(self):
+        districts = {f"Quận {i}": [f"{i}-{k}" for k in range(i % 4)] for i in range(40)}
+        for seed in range(3):
+            rng = random.Random(seed)
+            remaining = {district: list(places) for district, places in districts.items()}
+            expected = []
+            while any(remaining.values()):
+                available = [district for district in remaining if remaining[district]]
+                expected.append(remaining[rng.choice(available)].pop(0))
+            pool = DistrictPool(districts, random.Random(seed))
+            actual = []
+            while pool:
+                actual.append(pool.pop())
+            self.assertEqual(actual, expected)
+
+    def test_schedule_does_not_share_pool_records(self):
+        pool = schedule_pool(normalize_text("Hà Nội"), self.food_df, self.place_df)
+        with mock.patch("Recommend.processed.schedule_pool", return_value=pool):
+            for day in self.schedule(seed=1)["schedule"]:
+                for activity in day["itinerary"]:
+                    activity["details"]["title"] = "Đã sửa"
+        records = pool["food"] + [record for places in pool["priority"].values() for record in places]
+        self.assertNotIn("Đã sửa", [record["title"] for record in records])
+
+    def test_unknown_province_and_bad_dates(self):
+        self.assertIn("error", recommend_schedule("2030-01-01", "2030-01-02", "Atlantis", self.food_df,
+                                                  self.place_df, seed=1))
+        self.assertIn("error", recommend_schedule("2030-01-03", "2030-01-01", "Hà Nội", self.food_df,
+                                                  self.place_df, seed=1))
+    def test_trip_spec_rejects_non_integer_seeds(self):
+        trip = {"province": "Hà Nội", "start_day": "2030-01-01", "end_day": "2030-01-02"}
+        today = date(2029, 12, 1)
+        self.assertIsNone(views.validate_trip_spec(dict(trip, seed=3), today))
+        self.assertIsNone(views.validate_trip_spec(trip, today))
+        for seed in (True, "3", 1.5):
+            self.assertIsNotNone(views.validate_trip_spec(dict(trip, seed=seed), today))
+
+
+class ScheduleCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.food_df, self.place_df = make_schedule_frames()
+        self.catalog = mock.Mock()
+        self.catalog.snapshot.return_value = SimpleNamespace(version="v1", food_df=self.food_df,
+                                                             place_df=self.place_df)
+        for patcher in (mock.patch.object(views, "get_catalog", return_value=self.catalog),
+                        mock.patch.object(views, "recommend_schedule", wraps=recommend_schedule)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_schedule_is_cached_per_seed_and_catalog_version(self):
+        first = views.get_or_build_schedule("Hà Nội", "2030-01-01", "2030-01-02", 5)
+        # Tên gọi khác của cùng tỉnh dùng chung khóa cache
+        self.assertEqual(views.get_or_build_schedule("ha noi", "2030-01-01", "2030-01-02", 5), first)
+        self.assertEqual(views.recommend_schedule.call_count, 1)
+
+        views.get_or_build_schedule("Hà Nội", "2030-01-01", "2030-01-02", 6)
+        self.assertEqual(views.recommend_schedule.call_count, 2)
+
+        self.catalog.snapshot.return_value = SimpleNamespace(version="v2", food_df=self.food_df,
+                                                             place_df=self.place_df)
+        self.assertEqual(views.get_or_build_schedule("Hà Nội", "2030-01-01", "2030-01-02", 5), first)
+        self.assertEqual(views.recommend_schedule.call_count, 3)
+
+    def test_errors_are_not_cached(self):
+        views.get_or_build_schedule("Atlantis", "2030-01-01", "2030-01-02", 5)
+        views.get_or_build_schedule("Atlantis", "2030-01-01", "2030-01-02", 5)
+        self.assertEqual(views.recommend_schedule.call_count, 2)
+
+    def test_session_seed_is_kept_per_session(self):
+        self.assertEqual(views.get_session_seed("session-a"), views.get_session_seed("session-a"))
+        # Request không có session nhận seed mới mỗi lần thay vì dùng chung một khóa cache
+        with mock.patch.object(views.random, "getrandbits", side_effect=[1, 2]):
+            self.assertEqual([views.get_session_seed(None), views.get_session_seed(None)], [1, 2])
+
+
+class SnapshotTests(TempDirMixin, SimpleTestCase):
+    def read_back(self):
+        food_df, place_df = make_schedule_frames()
+        paths = (self.write_csv("food.csv", food_df), self.write_csv("place.csv", place_df), None)
+        directory = os.path.join(self.directory, "snapshot")
+        write_snapshot((food_df, place_df, None), paths, directory=directory)
+        return (food_df, place_df), read_snapshot(paths, directory=directory)
+
+    def test_string_columns_stay_arrow_backed(self):
+        (food_df, place_df), (food_snap, place_snap, hotel_snap) = self.read_back()
+        self.assertIsNone(hotel_snap)
+        self.assertEqual(place_snap["title"].dtype, STRING_DTYPE)
+        self.assertEqual(place_snap["types"].tolist(), place_df["types"].tolist())
+        self.assertEqual(food_snap["title"].tolist(), food_df["title"].tolist())
+
+    def test_search_and_schedule_work_on_snapshot_frames(self):
+        (food_df, place_df), (food_snap, place_snap, _) = self.read_back()
+        self.assertEqual(filter_search(food_snap, "Hà Nội", "quan 1", limit=3)["title"].tolist(),
+                         filter_search(food_df, "Hà Nội", "quan 1", limit=3)["title"].tolist())
+        for random_mode in (False, True):
+            self.assertEqual(
+                recommend_schedule("2030-01-01", "2030-01-03", "Hà Nội", food_snap, place_snap,
+                                   random_mode=random_mode, seed=3),
+                recommend_schedule("2030-01-01", "2030-01-03", "Hà Nội", food_df, place_df,
+                                   random_mode=random_mode, seed=3))
+
+
+class TrigramSearchTests(SimpleTestCase):
+    def test_search_is_accent_and_typo_tolerant(self):
+        index = TrigramIndex(["Hồ Xuân Hương", "Chợ Đà Lạt", "Hồ Tuyền Lâm", "Quán Xuân"], ratings=[4, 5, 4.5, 3])
+        self.assertEqual(index.search("ho xuan huong")[0], 0)
+        self.assertEqual(index.search("Hồ Xuân Hưong")[0], 0)
+        self.assertEqual(index.search("cho da lat").tolist(), [1])
+        # Mọi từ của truy vấn phải khớp một từ trong tên
+        self.assertEqual(set(index.search("xuan").tolist()), {0, 3})
+        self.assertEqual(index.search("xuan huong").tolist(), [0])
+        self.assertEqual(len(index.search("zzzz")), 0)
+
+    def test_search_limit_and_candidates(self):
+        index = TrigramIndex([f"Hồ {i}" for i in range(10)], ratings=list(np.linspace(0, 5, 10)))
+        self.assertEqual(index.search("ho", limit=3).tolist(), [9, 8, 7])
+        self.assertEqual(index.search("ho", candidates=np.array([1, 4])).tolist(), [4, 1])
+        self.assertEqual(index.search("", limit=2).tolist(), [0, 1])
+
+    def test_secondary_field_matches_with_lower_weight(self):
+        index = TrigramIndex(["Khách sạn Sao Mai", "Khách sạn Chợ Lớn"], secondary=["Chợ Bến Thành", ""])
+        self.assertEqual(index.search("ben thanh").tolist(), [0])
+        # Khớp theo tên đứng trước khớp theo địa danh lân cận
+        self.assertEqual(index.search("cho").tolist(), [1, 0])
+
+    def test_filter_search_limits_only_ranked_results(self):
+        df = make_food_df([("Hà Nội", f"Phở {i}", 3 + i / 10, "", "img") for i in range(6)]
+                          + [("Hà Nội", "Phở thiếu ảnh", 5.0, "", None), ("Huế", "Phở Huế", 5.0, "", "img")])
+        required = ("province", "img")
+        # Không có query: trả mọi dòng của tỉnh, limit không áp dụng
+        self.assertEqual(len(filter_search(df, "Hà Nội", limit=2, required=required)), 6)
+        # Có query: dòng thiếu cột bắt buộc bị bỏ trước khi lấy top limit
+        self.assertEqual(filter_search(df, "Hà Nội", "pho", limit=2, required=required)["title"].tolist(),
+                         ["Phở 5", "Phở 4"])
+
+
+class AutocompleteTests(SimpleTestCase):
+    def test_prefix_index_completes_any_word(self):
+        index = PrefixIndex([("Hồ Xuân Hương", 4.0, {"name": "Hồ Xuân Hương"}),
+                             ("Chợ Đà Lạt", 5.0, {"name": "Chợ Đà Lạt"}),
+                             ("Hương Sơn", 3.0, {"name": "Hương Sơn"})])
+        # Tên bắt đầu bằng tiền tố đứng trước tên chỉ có một từ ở giữa bắt đầu bằng tiền tố
+        self.assertEqual([item["name"] for item in index.complete("huong")], ["Hương Sơn", "Hồ Xuân Hương"])
+        self.assertEqual([item["name"] for item in index.complete("da l")], ["Chợ Đà Lạt"])
+        self.assertEqual(index.complete(""), [])
+
+    def test_prefix_index_ranking_matches_full_scan(self):
+        entries = [(f"Quán {chr(97 + i % 26)}{i}", float(i % 17), {"id": i}) for i in range(400)]
+        index = PrefixIndex(entries)
+
+        def expected(prefix, k):
+            prefix = normalize_search_text(prefix)
+            matches = []
+            for item, (text, weight, _) in enumerate(entries):
+                words = normalize_search_text(text).split()
+                starts = [start for start in range(len(words)) if " ".join(words[start:]).startswith(prefix)]
+                if starts:
+                    matches.append((min(starts) > 0, -weight, item))
+            return [entries[item][2] for *_, item in sorted(matches)][:min(k, MAX_COMPLETIONS)]
+
+        for prefix in ("q", "quan", "quan a", "a", "b1", "z25"):
+            lo, hi = index._range(normalize_search_text(prefix))
+            if prefix in ("q", "quan"):
+                self.assertGreater(hi - lo, MAX_SCAN_ROWS)
+            for k in (5, 50):
+                self.assertEqual(index.complete(prefix, k), expected(prefix, k), (prefix, k))
+
+
+class GazetteerTests(SimpleTestCase):
+    def test_aliases_resolve_to_canonical_province(self):
+        self.assertEqual(resolve_province("TP. Hồ Chí Minh"), "ho chi minh")
+        self.assertEqual(resolve_province("Sài Gòn"), "ho chi minh")
+        self.assertEqual(resolve_province("Đà Lạt"), "lam dong")
+        self.assertEqual(resolve_province("Tỉnh Quảng Ninh"), "quang ninh")
+        self.assertIsNone(resolve_province("Atlantis"))
+        self.assertEqual(province_name("hue"), "Thừa Thiên Huế")
+
+    def test_airport_codes(self):
+        self.assertEqual(airport_code("Hà Nội"), "HAN")
+        self.assertEqual(airport_code("Phú Quốc"), "PQC")
+        self.assertEqual(airport_code("Kiên Giang"), "VKG")
+        self.assertIsNone(airport_code("Bắc Ninh"))
+
+    def test_neighbour_rings_follow_hop_distance(self):
+        rings = neighbour_rings("Hà Nội")
+        self.assertEqual(rings[0], ("bac ninh", "vinh phuc"))
+        for hop, ring in enumerate(rings, start=1):
+            for province in ring:
+                self.assertEqual(hop_distance("ha noi", province), hop)
+        self.assertLessEqual(len(rings), 3)
+        self.assertEqual(hop_distance("Sài Gòn", "ho chi minh"), 0)
+        self.assertEqual(neighbour_rings("Atlantis"), [])
+
+
+class HotelIndexTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.hotels = pd.DataFrame({
+            "province": ["Hà Nội", "Hà Nội", "Đà Nẵng", "Lâm Đồng"],
+            "name": ["Khách sạn A", "Khách sạn B", "Khách sạn C", "Khách sạn D"],
+            "name_nearby_place": ["Hồ Gươm, Văn Miếu", "Lăng Bác", "Cầu Rồng", "Hồ Xuân Hương"],
+            "hotel_class": ["Khách sạn 3 sao", "Khách sạn 5 sao", "Khách sạn 4 sao", None],
+            "price": ["500000", "2000000", "900000", "abc"],
+            "location_rating": [4.5, 4.8, 4.0, 3.5],
+            "animates": ["Wi-Fi miễn phí, Spa", "Free Wi-Fi, Bể bơi ngoài trời", "Outdoor pool", ""],
+        })
+
+    def test_substring_search_on_province_and_landmarks(self):
+        index = HotelIndex(self.hotels)
+        self.assertEqual(index.search("ha noi").tolist(), [0, 1])
+        self.assertEqual(index.search("ho").tolist(), [0, 3])
+        self.assertEqual(index.search("xuan huong").tolist(), [3])
+        self.assertEqual(len(index.search("khong co")), 0)
+        self.assertEqual([record["name"] for record in index.matching_records("Cầu Rồng")], ["Khách sạn C"])
+        self.assertEqual(index.matching_records("Cầu Rồng")[0]["link"], "No link")
+
+    def test_facet_filters_and_counts(self):
+        facets = HotelFacets(self.hotels)
+        self.assertEqual(hotel_stars("Khách sạn 3 sao"), 3)
+        self.assertEqual(facets.filter(province="Hanoi").tolist(), [True, True, False, False])
+        self.assertEqual(facets.filter(min_price=600000).tolist(), [False, True, True, False])
+        self.assertEqual(facets.filter(stars=[4, 5]).tolist(), [False, True, True, False])
+        # Tên tiện ích tiếng Việt và tiếng Anh được gộp về cùng một tiện ích
+        required, unknown = facets.amenity_mask(["Free Wi-Fi"])
+        self.assertEqual(unknown, [])
+        self.assertEqual(facets.filter(required=required).tolist(), [True, True, False, False])
+        required, _ = facets.amenity_mask(["Bể bơi ngoài trời"])
+        self.assertEqual(facets.filter(required=required).tolist(), [False, True, True, False])
+        self.assertEqual(facets.amenity_mask(["Sân golf"])[1], ["Sân golf"])
+
+        counts = facets.facet_counts(facets.filter(min_rating=4.0))
+        self.assertEqual(counts["province"], {"Hà Nội": 2, "Đà Nẵng": 1})
+        self.assertEqual(counts["hotel_class"], {3: 1, 4: 1, 5: 1})
+        self.assertEqual(counts["amenities"]["Free Wi-Fi"], 2)
+
+
+class JournalTests(TempDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = self.write_csv("food.csv", pd.DataFrame({"Province": ["Hà Nội"], "Title": ["Phở Thìn"],
+                                                             "Rating": [4.5]}))
+
+    def table(self):
+        return JournaledTable(self.path, ("Province", "Title"), normalize_text)
+
+    def test_changes_are_journaled_and_replayed(self):
+        table = self.table()
+        self.assertTrue(table.add({"Province": "Hà Nội", "Title": "Bún Chả", "Rating": 4.0}))
+        self.assertFalse(table.add({"Province": "ha noi", "Title": "bun cha", "Rating": 3.0}))
+        self.assertTrue(table.update(table.make_key("Hà Nội", "Phở Thìn"), {"Rating": 4.8}))
+        self.assertTrue(table.delete(table.make_key("Hà Nội", "Bún Chả")))
+        self.assertFalse(table.delete(table.make_key("Hà Nội", "Bún Chả")))
+        self.assertEqual(table.pending_entries(), 3)
+        # File nguồn chưa đổi cho tới khi gộp
+        self.assertEqual(len(pd.read_csv(self.path)), 1)
+
+        replayed = self.table()
+        self.assertEqual(replayed.rows(), [{"Province": "Hà Nội", "Title": "Phở Thìn", "Rating": 4.8}])
+        self.assertEqual(replayed.pending_entries(), 3)
+
+    def test_update_cannot_change_key(self):
+        table = self.table()
+        key = table.make_key("Hà Nội", "Phở Thìn")
+        with self.assertRaises(KeyChangeError):
+            table.update(key, {"Title": "Phở Thìn Lò Đúc"})
+        self.assertEqual(table.pending_entries(), 0)
+        # Chỉ sửa hoa thường vẫn giữ khóa nên được phép
+        self.assertTrue(table.update(key, {"Title": "phở thìn", "Rating": 4.9}))
+        self.assertFalse(table.add({"Province": "Hà Nội", "Title": "Phở Thìn"}))
+        table.compact()
+        self.assertEqual(self.table().rows(), [{"Province": "Hà Nội", "Title": "phở thìn", "Rating": 4.9}])
+
+    def test_add_many_skips_existing_keys(self):
+        table = self.table()
+        rows = [{"Province": "Hà Nội", "Title": "Phở Thìn"}, {"Province": "Huế", "Title": "Bún Bò"}]
+        self.assertEqual(table.add_many(rows, [table.key(row) for row in rows]), 1)
+        self.assertEqual(table.pending_entries(), 1)
+        self.assertTrue(self.table().exists(table.make_key("Huế", "Bún Bò")))
+
+    def test_torn_trailing_entry_is_ignored(self):
+        table = self.table()
+        table.add({"Province": "Huế", "Title": "Bún Bò", "Rating": 4.2})
+        with open(table.journal_path, "ab") as f:
+            f.write(b'{"op": "delete", "key": ["hue", "bun bo"]')
+        replayed = self.table()
+        self.assertEqual(len(replayed.rows()), 2)
+        # Lần ghi sau cắt bỏ phần dở dang trước khi nối thêm
+        replayed.add({"Province": "Huế", "Title": "Cơm Hến", "Rating": 4.0})
+        self.assertEqual(len(self.table().rows()), 3)
+
+    def test_compact_folds_journal_into_source(self):
+        table = self.table()
+        table.add({"Province": "Huế", "Title": "Bún Bò", "Rating": 4.2})
+        table.update(table.make_key("Hà Nội", "Phở Thìn"), {"Rating": 4.9})
+        self.assertEqual(table.compact(), 2)
+        self.assertEqual(os.path.getsize(table.journal_path), 0)
+        self.assertEqual(table.pending_entries(), 0)
+        self.assertEqual(table.compact(), 0)
+        source = pd.read_csv(self.path)
+        self.assertEqual(source["Title"].tolist(), ["Phở Thìn", "Bún Bò"])
+        self.assertEqual(source["Rating"].tolist(), [4.9, 4.2])
+        self.assertEqual(self.table().rows(), table.rows())
+
+
+class BulkImportTests(TempDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        path = self.write_csv("place.csv", pd.DataFrame({"province": ["Hà Nội"], "title": ["Hồ Gươm"],
+                                                         "rating": [4.7], "types": ["[]"]}))
+        self.table = JournaledTable(path, ("province", "title"), normalize_text)
+        self.catalog = mock.Mock()
+        spec = BulkDataset(self.table, lambda: self.catalog,
+                           {field: field for field in ("province", "title", "rating", "types")},
+                           required=("province", "title"), rating="rating", list_fields=("types",))
+        patcher = mock.patch.dict(BULK_DATASETS, {"test": spec})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_csv_import_validates_and_dedupes(self):
+        upload = io.StringIO(
+            "province,title,rating,types\n"
+            "Hà Nội,Văn Miếu,4.6,Di tích;Bảo tàng\n"
+            "Hà Nội,Hồ Gươm,4.9,\n"
+            "Hà Nội,van mieu,4.0,\n"
+            ",Không tỉnh,4.0,\n"
+            "Huế,Đại Nội,9,\n"
+            "Huế,Chùa Thiên Mụ,,\n")
+        result = import_rows("test", upload, "csv")
+        self.assertEqual(result["received"], 6)
+        self.assertEqual(result["added"], 2)
+        self.assertEqual(result["duplicates"], 1)
+        self.assertEqual(result["duplicates_in_upload"], 1)
+        self.assertEqual(result["invalid"], 2)
+        self.assertEqual([error["row"] for error in result["errors"]], [4, 5])
+        self.catalog.bump_version.assert_called_once()
+
+        rows = {row["title"]: row for row in self.table.rows()}
+        self.assertEqual(rows["Văn Miếu"]["types"], str(["Di tích", "Bảo tàng"]))
+        self.assertEqual(rows["Chùa Thiên Mụ"]["rating"], "")
+        # Cả lần nhập chỉ ghi một dòng vào nhật ký
+        self.assertEqual(self.table.pending_entries(), 1)
+
+    def test_ndjson_import_and_rejected_files(self):
+        upload = io.StringIO('{"province": "Huế", "title": "Đại Nội", "rating": 4.5, "types": ["Di tích"]}\n\n')
+        self.assertEqual(import_rows("test", upload, "ndjson")["added"], 1)
+        self.assertEqual(import_rows("test", io.StringIO('{"province": "Huế", "title": "Đại Nội"}\n'),
+                                     "ndjson")["duplicates"], 1)
+        self.assertEqual(self.catalog.bump_version.call_count, 1)
+        with self.assertRaises(BulkImportError):
+            import_rows("test", io.StringIO("[1, 2]\n"), "ndjson")
+        with self.assertRaises(BulkImportError):
+            import_rows("test", io.StringIO("province,title,rating,types\n"), "csv")
+        with self.assertRaises(BulkImportError):
+            import_rows("test", io.StringIO(""), "xml")
+
+
+class FakeConnection:
+    def __init__(self):
+        self.open = True
+        self.rollbacks = 0
+
+    def cursor(self):
+        return mock.Mock()
+
+    def ping(self):
+        if not self.open:
+            raise MySQLdb.OperationalError("gone away")
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.open = False
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.connections = []
+
+    def connect(self):
+        connection = FakeConnection()
+        self.connections.append(connection)
+        return connection
+
+    def test_connection_is_reused_after_release(self):
+        pool = ConnectionPool(connect=self.connect, size=2, timeout=0.1)
+        with pool.connection() as db:
+            db.cursor()
+        with pool.connection():
+            pass
+        self.assertEqual(len(self.connections), 1)
+        self.assertEqual(self.connections[0].rollbacks, 2)
+        stats = pool.stats()
+        self.assertEqual((stats["checkouts"], stats["connections_opened"], stats["in_use"], stats["idle"]),
+                         (2, 1, 0, 1))
+
+    def test_checkout_times_out_when_pool_is_exhausted(self):
+        pool = ConnectionPool(connect=self.connect, size=1, timeout=0.05)
+        held = pool.connection()
+        with self.assertRaises(PoolTimeout):
+            pool.connection()
+        self.assertEqual(pool.stats()["timeouts"], 1)
+        # PoolTimeout được các view bắt chung với lỗi MySQL
+        self.assertTrue(issubclass(PoolTimeout, MySQLdb.Error))
+        held.close()
+        with pool.connection():
+            pass
+        self.assertEqual(len(self.connections), 1)
+
+    def test_waiting_checkout_gets_released_connection(self):
+        pool = ConnectionPool(connect=self.connect, size=1, timeout=2)
+        held = pool.connection()
+        threading.Timer(0.05, held.close).start()
+        with pool.connection():
+            pass
+        self.assertEqual(len(self.connections), 1)
+        self.assertEqual(pool.stats()["waits"], 1)
+
+    def test_broken_and_expired_connections_are_replaced(self):
+        pool = ConnectionPool(connect=self.connect, size=1, timeout=0.1)
+        with self.assertRaises(MySQLdb.OperationalError):
+            with pool.connection():
+                raise MySQLdb.OperationalError("lost connection")
+        self.assertFalse(self.connections[0].open)
+        with pool.connection():
+            pass
+        self.assertEqual(len(self.connections), 2)
+
+        pool.max_lifetime = 0
+        with pool.connection():
+            pass
+        self.assertEqual(len(self.connections), 3)
+        self.assertEqual(pool.stats()["idle"], 0)
+
+    def test_returned_connection_rejects_further_use(self):
+        pool = ConnectionPool(connect=self.connect, size=1, timeout=0.1)
+        db = pool.connection()
+        db.close()
+        self.assertFalse(db.open)
+        with self.assertRaises(MySQLdb.InterfaceError):
+            db.commit()
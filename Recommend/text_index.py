@@ -0,0 +1,261 @@
+import re
+import bisect
+import functools
+
+import numpy as np
+import pandas as pd
+
+from .catalog import NO_ROWS, register_derived
+from .gazetteer import normalize_text
+
+# Các cột được đánh index cho tìm kiếm theo tên
+SEARCH_COLUMNS = ("title", "name")
+# Cột phụ (địa danh gần khách sạn) được index thành trường riêng, độ khớp nhân SECONDARY_WEIGHT để xếp sau tên
+SECONDARY_SEARCH_COLUMNS = ("name_nearby_place",)
+SECONDARY_WEIGHT = 0.5
+RATING_COLUMNS = ("rating", "location_rating")
+# Độ tương đồng trigram tối thiểu (trigram chung / hợp hai tập, như pg_trgm) giữa một từ của truy vấn và một từ
+# của tên; mọi từ của truy vấn đều phải khớp một từ trong tên
+SIMILARITY_THRESHOLD = 0.3
+# Trọng số tỷ lệ số từ của tên được truy vấn phủ, để tên ngắn sát truy vấn đứng trước tên dài chỉ chứa truy vấn
+COVERAGE_WEIGHT = 0.5
+# Trọng số rating (thang 5) cộng vào điểm khớp, chủ yếu để xếp các kết quả khớp như nhau
+RATING_WEIGHT = 0.1
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_search_text(text):
+    """Bỏ dấu, chữ thường, thay ký tự không phải chữ/số bằng khoảng trắng."""
+    if not isinstance(text, str):
+        return ""
+    return _normalize_search_str(text)
+
+
+# Tên được chuẩn hóa lại mỗi lần dựng index (sau mỗi lần admin sửa dữ liệu) nên giữ lại kết quả
+@functools.lru_cache(maxsize=1 << 16)
+def _normalize_search_str(text):
+    return " ".join(_NON_WORD.sub(" ", normalize_text(text)).split())
+
+
+def trigrams(text):
+    """Tập trigram ký tự của văn bản đã chuẩn hóa, mỗi từ được đệm khoảng trắng như pg_trgm."""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """Tìm tên theo từ, chịu lỗi gõ: trigram -> các từ trong từ điển, từ -> các dòng chứa từ đó.
+
+    Mỗi từ của truy vấn được so với từ điển bằng độ tương đồng trigram; một dòng khớp khi mọi từ của truy vấn
+    đều có từ tương tự (>= SIMILARITY_THRESHOLD) trong tên, hoặc trong trường phụ (secondary) với độ tương đồng
+    nhân SECONDARY_WEIGHT. Kết quả xếp theo độ tương đồng trung bình, độ phủ tên rồi rating.
+    """
+
+    def __init__(self, texts, ratings=None, secondary=None):
+        self.vocabulary = {}
+        self.word_rows, word_counts = self._index_words(texts)
+        self.secondary_rows = self._index_words(secondary)[0] if secondary is not None else {}
+        self.size = len(word_counts)
+        self.word_counts = np.maximum(np.asarray(word_counts, dtype=float), 1)
+        postings = {}
+        gram_counts = []
+        for word, word_id in self.vocabulary.items():
+            grams = trigrams(word)
+            gram_counts.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(word_id)
+        self.gram_counts = np.asarray(gram_counts, dtype=float)
+        self.postings = {gram: np.asarray(ids, dtype=np.intp) for gram, ids in postings.items()}
+        ratings = np.zeros(self.size) if ratings is None else np.nan_to_num(np.asarray(ratings, dtype=float))
+        self.rating_scores = RATING_WEIGHT * ratings / 5
+
+    def _index_words(self, texts):
+        """(id từ -> các dòng chứa từ, số từ của mỗi dòng); từ mới được thêm vào từ điển chung của các trường."""
+        word_rows = {}
+        word_counts = []
+        for position, text in enumerate(texts):
+            words = set(normalize_search_text(text).split())
+            word_counts.append(len(words))
+            for word in words:
+                word_id = self.vocabulary.setdefault(word, len(self.vocabulary))
+                word_rows.setdefault(word_id, []).append(position)
+        return {word_id: np.asarray(rows, dtype=np.intp) for word_id, rows in word_rows.items()}, word_counts
+
+    def _similar_words(self, word):
+        """(id từ, độ tương đồng) của các từ trong từ điển tương tự word."""
+        grams = trigrams(word)
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not lists:
+            return NO_ROWS, np.empty(0)
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.vocabulary))
+        word_ids = np.flatnonzero(shared)
+        similarity = shared[word_ids] / (len(grams) + self.gram_counts[word_ids] - shared[word_ids])
+        keep = similarity >= SIMILARITY_THRESHOLD
+        return word_ids[keep], similarity[keep]
+
+    def _best_similarity(self, word_rows, word_ids, similarity):
+        """Độ tương đồng tốt nhất của một từ truy vấn với các từ của mỗi dòng trong một trường (0 nếu không có)."""
+        best = np.zeros(self.size)
+        matched = [(word_id, score) for word_id, score in zip(word_ids.tolist(), similarity.tolist())
+                   if word_id in word_rows]
+        if matched:
+            rows = [word_rows[word_id] for word_id, _ in matched]
+            scores = [score for _, score in matched]
+            np.maximum.at(best, np.concatenate(rows), np.repeat(scores, [len(r) for r in rows]))
+        return best
+
+    def search(self, query, candidates=None, limit=None):
+        """Vị trí dòng khớp truy vấn, xếp theo điểm giảm dần; candidates giới hạn trong các dòng cho trước."""
+        words = list(dict.fromkeys(normalize_search_text(query).split()))
+        if not words:
+            positions = np.arange(self.size) if candidates is None else candidates
+            return positions if limit is None else positions[:limit]
+
+        total = np.zeros(self.size)
+        matched = np.ones(self.size, dtype=bool)
+        for word in words:
+            word_ids, similarity = self._similar_words(word)
+            if not len(word_ids):
+                return NO_ROWS
+            best = self._best_similarity(self.word_rows, word_ids, similarity)
+            if self.secondary_rows:
+                best = np.maximum(best, SECONDARY_WEIGHT * self._best_similarity(self.secondary_rows, word_ids,
+                                                                                 similarity))
+            matched &= best > 0
+            total += best
+
+        positions = np.flatnonzero(matched) if candidates is None else candidates[matched[candidates]]
+        scores = (total[positions] / len(words)
+                  + COVERAGE_WEIGHT * np.minimum(len(words) / self.word_counts[positions], 1)
+                  + self.rating_scores[positions])
+        order = np.argsort(-scores, kind="stable")
+        if limit is not None:
+            order = order[:limit]
+        return positions[order]
+
+
+def build_search_index(df):
+    """Xây trigram index trên các cột tên có trong df (cột phụ như địa danh lân cận là trường riêng)."""
+    def joined(columns):
+        columns = [column for column in columns if column in df.columns]
+        return df[columns].fillna("").astype(str).agg(" ".join, axis=1) if columns else None
+
+    texts = joined(SEARCH_COLUMNS)
+    rating_column = next((column for column in RATING_COLUMNS if column in df.columns), None)
+    ratings = df[rating_column].to_numpy(dtype=float) if rating_column else None
+    return TrigramIndex([""] * len(df) if texts is None else texts, ratings, joined(SECONDARY_SEARCH_COLUMNS))
+
+
+@register_derived("search_index", eager=True, per_dataset=True)
+def _build_catalog_search_index(snapshot, dataset):
+    return build_search_index(snapshot.frame(dataset))
+
+
+# Các nhóm gợi ý của autocomplete, theo thứ tự trả về
+AUTOCOMPLETE_KINDS = ("province", "place", "food", "hotel")
+# Tiền tố khớp nhiều hơn số dòng này được tính sẵn top-k, nên mỗi lần tra chỉ sắp xếp tối đa MAX_SCAN_ROWS dòng
+MAX_SCAN_ROWS = 64
+MAX_COMPLETIONS = 20
+
+
+class PrefixIndex:
+    """Mảng khóa đã sắp xếp + bisect cho autocomplete theo tiền tố của bất kỳ từ nào trong tên.
+
+    Mỗi tên sinh một khóa cho mỗi vị trí bắt đầu từ ("ho xuan huong", "xuan huong", "huong");
+    tên bắt đầu bằng tiền tố được xếp trước, sau đó theo trọng số giảm dần. Top-k của các tiền tố khớp quá
+    MAX_SCAN_ROWS khóa được tính sẵn (chỉ đi xuống các nhánh còn lớn của cây tiền tố).
+    """
+
+    def __init__(self, entries):
+        rows = []
+        self.payloads = []
+        for item, (text, weight, payload) in enumerate(entries):
+            self.payloads.append(payload)
+            words = normalize_search_text(text).split()
+            for start in range(len(words)):
+                rows.append((" ".join(words[start:]), start > 0, -weight, item))
+        rows.sort()
+        self.keys = [row[0] for row in rows]
+        self._ranked = [(row[1], row[2], row[3]) for row in rows]
+        self._top = {}
+        # Tiền tố của một tiền tố lớn cũng lớn, nên đi từ ký tự đầu xuống các tiền tố con còn khớp quá MAX_SCAN_ROWS
+        pending = list(set(key[:1] for key in self.keys))
+        while pending:
+            prefix = pending.pop()
+            lo, hi = self._range(prefix)
+            if hi - lo <= MAX_SCAN_ROWS:
+                continue
+            self._top[prefix] = self._rank(lo, hi, MAX_COMPLETIONS)
+            depth = len(prefix) + 1
+            pending.extend(set(key[:depth] for key in self.keys[lo:hi] if len(key) >= depth))
+
+    def _range(self, prefix):
+        lo = bisect.bisect_left(self.keys, prefix)
+        return lo, bisect.bisect_left(self.keys, prefix + "￿", lo)
+
+    def _rank(self, lo, hi, k):
+        items = []
+        seen = set()
+        for _, _, item in sorted(self._ranked[lo:hi]):
+            if item not in seen:
+                seen.add(item)
+                items.append(item)
+                if len(items) == k:
+                    break
+        return items
+
+    def complete(self, prefix, k=10):
+        """Top-k tên có một từ bắt đầu bằng tiền tố (rating/độ phổ biến cao trước)."""
+        prefix = normalize_search_text(prefix)
+        if not prefix:
+            return []
+        k = min(k, MAX_COMPLETIONS)
+        lo, hi = self._range(prefix)
+        items = self._top[prefix] if hi - lo > MAX_SCAN_ROWS else self._rank(lo, hi, k)
+        return [dict(self.payloads[item]) for item in items[:k]]
+
+
+def _named_entries(df, name_column, rating_column, kind):
+    names = df[name_column]
+    ratings = df[rating_column].fillna(0) if rating_column in df.columns else pd.Series(0, index=df.index)
+    entries = {}
+    for name, rating, province in zip(names, ratings, df["province_name"]):
+        if not isinstance(name, str) or not name.strip():
+            continue
+        key = (normalize_search_text(name), province)
+        if key not in entries or rating > entries[key][1]:
+            entries[key] = (name, float(rating), {"type": kind, "name": name, "province": province,
+                                                  "rating": float(rating)})
+    return list(entries.values())
+
+
+# dataset -> (cột tên, cột rating) dùng cho autocomplete theo tên
+AUTOCOMPLETE_COLUMNS = {"place": ("title", "rating"), "food": ("title", "rating"), "hotel": ("name", "location_rating")}
+
+
+@register_derived("name_autocomplete", per_dataset=True)
+def _build_name_autocomplete(snapshot, dataset):
+    return PrefixIndex(_named_entries(snapshot.frame(dataset), *AUTOCOMPLETE_COLUMNS[dataset], dataset))
+
+
+@register_derived("autocomplete_index", eager=True)
+def _build_catalog_autocomplete_index(snapshot):
+    # Tỉnh được xếp theo độ phổ biến: tổng số món ăn, địa điểm, khách sạn của tỉnh (gộp theo khóa tỉnh)
+    names = {}
+    for dataset, index in snapshot.derived("province_index").items():
+        display = snapshot.frame(dataset)["province_name"]
+        for key, positions in index.items():
+            names.setdefault(key, []).extend(display.take(positions))
+    provinces = []
+    for key, display_names in names.items():
+        name = pd.Series(display_names).mode().iat[0]
+        provinces.append((name, float(len(display_names)),
+                          {"type": "province", "name": name, "count": len(display_names)}))
+    indexes = {"province": PrefixIndex(provinces)}
+    indexes.update(snapshot.derived("name_autocomplete"))
+    return indexes
+
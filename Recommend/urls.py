@@ -29,6 +29,7 @@ urlpatterns = [
     #recommend plan
     path('rcm-travel/', views.recommend_travel_day, name='recommend_travel_day'),
     path('travel-schedule/', views.recommend_travel_schedule, name='recommend_travel_schedule'),
+    path('travel-schedule-batch/', views.recommend_travel_schedule_batch, name='recommend_travel_schedule_batch'),
     path('save-schedule/', views.save_schedule, name='save_schedule'),
 
 
@@ -47,6 +48,10 @@ urlpatterns = [
     path('get-top-cities/', views.get_top_cities, name='get_top_cities'),
     path('search-place/', views.search_place, name='search_place'),
     path('search-food/', views.search_food, name='search_food'),
+    path('nearby/', views.nearby, name='nearby'),
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
+    path('catalog-metrics/', views.catalog_metrics, name='catalog_metrics'),
+    path('db-pool-metrics/', views.db_pool_metrics, name='db_pool_metrics'),
 
     #todolist
     path('todolist-create/', views.create_todolist_activity, name='create_todolist_activity'),
@@ -61,6 +66,7 @@ urlpatterns = [
     path('delete-hotel/', views.delete_hotel, name='delete_hotel'),
     path('get-all-hotels/', views.get_all_hotels, name='get_all_hotels'),
     path('search-hotels/', views.search_hotels_by_province, name='search_hotels_by_province'),
+    path('filter-hotels/', views.filter_hotels, name='filter_hotels'),
 
 
     path('delete-user/<int:user_id>/', views.delete_user, name='delete_user'),
@@ -82,4 +88,7 @@ urlpatterns = [
     path('add-food/', views.add_food, name='add_food'),
     path('delete-food/', views.delete_food, name='delete_food'),
     path('update-food/', views.update_food, name='update_food'),
+    #Bulk import/export (food, place, hotel)
+    path('bulk-import/<str:dataset>/', views.bulk_import, name='bulk_import'),
+    path('bulk-export/<str:dataset>/', views.bulk_export, name='bulk_export'),
 ]
\ No newline at end of file
@@ -1,6 +1,8 @@
 import json
 import os
 import re
+import random
+import hashlib
 from django.core.cache import cache
 
 import pandas as pd
@@ -9,7 +11,7 @@ import traceback
 from datetime import datetime
 from django.views.decorators.csrf import csrf_exempt
 from django.middleware.csrf import get_token
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.core.mail import send_mail
 from django.views.decorators.http import require_POST, require_GET
@@ -23,9 +25,19 @@ from dotenv import load_dotenv
 
 from .CheckException import validate_request, check_missing_fields, check_field_length, check_province_format, check_date_format, check_date_logic
 from .flight import search_flight_service
-from .hotel import process_hotel_data_from_csv, update_hotel_in_csv, delete_hotel_in_csv, show_hotel_in_csv, get_hotel_homepage
-from .processed import load_data, recommend_schedule, FOOD_FILE, PLACE_FILE, HOTEL_FILE, normalize_text, \
-    get_food_homepage, get_place_homepage, get_city_to_be_miss,place_exists,food_exists
+from .hotel import process_hotel_data_from_csv, update_hotel_in_csv, delete_hotel_in_csv, show_hotel_in_csv, \
+    filter_hotels_in_csv, get_hotel_in_csv, get_hotel_catalog
+from .processed import load_data, recommend_schedule, FOOD_FILE, PLACE_FILE, HOTEL_FILE, \
+    get_city_to_be_miss, food_table, place_table, get_catalog, filter_province, filter_search, \
+    province_key, recommend_schedules_batch
+from .spatial import nearby as find_nearby, locate
+from .text_index import AUTOCOMPLETE_KINDS
+from .gazetteer import airport_code
+from .homepage_payloads import homepage_payload
+from .bulk import BULK_DATASETS, BulkImportError, import_rows, export_chunks, upload_format
+from .catalog import change_feed
+from .journal import KeyChangeError
+from .mysql_pool import mysql_pool
 from .weather import display_forecast, get_weather
 import redis
 
@@ -36,18 +48,6 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-# Cấu hình MySQL từ settings.py
-MYSQL_HOST = settings.DATABASES['default']['HOST']
-MYSQL_USER = settings.DATABASES['default']['USER']
-MYSQL_PASSWORD = settings.DATABASES['default']['PASSWORD']
-MYSQL_DB = settings.DATABASES['default']['NAME']
-MYSQL_PORT = int(settings.DATABASES['default'].get('PORT', 3306))
-MYSQL_CHARSET = 'utf8'
-
-air_province = ["quảng nam", "thanh hoá", "quảng bình", "điện biên", "phú yên", "gia lai", "khánh hoà", "huế", "cần thơ",
-                "đắk lắk", "kiên giang", "cà mau", "vũng tàu", "hà nội", "hồ chí minh", "kiên giang", "đà nẵng", "quảng ninh",
-                "nghệ an", "bình định", "hải phòng", "lâm đồng", "đồng nai"]
-
 # Kiểm tra PASSWORD_SECRET
 PASSWORD_SECRET = os.getenv("PASSWORD_SECRET")
 if not PASSWORD_SECRET:
@@ -92,14 +92,7 @@ def login_user(request):
             logger.debug(f"Attempting login for email: {email}, password: {'*' * len(password) if password else 'empty'}")
 
             # Kết nối MySQL
-            db = MySQLdb.connect(
-                host=MYSQL_HOST,
-                user=MYSQL_USER,
-                passwd=MYSQL_PASSWORD,
-                db=MYSQL_DB,
-                port=MYSQL_PORT,
-                charset=MYSQL_CHARSET
-            )
+            db = mysql_pool.connection()
             cursor = db.cursor()
             logger.debug("Database connected")
             cursor.execute("SELECT id, password FROM users WHERE email = %s", [email])
@@ -173,14 +166,7 @@ def verify_token(request):
         if not email:
             return JsonResponse({"error": "Token không hợp lệ"}, status=400)
 
-        db = MySQLdb.connect(
-            host=MYSQL_HOST,
-            user=MYSQL_USER,
-            passwd=MYSQL_PASSWORD,
-            db=MYSQL_DB,
-            port=MYSQL_PORT,
-            charset=MYSQL_CHARSET
-        )
+        db = mysql_pool.connection()
         cursor = db.cursor()
         cursor.execute("SELECT id FROM users WHERE email = %s", [email])
         user = cursor.fetchone()
@@ -272,6 +258,7 @@ def clear_session_cache(session_key):
         f'budget_{session_key}',
         f'selected_flight_{session_key}',
         f'selected_hotel_{session_key}',
+        f'schedule_seed_{session_key}',
     ]
     for key in cache_keys:
         cache.delete(key)
@@ -364,8 +351,9 @@ def check_flight_di(request):
         return JsonResponse({
             "error": "Bạn chưa chọn tỉnh/thành phố. Vui lòng chọn để tiếp tục."
         }, status=400)
-    has_airport = selected_province in [province.lower() for province in air_province]
+    has_airport = airport_code(selected_province) is not None
 
+    message = None
     if not has_airport:
         message = f"'{selected_province.title()}' hiện tại tỉnh của bạn chưa có sân bay. Vui lòng chọn dịch vụ khách sạn phù hợp."
 
@@ -383,8 +371,9 @@ def check_flight_den(request):
         return JsonResponse({
             "error": "Bạn chưa chọn tỉnh/thành phố. Vui lòng chọn để tiếp tục."
         }, status=400)
-    has_airport = selected_province in [province.lower() for province in air_province]
+    has_airport = airport_code(selected_province) is not None
 
+    message = None
     if not has_airport:
         message = f"'{selected_province.title()}' hiện chưa có sân bay. Vui lòng chọn dịch vụ khách sạn phù hợp."
 
@@ -504,6 +493,41 @@ def select_hotel(request):
         traceback.print_exc()
         return JsonResponse({"error": f"Lỗi hệ thống: {str(e)}"}, status=500)
 
+SCHEDULE_CACHE_TIMEOUT = 3600
+
+# Seed theo phiên khảo sát: gọi lại travel-schedule trong cùng phiên cho cùng lịch trình (lấy từ cache)
+def get_session_seed(session_key):
+    """Seed lịch trình của session (giữ 1 giờ); request không có session nhận seed ngẫu nhiên mới mỗi lần."""
+    if not session_key:
+        return random.getrandbits(32)
+    cache_key = f'schedule_seed_{session_key}'
+    seed = cache.get(cache_key)
+    if seed is None:
+        seed = random.getrandbits(32)
+        cache.set(cache_key, seed, timeout=3600)
+    return seed
+
+def schedule_cache_key(province, start_day, end_day, seed, catalog_version):
+    params = json.dumps([province_key(province), start_day, end_day, seed])
+    return f"schedule:{catalog_version}:{hashlib.sha1(params.encode('utf-8')).hexdigest()}"
+
+# Lịch trình theo (tỉnh, ngày, seed, phiên bản catalog); đổi catalog thì khóa đổi theo nên cache tự mất hiệu lực.
+# use_cache=False với seed vừa sinh ngẫu nhiên: khóa đó không bao giờ được hỏi lại
+def get_or_build_schedule(province, start_day, end_day, seed, use_cache=True):
+    snapshot = get_catalog().snapshot()
+    if not use_cache:
+        return recommend_schedule(start_day, end_day, province, snapshot.food_df, snapshot.place_df, seed=seed)
+    cache_key = schedule_cache_key(province, start_day, end_day, seed, snapshot.version)
+    schedule_result = cache.get(cache_key)
+    if schedule_result is None:
+        schedule_result = recommend_schedule(start_day, end_day, province, snapshot.food_df, snapshot.place_df,
+                                             seed=seed)
+        if "error" not in schedule_result:
+            cache.set(cache_key, schedule_result, timeout=SCHEDULE_CACHE_TIMEOUT)
+    else:
+        logger.info(f"Travel schedule served from cache: {cache_key}")
+    return schedule_result
+
 # API tạo lịch trình
 @csrf_exempt
 @require_POST
@@ -543,8 +567,14 @@ def recommend_travel_schedule(request):
         if error_response:
             return error_response
 
-        food_df, place_df, _ = load_data(FOOD_FILE, PLACE_FILE)
-        schedule_result = recommend_schedule(start_day, end_day, province, food_df, place_df)
+        seed = data.get('seed')
+        if seed is None:
+            seed = get_session_seed(cache_key_prefix)
+        elif isinstance(seed, bool) or not isinstance(seed, int):
+            return JsonResponse({"error": "Seed phải là số nguyên."}, status=400)
+
+        schedule_result = get_or_build_schedule(province, start_day, end_day, seed,
+                                                use_cache=data.get('seed') is not None or bool(cache_key_prefix))
         if "error" in schedule_result:
             return JsonResponse({"error": schedule_result["error"]}, status=400)
 
@@ -567,6 +597,96 @@ def recommend_travel_schedule(request):
         traceback.print_exc()
         return JsonResponse({"error": str(e)}, status=500)
 
+MAX_BATCH_TRIPS = 200
+
+def validate_trip_spec(trip, current_date):
+    """Kiểm tra một trip trong batch, trả về thông báo lỗi hoặc None."""
+    if not isinstance(trip, dict):
+        return "Mỗi trip phải là một object."
+    missing = [field for field in ("province", "start_day", "end_day") if not trip.get(field)]
+    if missing:
+        return f"Thiếu trường bắt buộc: {', '.join(missing)}"
+    try:
+        start_date = datetime.strptime(trip["start_day"], "%Y-%m-%d").date()
+        end_date = datetime.strptime(trip["end_day"], "%Y-%m-%d").date()
+    except (ValueError, TypeError):
+        return "Định dạng ngày không hợp lệ. Vui lòng sử dụng YYYY-MM-DD."
+    error_response = check_date_logic(start_date, end_date, current_date)
+    if error_response:
+        return json.loads(error_response.content)["error"]
+    seed = trip.get("seed")
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int)):
+        return "Seed phải là số nguyên."
+    return None
+
+# API tạo nhiều lịch trình trong một lần gọi (đối tác tạo sẵn lịch trình cho nhiều tỉnh/ngày)
+@csrf_exempt
+@require_POST
+def recommend_travel_schedule_batch(request):
+    try:
+        data = json.loads(request.body)
+        trips = data.get("trips")
+        if not isinstance(trips, list) or not trips:
+            return JsonResponse({"error": "Thiếu danh sách trips."}, status=400)
+        if len(trips) > MAX_BATCH_TRIPS:
+            return JsonResponse({"error": f"Mỗi batch tối đa {MAX_BATCH_TRIPS} lịch trình."}, status=400)
+
+        current_date = datetime.now().date()
+        catalog_version = get_catalog().version
+        results = [None] * len(trips)
+        pending = {}
+        for index, trip in enumerate(trips):
+            error = validate_trip_spec(trip, current_date)
+            if error:
+                results[index] = {"trip": trip, "error": error}
+                continue
+            seed = trip.get("seed")
+            pending[index] = {
+                "province": trip["province"],
+                "start_day": trip["start_day"],
+                "end_day": trip["end_day"],
+                "seed": seed if seed is not None else random.getrandbits(32)
+            }
+
+        # Lấy các lịch trình đã có trong cache, chỉ tạo mới phần còn thiếu; trip không có seed nhận seed ngẫu nhiên
+        # mới nên không tra/ghi cache
+        cache_keys = {
+            index: schedule_cache_key(spec["province"], spec["start_day"], spec["end_day"], spec["seed"],
+                                      catalog_version)
+            for index, spec in pending.items() if trips[index].get("seed") is not None
+        }
+        cached = cache.get_many(list(cache_keys.values()))
+        misses = [index for index in pending if cache_keys.get(index) not in cached]
+        built = dict(zip(misses, recommend_schedules_batch(
+            [pending[index] for index in misses],
+            max_workers=getattr(settings, "BATCH_SCHEDULE_WORKERS", 2))))
+
+        to_cache = {}
+        for index, spec in pending.items():
+            schedule_result = built[index] if index in built else cached[cache_keys[index]]
+            if "error" in schedule_result:
+                results[index] = {"trip": spec, "error": schedule_result["error"]}
+                continue
+            if index in built and index in cache_keys:
+                to_cache[cache_keys[index]] = schedule_result
+            results[index] = {"trip": spec, "schedule": schedule_result}
+        cache.set_many(to_cache, timeout=SCHEDULE_CACHE_TIMEOUT)
+
+        logger.info(f"Batch travel schedule: {len(trips)} trips, {len(misses)} generated, "
+                    f"{len(pending) - len(misses)} from cache")
+        return JsonResponse({
+            "results": results,
+            "catalog_version": catalog_version,
+            "timestamp": datetime.now().isoformat()
+        }, status=200)
+    except json.JSONDecodeError:
+        logger.error("Invalid JSON in travel_schedule_batch")
+        return JsonResponse({"error": "Dữ liệu JSON không hợp lệ"}, status=400)
+    except Exception as e:
+        logger.error(f"Error in travel_schedule_batch: {str(e)}")
+        traceback.print_exc()
+        return JsonResponse({"error": str(e)}, status=500)
+
 '''
 
 Kết thúc lịch trinh
@@ -607,14 +727,7 @@ def save_schedule(request):
             return JsonResponse({"error": "Thiếu user_id"}, status=400)
 
         # **Kết nối database**
-        db = MySQLdb.connect(
-            host=MYSQL_HOST,
-            user=MYSQL_USER,
-            passwd=MYSQL_PASSWORD,
-            db=MYSQL_DB,
-            port=MYSQL_PORT,
-            charset=MYSQL_CHARSET
-        )
+        db = mysql_pool.connection()
         cursor = db.cursor()
         logger.info(f"Kết nối database thành công cho user_id: {user_id}")
 
@@ -828,14 +941,7 @@ def share_schedule(request):
         if not schedule_id:
             return JsonResponse({"error": "Thiếu schedule_id"}, status=400)
 
-        db = MySQLdb.connect(
-            host=MYSQL_HOST,
-            user=MYSQL_USER,
-            passwd=MYSQL_PASSWORD,
-            db=MYSQL_DB,
-            port=MYSQL_PORT,
-            charset=MYSQL_CHARSET
-        )
+        db = mysql_pool.connection()
         cursor = db.cursor()
 
         # Kiểm tra quyền chia sẻ
@@ -897,14 +1003,7 @@ def share_schedule_via_email(request):
         if not recipient_email:
             return JsonResponse({"error": "Thiếu email người nhận"}, status=400)
 
-        db = MySQLdb.connect(
-            host=MYSQL_HOST,
-            user=MYSQL_USER,
-            passwd=MYSQL_PASSWORD,
-            db=MYSQL_DB,
-            port=MYSQL_PORT,
-            charset=MYSQL_CHARSET
-        )
+        db = mysql_pool.connection()
         cursor = db.cursor()
 
         cursor.execute("SELECT user_id FROM schedules WHERE id = %s", [schedule_id])
@@ -983,14 +1082,7 @@ def get_schedule(request):
         return JsonResponse({"error": "user_id phải là số nguyên"}, status=400)
 
     try:
-        with MySQLdb.connect(
-                host=MYSQL_HOST,
-                user=MYSQL_USER,
-                passwd=MYSQL_PASSWORD,
-                db=MYSQL_DB,
-                port=MYSQL_PORT,
-                charset=MYSQL_CHARSET
-        ) as db:
+        with mysql_pool.connection() as db:
             with db.cursor() as cursor:
                 # Kiểm tra user tồn tại
                 cursor.execute("SELECT id FROM users WHERE id = %s", [user_id])
@@ -1038,14 +1130,7 @@ def view_schedule(request, schedule_id):
     cursor = None
     try:
         # Kết nối đến cơ sở dữ liệu
-        db = MySQLdb.connect(
-            host=MYSQL_HOST,
-            user=MYSQL_USER,
-            passwd=MYSQL_PASSWORD,
-            db=MYSQL_DB,
-            port=MYSQL_PORT,
-            charset=MYSQL_CHARSET
-        )
+        db = mysql_pool.connection()
         cursor = db.cursor()
 
         # Lấy thông tin lịch trình từ bảng schedules
@@ -1158,11 +1243,7 @@ def get_all_hotels(request):
 @require_GET
 def get_hotel_by_name(request, name):
     try:
-        hotels = show_hotel_in_csv()
-        if hotels is None:
-            return JsonResponse({"error": "File CSV không tồn tại."}, status=404)
-
-        hotel = next((h for h in hotels if h["name"] == name), None)
+        hotel = get_hotel_in_csv(name)
         if not hotel:
             return JsonResponse({"error": f"Không tìm thấy khách sạn với tên '{name}'."}, status=404)
 
@@ -1278,6 +1359,162 @@ def search_hotels_by_province(request):
         logger.error(f"Error in search_hotels_by_province: {str(e)}")
         return JsonResponse({"error": f"Lỗi hệ thống: {str(e)}"}, status=500)
 
+MAX_FILTER_HOTELS = 200
+
+# API lọc khách sạn theo tỉnh, khoảng giá, hạng sao, rating tối thiểu, tiện ích (kèm số đếm facet)
+@csrf_exempt
+@require_POST
+def filter_hotels(request):
+    try:
+        data = json.loads(request.body.decode('utf-8'))
+        province = data.get("province", "")
+        amenities = data.get("amenities", [])
+        stars = data.get("hotel_class", [])
+        if not isinstance(province, str) or not isinstance(amenities, list):
+            return JsonResponse({"error": "province phải là chuỗi, amenities phải là danh sách."}, status=400)
+        if not isinstance(stars, list):
+            stars = [stars]
+        try:
+            min_price = float(data["min_price"]) if data.get("min_price") not in (None, "") else None
+            max_price = float(data["max_price"]) if data.get("max_price") not in (None, "") else None
+            min_rating = float(data["min_rating"]) if data.get("min_rating") not in (None, "") else None
+            stars = [int(star) for star in stars]
+            limit = int(data.get("limit", 50))
+        except (TypeError, ValueError):
+            return JsonResponse({"error": "min_price, max_price, min_rating, hotel_class hoặc limit không hợp lệ."},
+                                status=400)
+        if not 1 <= limit <= MAX_FILTER_HOTELS:
+            return JsonResponse({"error": f"limit phải từ 1 đến {MAX_FILTER_HOTELS}."}, status=400)
+        if min_price is not None and max_price is not None and min_price > max_price:
+            return JsonResponse({"error": "min_price không được lớn hơn max_price."}, status=400)
+        if any(not 0 <= star <= 5 for star in stars):
+            return JsonResponse({"error": "hotel_class phải từ 0 (không hạng sao) đến 5."}, status=400)
+
+        result = filter_hotels_in_csv(province.strip(), min_price, max_price, stars, min_rating,
+                                      [str(name) for name in amenities], limit)
+        if "unknown_amenities" in result:
+            return JsonResponse({"error": f"Tiện ích không hợp lệ: {', '.join(result['unknown_amenities'])}."},
+                                status=400)
+
+        return JsonResponse({
+            **result,
+            "timestamp": datetime.now().isoformat()
+        }, json_dumps_params={"ensure_ascii": False}, status=200)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Dữ liệu JSON không hợp lệ."}, status=400)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        return JsonResponse({"error": "File CSV khách sạn không tồn tại."}, status=404)
+    except Exception as e:
+        traceback.print_exc()
+        logger.error(f"Error in filter_hotels: {str(e)}")
+        return JsonResponse({"error": f"Lỗi hệ thống: {str(e)}"}, status=500)
+
+# API xem phiên bản catalog và số liệu lan truyền thay đổi (độ trễ nhận tin, thời gian nạp lại) của worker này
+@require_GET
+def catalog_metrics(request):
+    try:
+        feed = change_feed()
+        return JsonResponse({
+            "catalogs": {"catalog": get_catalog().version, "hotels": get_hotel_catalog().version},
+            "invalidation": feed.metrics() if feed is not None else None,
+            "timestamp": datetime.now().isoformat()
+        }, status=200)
+    except Exception as e:
+        traceback.print_exc()
+        logger.error(f"Error in catalog_metrics: {str(e)}")
+        return JsonResponse({"error": f"Lỗi hệ thống: {str(e)}"}, status=500)
+
+# API xem số liệu pool kết nối MySQL của worker này (thời gian chờ lấy kết nối, tỉ lệ sử dụng)
+@require_GET
+def db_pool_metrics(request):
+    try:
+        return JsonResponse({
+            "mysql_pool": mysql_pool.stats(),
+            "timestamp": datetime.now().isoformat()
+        }, status=200)
+    except Exception as e:
+        traceback.print_exc()
+        logger.error(f"Error in db_pool_metrics: {str(e)}")
+        return JsonResponse({"error": f"Lỗi hệ thống: {str(e)}"}, status=500)
+
+# API gợi ý tự động khi người dùng gõ điểm đến (tỉnh, địa điểm, món ăn, khách sạn)
+@require_GET
+def autocomplete(request):
+    try:
+        query = request.GET.get("q", "").strip()
+        if not query:
+            return JsonResponse({"error": "Vui lòng cung cấp từ khóa (q)."}, status=400)
+        if len(query) > 100:
+            return JsonResponse({"error": "Từ khóa không được dài quá 100 ký tự."}, status=400)
+        kinds = [name.strip() for name in request.GET.get("types", ",".join(AUTOCOMPLETE_KINDS)).split(",") if name.strip()]
+        if not kinds or any(kind not in AUTOCOMPLETE_KINDS for kind in kinds):
+            return JsonResponse({"error": f"types chỉ gồm {', '.join(AUTOCOMPLETE_KINDS)}."}, status=400)
+        try:
+            k = int(request.GET.get("k", 5))
+        except ValueError:
+            return JsonResponse({"error": "k không hợp lệ."}, status=400)
+        if k < 1:
+            return JsonResponse({"error": "k phải lớn hơn 0."}, status=400)
+
+        snapshot = get_catalog().snapshot()
+        indexes = snapshot.derived("autocomplete_index")
+        return JsonResponse({
+            "query": query,
+            "suggestions": {kind: indexes[kind].complete(query, k) if kind in indexes else [] for kind in kinds},
+            "catalog_version": snapshot.version
+        }, json_dumps_params={"ensure_ascii": False}, status=200)
+
+    except Exception as e:
+        traceback.print_exc()
+        logger.error(f"Error in autocomplete: {str(e)}")
+        return JsonResponse({"error": f"Lỗi hệ thống: {str(e)}"}, status=500)
+
+# API tìm món ăn/địa điểm/khách sạn gần một tọa độ hoặc gần một địa điểm/khách sạn theo tên
+@require_GET
+def nearby(request):
+    try:
+        datasets = [name.strip() for name in request.GET.get("types", "food,place,hotel").split(",") if name.strip()]
+        invalid = [name for name in datasets if name not in ("food", "place", "hotel")]
+        if invalid or not datasets:
+            return JsonResponse({"error": "types chỉ gồm food, place, hotel."}, status=400)
+        try:
+            k = int(request.GET.get("k", 10))
+            radius_km = float(request.GET["radius_km"]) if request.GET.get("radius_km") else None
+        except ValueError:
+            return JsonResponse({"error": "k hoặc radius_km không hợp lệ."}, status=400)
+        if k < 1 or (radius_km is not None and radius_km <= 0):
+            return JsonResponse({"error": "k và radius_km phải lớn hơn 0."}, status=400)
+
+        snapshot = get_catalog().snapshot()
+        exclude = None
+        anchor = next(((dataset, request.GET[dataset].strip()) for dataset in ("hotel", "place", "food")
+                       if request.GET.get(dataset, "").strip()), None)
+        if anchor:
+            located = locate(snapshot, *anchor)
+            if located is None:
+                return JsonResponse({"error": f"Không tìm thấy tọa độ cho {anchor[1]}."}, status=404)
+            position, lat, lng = located
+            exclude = (anchor[0], position)
+        else:
+            try:
+                lat = float(request.GET["lat"])
+                lng = float(request.GET["lng"])
+            except (KeyError, ValueError):
+                return JsonResponse({"error": "Vui lòng cung cấp lat/lng hoặc tên hotel/place/food."}, status=400)
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                return JsonResponse({"error": "Tọa độ không hợp lệ."}, status=400)
+
+        return JsonResponse({
+            "center": {"lat": lat, "lng": lng},
+            "results": find_nearby(snapshot, lat, lng, datasets, k, radius_km, exclude),
+            "timestamp": datetime.now().isoformat()
+        }, json_dumps_params={"ensure_ascii": False}, status=200)
+
+    except Exception as e:
+        traceback.print_exc()
+        logger.error(f"Error in nearby: {str(e)}")
+        return JsonResponse({"error": f"Lỗi hệ thống: {str(e)}"}, status=500)
+
 @csrf_exempt
 @require_POST
 def create_user(request):
@@ -1299,8 +1536,7 @@ def create_user(request):
         if status not in ['active', 'inactive', 'banned']:
             return JsonResponse({"error": "Status không hợp lệ"}, status=400)
 
-        db = MySQLdb.connect(host=MYSQL_HOST, user=MYSQL_USER, passwd=MYSQL_PASSWORD,
-                             db=MYSQL_DB, port=MYSQL_PORT, charset=MYSQL_CHARSET)
+        db = mysql_pool.connection()
         cursor = db.cursor()
 
         # Kiểm tra role_id có tồn tại trong bảng Roles
@@ -1361,14 +1597,7 @@ def delete_user(request, user_id):
         except (TypeError, ValueError):
             return JsonResponse({"error": "User ID must be an integer."}, status=400)
 
-        with MySQLdb.connect(
-            host=MYSQL_HOST,
-            user=MYSQL_USER,
-            passwd=MYSQL_PASSWORD,
-            db=MYSQL_DB,
-            port=MYSQL_PORT,
-            charset=MYSQL_CHARSET
-        ) as db:
+        with mysql_pool.connection() as db:
             with db.cursor() as cursor:
                 cursor.execute("SELECT id FROM users WHERE id = %s", [user_id])
                 if not cursor.fetchone():
@@ -1418,8 +1647,7 @@ def delete_user(request, user_id):
 @require_GET
 def get_user(request, user_id):
     try:
-        db = MySQLdb.connect(host=MYSQL_HOST, user=MYSQL_USER, passwd=MYSQL_PASSWORD,
-                             db=MYSQL_DB, port=MYSQL_PORT, charset=MYSQL_CHARSET)
+        db = mysql_pool.connection()
         cursor = db.cursor()
 
         query = """
@@ -1462,8 +1690,7 @@ def update_user(request):
         if not user_id:
             return JsonResponse({"error": "Thiếu trường bắt buộc: user_id"}, status=400)
 
-        db = MySQLdb.connect(host=MYSQL_HOST, user=MYSQL_USER, passwd=MYSQL_PASSWORD,
-                             db=MYSQL_DB, port=MYSQL_PORT, charset=MYSQL_CHARSET)
+        db = mysql_pool.connection()
         cursor = db.cursor()
 
         cursor.execute("SELECT email, full_name, status, role_id FROM users WHERE id = %s", [user_id])
@@ -1551,8 +1778,7 @@ def update_user(request):
 @require_GET
 def user_manage(request):
     try:
-        db = MySQLdb.connect(host=MYSQL_HOST, user=MYSQL_USER, passwd=MYSQL_PASSWORD,
-                             db=MYSQL_DB, port=MYSQL_PORT, charset=MYSQL_CHARSET)
+        db = mysql_pool.connection()
         cursor = db.cursor()
 
         query = """
@@ -1582,8 +1808,7 @@ def search_user(request):
         if not search_term:
             return JsonResponse({"error": "Thiếu tham số tìm kiếm 'userinfo'."}, status=400)
 
-        db = MySQLdb.connect(host=MYSQL_HOST, user=MYSQL_USER, passwd=MYSQL_PASSWORD,
-                             db=MYSQL_DB, port=MYSQL_PORT, charset=MYSQL_CHARSET)
+        db = mysql_pool.connection()
         cursor = db.cursor()
 
         query = """
@@ -1614,8 +1839,7 @@ def filter_by_role(request):
         if not role_name:
             return JsonResponse({"error": "Thiếu tham số 'role'."}, status=400)
 
-        db = MySQLdb.connect(host=MYSQL_HOST, user=MYSQL_USER, passwd=MYSQL_PASSWORD,
-                             db=MYSQL_DB, port=MYSQL_PORT, charset=MYSQL_CHARSET)
+        db = mysql_pool.connection()
         cursor = db.cursor()
 
         query = """
@@ -1650,8 +1874,7 @@ def filter_by_status(request):
         if status not in valid_statuses:
             return JsonResponse({"error": "Status phải là 'active', 'inactive', hoặc 'banned'."}, status=400)
 
-        db = MySQLdb.connect(host=MYSQL_HOST, user=MYSQL_USER, passwd=MYSQL_PASSWORD,
-                             db=MYSQL_DB, port=MYSQL_PORT, charset=MYSQL_CHARSET)
+        db = mysql_pool.connection()
         cursor = db.cursor()
 
         query = """
@@ -1680,15 +1903,12 @@ def filter_by_status(request):
 @require_GET
 def get_all_place_admin(request):
     try:
-        places = get_place_homepage()
-        if not places:
+        # Danh sách đã dựng sẵn thành JSON, chỉ ghép thêm timestamp và csrf_token của request
+        body = homepage_payload("places", timestamp=datetime.now().isoformat(), csrf_token=get_token(request))
+        if body is None:
             return JsonResponse({"error": "Error File..."}, status=404)
 
-        return JsonResponse({
-            "places": places,
-            "timestamp": datetime.now().isoformat(),
-            "csrf_token": get_token(request)
-        }, json_dumps_params={"ensure_ascii": False}, status=200)
+        return HttpResponse(body, content_type="application/json", status=200)
 
     except Exception as e:
         traceback.print_exc()
@@ -1720,12 +1940,7 @@ def add_place(request):
         except ValueError:
             return JsonResponse({"error": "Rating phải là số."}, status=400)
 
-        # Kiểm tra xem place đã tồn tại chưa
-        if place_exists(province, title):
-            return JsonResponse({"error": "Địa điểm đã tồn tại."}, status=400)
-
-        # Đọc file Excel và thêm dữ liệu mới
-        df = pd.read_excel(PLACE_FILE)
+        # Ghi thêm vào nhật ký thay đổi (kiểm tra trùng và ghi trong cùng một khóa)
         new_row = {
             'province': province,
             'title': title,
@@ -1735,8 +1950,9 @@ def add_place(request):
             'img': img,
             'types': str(types)
         }
-        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-        df.to_excel(PLACE_FILE, index=False)
+        if not place_table.add(new_row):
+            return JsonResponse({"error": "Địa điểm đã tồn tại."}, status=400)
+        get_catalog().bump_version()
 
         return JsonResponse({"message": "Thêm địa điểm thành công!"}, status=201)
     except Exception as e:
@@ -1756,20 +1972,9 @@ def delete_place(request):
         if not all([province, title]):
             return JsonResponse({"error": "Thiếu các trường bắt buộc: province, title"}, status=400)
 
-        normalized_province = normalize_text(province)
-        normalized_title = normalize_text(title)
-
-        df = pd.read_excel(PLACE_FILE)
-        df['normalized_province'] = df['province'].apply(normalize_text)
-        df['normalized_title'] = df['title'].apply(normalize_text)
-
-        mask = (df['normalized_province'] == normalized_province) & (df['normalized_title'] == normalized_title)
-        if mask.sum() == 0:
+        if not place_table.delete(place_table.make_key(province, title)):
             return JsonResponse({"error": "Địa điểm không tồn tại."}, status=404)
-
-        df = df[~mask]
-        df.drop(columns=['normalized_province', 'normalized_title'], inplace=True)
-        df.to_excel(PLACE_FILE, index=False)
+        get_catalog().bump_version()
 
         return JsonResponse({"message": "Xóa địa điểm thành công!"}, status=200)
     except Exception as e:
@@ -1789,30 +1994,21 @@ def update_place(request):
         if not all([province, title]):
             return JsonResponse({"error": "Thiếu các trường bắt buộc: province, title"}, status=400)
 
-        normalized_province = normalize_text(province)
-        normalized_title = normalize_text(title)
-
-        df = pd.read_excel(PLACE_FILE)
-        df['normalized_province'] = df['province'].apply(normalize_text)
-        df['normalized_title'] = df['title'].apply(normalize_text)
+        if 'rating' in updates:
+            try:
+                updates['rating'] = float(updates['rating'])
+                if not 0 <= updates['rating'] <= 5:
+                    return JsonResponse({"error": "Rating phải từ 0 đến 5."}, status=400)
+            except ValueError:
+                return JsonResponse({"error": "Rating phải là số."}, status=400)
 
-        mask = (df['normalized_province'] == normalized_province) & (df['normalized_title'] == normalized_title)
-        if mask.sum() == 0:
+        try:
+            updated = place_table.update(place_table.make_key(province, title), updates)
+        except KeyChangeError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        if not updated:
             return JsonResponse({"error": "Địa điểm không tồn tại."}, status=404)
-
-        for key, value in updates.items():
-            if key in df.columns:
-                if key == 'rating':
-                    try:
-                        value = float(value)
-                        if not 0 <= value <= 5:
-                            return JsonResponse({"error": "Rating phải từ 0 đến 5."}, status=400)
-                    except ValueError:
-                        return JsonResponse({"error": "Rating phải là số."}, status=400)
-                df.loc[mask, key] = value
-
-        df.drop(columns=['normalized_province', 'normalized_title'], inplace=True)
-        df.to_excel(PLACE_FILE, index=False)
+        get_catalog().bump_version()
 
         return JsonResponse({"message": "Cập nhật địa điểm thành công!"}, status=200)
     except Exception as e:
@@ -1825,15 +2021,12 @@ def update_place(request):
 @require_GET
 def get_all_food_admin(request):
     try:
-        foods = get_food_homepage()
-        if not foods:
+        # Danh sách đã dựng sẵn thành JSON, chỉ ghép thêm timestamp và csrf_token của request
+        body = homepage_payload("foods", timestamp=datetime.now().isoformat(), csrf_token=get_token(request))
+        if body is None:
             return JsonResponse({"error": "Error File..."}, status=404)
 
-        return JsonResponse({
-            "foods": foods,
-            "timestamp": datetime.now().isoformat(),
-            "csrf_token": get_token(request)
-        }, json_dumps_params={"ensure_ascii": False}, status=200)
+        return HttpResponse(body, content_type="application/json", status=200)
 
     except Exception as e:
         traceback.print_exc()
@@ -1867,12 +2060,7 @@ def add_food(request):
         except ValueError:
             return JsonResponse({"error": "Rating phải là số."}, status=400)
 
-        # Kiểm tra xem food đã tồn tại chưa
-        if food_exists(province, title):
-            return JsonResponse({"error": "Món ăn đã tồn tại."}, status=400)
-
-        # Đọc file CSV và thêm dữ liệu mới
-        df = pd.read_csv(FOOD_FILE)
+        # Ghi thêm vào nhật ký thay đổi (kiểm tra trùng và ghi trong cùng một khóa)
         new_row = {
             'Province': province,
             'Title': title,
@@ -1884,9 +2072,9 @@ def add_food(request):
             'Service': str(service),
             'Image': img
         }
-        new_df = pd.DataFrame([new_row])  # Convert the dictionary to a DataFrame
-        df = pd.concat([df, new_df], ignore_index=True)  # Use pd.concat instead of append
-        df.to_csv(FOOD_FILE, index=False)
+        if not food_table.add(new_row):
+            return JsonResponse({"error": "Món ăn đã tồn tại."}, status=400)
+        get_catalog().bump_version()
 
         return JsonResponse({"message": "Thêm món ăn thành công!"}, status=201)
     except Exception as e:
@@ -1905,20 +2093,9 @@ def delete_food(request):
         if not all([province, title]):
             return JsonResponse({"error": "Thiếu các trường bắt buộc: province, title"}, status=400)
 
-        normalized_province = normalize_text(province)
-        normalized_title = normalize_text(title)
-
-        df = pd.read_csv(FOOD_FILE)
-        df['normalized_province'] = df['Province'].apply(normalize_text)
-        df['normalized_title'] = df['Title'].apply(normalize_text)
-
-        mask = (df['normalized_province'] == normalized_province) & (df['normalized_title'] == normalized_title)
-        if mask.sum() == 0:
+        if not food_table.delete(food_table.make_key(province, title)):
             return JsonResponse({"error": "Món ăn không tồn tại."}, status=404)
-
-        df = df[~mask]
-        df.drop(columns=['normalized_province', 'normalized_title'], inplace=True)
-        df.to_csv(FOOD_FILE, index=False)
+        get_catalog().bump_version()
 
         return JsonResponse({"message": "Xóa món ăn thành công!"}, status=200)
     except Exception as e:
@@ -1938,30 +2115,21 @@ def update_food(request):
         if not all([province, title]):
             return JsonResponse({"error": "Thiếu các trường bắt buộc: province, title"}, status=400)
 
-        normalized_province = normalize_text(province)
-        normalized_title = normalize_text(title)
-
-        df = pd.read_csv(FOOD_FILE)
-        df['normalized_province'] = df['Province'].apply(normalize_text)
-        df['normalized_title'] = df['Title'].apply(normalize_text)
+        if 'Rating' in updates:
+            try:
+                updates['Rating'] = float(updates['Rating'])
+                if not 0 <= updates['Rating'] <= 5:
+                    return JsonResponse({"error": "Rating phải từ 0 đến 5."}, status=400)
+            except ValueError:
+                return JsonResponse({"error": "Rating phải là số."}, status=400)
 
-        mask = (df['normalized_province'] == normalized_province) & (df['normalized_title'] == normalized_title)
-        if mask.sum() == 0:
+        try:
+            updated = food_table.update(food_table.make_key(province, title), updates)
+        except KeyChangeError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        if not updated:
             return JsonResponse({"error": "Món ăn không tồn tại."}, status=404)
-
-        for key, value in updates.items():
-            if key in df.columns:
-                if key == 'Rating':
-                    try:
-                        value = float(value)
-                        if not 0 <= value <= 5:
-                            return JsonResponse({"error": "Rating phải từ 0 đến 5."}, status=400)
-                    except ValueError:
-                        return JsonResponse({"error": "Rating phải là số."}, status=400)
-                df.loc[mask, key] = value
-
-        df.drop(columns=['normalized_province', 'normalized_title'], inplace=True)
-        df.to_csv(FOOD_FILE, index=False)
+        get_catalog().bump_version()
 
         return JsonResponse({"message": "Cập nhật món ăn thành công!"}, status=200)
     except Exception as e:
@@ -1973,6 +2141,10 @@ def update_food(request):
 end Admin để quản ly khách sạn
 '''
 
+# Số kết quả mặc định/tối đa mỗi nhóm (món ăn, địa điểm, khách sạn) khi tìm theo query; không có query thì trả hết
+DEFAULT_SEARCH_RESULTS = 50
+MAX_SEARCH_RESULTS = 200
+
 # API tìm kiếm tỉnh/thành phố
 @csrf_exempt
 @require_POST
@@ -1989,27 +2161,21 @@ def search_province(request):
             return JsonResponse({"error": "Vui lòng cung cấp tỉnh/thành phố."}, status=400)
         if len(province) > 100:
             return JsonResponse({"error": "Tỉnh/thành phố không được dài quá 100 ký tự."}, status=400)
+        try:
+            limit = int(data.get("limit", DEFAULT_SEARCH_RESULTS))
+        except (TypeError, ValueError):
+            return JsonResponse({"error": "limit phải là số nguyên."}, status=400)
+        if not 1 <= limit <= MAX_SEARCH_RESULTS:
+            return JsonResponse({"error": f"limit phải từ 1 đến {MAX_SEARCH_RESULTS}."}, status=400)
 
         food_df, place_df, hotel_df = load_data(FOOD_FILE, PLACE_FILE, HOTEL_FILE)
 
-        normalized_province = normalize_text(province)
-        normalized_query = normalize_text(query) if query else None
+        substring = data.get("match") == "substring"
 
         def filter_data(df, province_col='province', name_col='title'):
             if df is None or df.empty:
                 return pd.DataFrame()
-            df = df.dropna(subset=[province_col, name_col])
-            if normalized_province and normalized_query:
-                return df[
-                    df[province_col].str.contains(normalized_province, case=False, na=False) &
-                    df[name_col].str.contains(normalized_query, case=False, na=False)
-                ]
-            elif normalized_province:
-                return df[df[province_col].str.contains(normalized_province, case=False, na=False)]
-            elif normalized_query:
-                return df[df[name_col].str.contains(normalized_query, case=False, na=False)]
-            else:
-                return df
+            return filter_search(df, province, query, substring, limit, required=(province_col, name_col))
 
         filtered_food = filter_data(food_df, province_col='province', name_col='title')
         filtered_place = filter_data(place_df, province_col='province', name_col='title')
@@ -2101,11 +2267,10 @@ def search_place(request):
         if len(province) > 100:
             return JsonResponse({"error": "Tỉnh/thành phố không được dài quá 100 ký tự."}, status=400)
 
-        food_df, place_df = load_data(FOOD_FILE, PLACE_FILE)
+        _, place_df, _ = load_data(FOOD_FILE, PLACE_FILE)
+        substring = data.get("match") == "substring"
 
-        normalized_province = normalize_text(province)
-
-        places = place_df[place_df['province'].str.contains(normalized_province, case=False, na=False)].to_dict('records')
+        places = filter_province(place_df, province, substring).to_dict('records')
 
         place_list = [{
             "province": place.get("province"),
@@ -2147,11 +2312,10 @@ def search_food(request):
         if len(province) > 100:
             return JsonResponse({"error": "Tỉnh/thành phố không được dài quá 100 ký tự."}, status=400)
 
-        food_df, place_df, _ = load_data(FOOD_FILE, PLACE_FILE)
-
-        normalized_province = normalize_text(province)
+        food_df, _, _ = load_data(FOOD_FILE, PLACE_FILE)
+        substring = data.get("match") == "substring"
 
-        foods = food_df[food_df['province'].str.contains(normalized_province, case=False, na=False)].to_dict('records')
+        foods = filter_province(food_df, province, substring).to_dict('records')
 
         food_list = [{
             "province": food.get("province"),
@@ -2187,15 +2351,12 @@ Homepage APIs
 @require_GET
 def get_all_hotels_homepage(request):
     try:
-        hotels = get_hotel_homepage()
-        if not hotels:
+        # Danh sách đã dựng sẵn thành JSON, chỉ ghép thêm timestamp và csrf_token của request
+        body = homepage_payload("hotels", timestamp=datetime.now().isoformat(), csrf_token=get_token(request))
+        if body is None:
             return JsonResponse({"error": "Error File..."}, status=404)
 
-        return JsonResponse({
-            "hotels": hotels,
-            "timestamp": datetime.now().isoformat(),
-            "csrf_token": get_token(request)
-        }, json_dumps_params={"ensure_ascii": False}, status=200)
+        return HttpResponse(body, content_type="application/json", status=200)
 
     except Exception as e:
         traceback.print_exc()
@@ -2205,15 +2366,12 @@ def get_all_hotels_homepage(request):
 @require_GET
 def get_all_place_homepage(request):
     try:
-        places = get_place_homepage()
-        if not places:
+        # Danh sách đã dựng sẵn thành JSON, chỉ ghép thêm timestamp và csrf_token của request
+        body = homepage_payload("places", timestamp=datetime.now().isoformat(), csrf_token=get_token(request))
+        if body is None:
             return JsonResponse({"error": "Error File..."}, status=404)
 
-        return JsonResponse({
-            "places": places,
-            "timestamp": datetime.now().isoformat(),
-            "csrf_token": get_token(request)
-        }, json_dumps_params={"ensure_ascii": False}, status=200)
+        return HttpResponse(body, content_type="application/json", status=200)
 
     except Exception as e:
         traceback.print_exc()
@@ -2245,15 +2403,12 @@ def select_place(request):
 @require_GET
 def get_all_food_homepage(request):
     try:
-        foods = get_food_homepage()
-        if not foods:
+        # Danh sách đã dựng sẵn thành JSON, chỉ ghép thêm timestamp và csrf_token của request
+        body = homepage_payload("foods", timestamp=datetime.now().isoformat(), csrf_token=get_token(request))
+        if body is None:
             return JsonResponse({"error": "Error File..."}, status=404)
 
-        return JsonResponse({
-            "foods": foods,
-            "timestamp": datetime.now().isoformat(),
-            "csrf_token": get_token(request)
-        }, json_dumps_params={"ensure_ascii": False}, status=200)
+        return HttpResponse(body, content_type="application/json", status=200)
 
     except Exception as e:
         traceback.print_exc()
@@ -2281,8 +2436,7 @@ def create_todolist_activity(request):
         if not activities:
             return JsonResponse({"error": "Không có hoạt động nào để lưu"}, status=400)
 
-        db = MySQLdb.connect(host=MYSQL_HOST, user=MYSQL_USER, passwd=MYSQL_PASSWORD,
-                             db=MYSQL_DB, port=MYSQL_PORT, charset=MYSQL_CHARSET)
+        db = mysql_pool.connection()
         cursor = db.cursor()
 
         for activity in activities:
@@ -2357,8 +2511,7 @@ def get_todolist_activities(request):
         if not user_id:
             return JsonResponse({"error": "Thiếu user_id trong query parameters"}, status=400)
 
-        db = MySQLdb.connect(host=MYSQL_HOST, user=MYSQL_USER, passwd=MYSQL_PASSWORD,
-                             db=MYSQL_DB, port=MYSQL_PORT, charset=MYSQL_CHARSET)
+        db = mysql_pool.connection()
         cursor = db.cursor()
 
         cursor.execute(
@@ -2407,8 +2560,7 @@ def update_todolist_activities(request):
         if not activity_id or not user_id:
             return JsonResponse({"error": "Thiếu activity_id hoặc user_id"}, status=400)
 
-        db = MySQLdb.connect(host=MYSQL_HOST, user=MYSQL_USER, passwd=MYSQL_PASSWORD,
-                             db=MYSQL_DB, port=MYSQL_PORT, charset=MYSQL_CHARSET)
+        db = mysql_pool.connection()
         cursor = db.cursor()
 
         cursor.execute(
@@ -2502,8 +2654,7 @@ def delete_todolist_activities(request):
         if not activity_id or not user_id:
             return JsonResponse({"error": "Thiếu activity_id hoặc user_id"}, status=400)
 
-        db = MySQLdb.connect(host=MYSQL_HOST, user=MYSQL_USER, passwd=MYSQL_PASSWORD,
-                             db=MYSQL_DB, port=MYSQL_PORT, charset=MYSQL_CHARSET)
+        db = mysql_pool.connection()
         cursor = db.cursor()
 
         cursor.execute(
@@ -2537,3 +2688,49 @@ def delete_todolist_activities(request):
         traceback.print_exc()
         return JsonResponse({"error": str(e)}, status=500)
 
+
+# Nhập/xuất hàng loạt (food, place, hotel)
+# API nhập hàng loạt từ file CSV/NDJSON (multipart field "file" hoặc body thô), đọc theo luồng và ghi một lần
+@csrf_exempt
+@require_POST
+def bulk_import(request, dataset):
+    try:
+        if dataset not in BULK_DATASETS:
+            return JsonResponse({"error": f"Tập dữ liệu không hợp lệ: {dataset}."}, status=404)
+        # Chỉ đọc request.FILES với multipart, ngược lại đọc body theo luồng để không nạp cả file vào bộ nhớ
+        upload = request.FILES.get("file") if request.content_type == "multipart/form-data" else None
+        if request.content_type == "multipart/form-data" and upload is None:
+            return JsonResponse({"error": "Thiếu file nhập (field 'file')."}, status=400)
+        fmt = upload_format(request.GET.get("format"), upload.name if upload else None,
+                            upload.content_type if upload else request.content_type)
+
+        result = import_rows(dataset, upload if upload is not None else request, fmt)
+        return JsonResponse({
+            **result,
+            "timestamp": datetime.now().isoformat()
+        }, json_dumps_params={"ensure_ascii": False}, status=201 if result["added"] else 200)
+    except BulkImportError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except Exception as e:
+        traceback.print_exc()
+        logger.error(f"Error in bulk_import: {str(e)}")
+        return JsonResponse({"error": f"Lỗi hệ thống: {str(e)}"}, status=500)
+
+# API xuất toàn bộ dữ liệu dạng CSV/NDJSON, trả về theo từng khối (chunked)
+@require_GET
+def bulk_export(request, dataset):
+    try:
+        if dataset not in BULK_DATASETS:
+            return JsonResponse({"error": f"Tập dữ liệu không hợp lệ: {dataset}."}, status=404)
+        fmt = request.GET.get("format", "csv").lower()
+        if fmt not in ("csv", "ndjson"):
+            return JsonResponse({"error": "format phải là csv hoặc ndjson."}, status=400)
+
+        content_type = "text/csv; charset=utf-8" if fmt == "csv" else "application/x-ndjson; charset=utf-8"
+        response = StreamingHttpResponse(export_chunks(dataset, fmt), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{dataset}.{fmt}"'
+        return response
+    except Exception as e:
+        traceback.print_exc()
+        logger.error(f"Error in bulk_export: {str(e)}")
+        return JsonResponse({"error": f"Lỗi hệ thống: {str(e)}"}, status=500)